@@ -1,44 +1,264 @@
-import requests
 import os
+import re
+import json
+import time
+import random
+import shutil
+import hashlib
 import asyncio
+import threading
+import uuid
 import aiohttp
 from datetime import datetime
 from urllib.parse import urlparse
+import metrics
 
-async def download_pdf(session, url, folder):
-    filename = os.path.basename(urlparse(url).path) + ".pdf"
+# Shared, content-addressed store every session folder links into
+STORE_DIR = os.getenv("PAPER_STORE_DIR", "paper_store")
+OBJECTS_DIR = os.path.join(STORE_DIR, "objects")
+PARTIAL_DIR = os.path.join(STORE_DIR, "partial")
+INDEX_PATH = os.path.join(STORE_DIR, "index.json")
+
+# Connection caps and retry policy
+MAX_CONNECTIONS = int(os.getenv("DOWNLOAD_MAX_CONNECTIONS", 8))
+MAX_CONNECTIONS_PER_HOST = int(os.getenv("DOWNLOAD_MAX_PER_HOST", 4))
+MAX_ATTEMPTS = 4
+BACKOFF_SECONDS = 0.5
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+CHUNK_SIZE = 64 * 1024
+WRITE_BUFFER_SIZE = 1024 * 1024  # Chunks are batched so each thread hop writes ~1 MiB
+
+# Serialises index updates and tracks papers being fetched, across every event loop in the process
+_store_lock = threading.Lock()
+_in_flight = set()
+
+
+def paper_key(url: str, key: str = None) -> str:
+    """
+    File-safe key for a paper: the catalog key when given, otherwise the arXiv ID (with version)
+    taken from the PDF URL, e.g. 2401.12345v1
+    """
+    key = key or os.path.basename(urlparse(url).path)
+    return re.sub(r"[^A-Za-z0-9._-]", "_", key)
+
+
+def _load_index() -> dict:
+    try:
+        with open(INDEX_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _object_path(digest: str) -> str:
+    return os.path.join(OBJECTS_DIR, digest[:2], digest + ".pdf")
+
+
+def stored_object(key: str):
+    """Path of the stored PDF for key, or None if it has not been downloaded yet"""
+    with _store_lock:
+        entry = _load_index().get(key)
+    if entry and os.path.exists(_object_path(entry["sha256"])):
+        return _object_path(entry["sha256"])
+    return None
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _commit_to_store(key: str, part_path: str) -> str:
+    """Move a finished download into the object store and record it in the index"""
+    digest = _file_sha256(part_path)
+    object_path = _object_path(digest)
+    os.makedirs(os.path.dirname(object_path), exist_ok=True)
+    if os.path.exists(object_path):
+        os.remove(part_path)  # Same bytes already stored under another ID
+    else:
+        os.replace(part_path, object_path)
+
+    with _store_lock:
+        index = _load_index()
+        index[key] = {"sha256": digest, "bytes": os.path.getsize(object_path)}
+        tmp_path = f"{INDEX_PATH}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, INDEX_PATH)
+    return object_path
+
+
+def _link_into(object_path: str, filepath: str):
+    if os.path.exists(filepath):
+        os.remove(filepath)
+    try:
+        os.link(object_path, filepath)
+    except OSError:
+        shutil.copyfile(object_path, filepath)
+
+
+def _append(path: str, data: bytes):
+    with open(path, "ab") as f:
+        f.write(data)
+
+
+def _truncate(path: str):
+    open(path, "wb").close()
+
+
+async def _fetch_to_part(session, url, part_path, stats):
+    """Stream url into part_path, resuming from whatever is already there. Returns True once complete."""
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        stats["attempts"] = attempt
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+
+        try:
+            async with session.get(url, headers=headers) as response:
+                if response.status == 416 and offset:
+                    # Nothing left to fetch past what is on disk: the earlier attempt got the whole file
+                    stats["status"] = 206
+                    stats["resumed_from"] = offset
+                    stats.pop("error", None)
+                    return True
+                if response.status in RETRY_STATUSES:
+                    stats["status"] = response.status
+                    raise aiohttp.ClientResponseError(
+                        response.request_info, response.history, status=response.status
+                    )
+                if response.status not in (200, 206):
+                    stats["status"] = response.status
+                    return False
+
+                if response.status == 200 and offset:
+                    # Server ignored the Range header; start over
+                    await asyncio.to_thread(_truncate, part_path)
+                    offset = 0
+                stats["resumed_from"] = offset
+
+                buffer = bytearray()
+                async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                    buffer.extend(chunk)
+                    stats["bytes"] += len(chunk)
+                    if len(buffer) >= WRITE_BUFFER_SIZE:
+                        await asyncio.to_thread(_append, part_path, bytes(buffer))
+                        buffer.clear()
+                if buffer:
+                    await asyncio.to_thread(_append, part_path, bytes(buffer))
+                stats["status"] = response.status
+                stats.pop("error", None)
+                return True
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            stats["error"] = str(e) or type(e).__name__
+            if attempt == MAX_ATTEMPTS:
+                return False
+            # Exponential backoff with jitter; the partial file is kept for the next Range request
+            await asyncio.sleep(BACKOFF_SECONDS * 2 ** (attempt - 1) + random.uniform(0, BACKOFF_SECONDS))
+    return False
+
+
+async def download_pdf(session, url, folder, key=None):
+    key = paper_key(url, key)
+    filename = key + ".pdf"
     filepath = os.path.join(folder, filename)
+    stats = {"file": filename, "url": url, "bytes": 0, "seconds": 0.0, "status": None,
+             "attempts": 0, "cached": False, "resumed_from": 0}
+    start = time.perf_counter()
 
     try:
-        async with session.get(url) as response:
-            if response.status == 200:
-                with open(filepath, "wb") as f:
-                    content = await response.read()
-                    f.write(content)
-                print(f"✅ Downloaded {filename}")
+        # Another session in this process may already be fetching the same paper
+        while True:
+            with _store_lock:
+                if key not in _in_flight:
+                    _in_flight.add(key)
+                    break
+            await asyncio.sleep(0.2)
+
+        try:
+            object_path = stored_object(key)
+            if object_path:
+                stats["cached"] = True
+                stats["status"] = "cached"
             else:
-                print(f"❌ Failed {filename}: Status {response.status}")
+                part_path = os.path.join(PARTIAL_DIR, filename + ".part")
+                if await _fetch_to_part(session, url, part_path, stats):
+                    object_path = await asyncio.to_thread(_commit_to_store, key, part_path)
+        finally:
+            with _store_lock:
+                _in_flight.discard(key)
+
+        if object_path:
+            await asyncio.to_thread(_link_into, object_path, filepath)
+            print(f"✅ {'Reused' if stats['cached'] else 'Downloaded'} {filename}")
+        else:
+            print(f"❌ Failed {filename}: Status {stats['status']}")
     except Exception as e:
+        stats["error"] = str(e)
         print(f"⚠️ Error downloading {filename}: {e}")
 
+    stats["seconds"] = round(time.perf_counter() - start, 3)
+    metrics.record("download.pdf", stats["seconds"], bytes=stats["bytes"], cache_hits=int(stats["cached"]),
+                   failures=int(stats["status"] not in (200, 206, "cached")))
+    return stats
+
+
+async def main(entries, folder_name, on_progress=None):
+    # The connector enforces both the global and the per-host connection caps
+    connector = aiohttp.TCPConnector(limit=MAX_CONNECTIONS, limit_per_host=MAX_CONNECTIONS_PER_HOST)
+    timeout = aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=60)
+
+    # Each paper is fetched once even if it is listed twice
+    urls = {}
+    for entry in entries:
+        if entry.get("URL"):
+            urls.setdefault(entry["URL"], entry.get("ArxivID"))
+    done = 0
+
+    async def tracked_download(session, url, key):
+        nonlocal done
+        stats = await download_pdf(session, url, folder_name, key)
+        done += 1
+        if on_progress:
+            on_progress(done, len(urls))
+        return stats
 
-async def main(entries, folder_name):
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        tasks = [tracked_download(session, url, key) for url, key in urls.items()]
+        return await asyncio.gather(*tasks)
 
-    async with aiohttp.ClientSession() as session:
-        tasks = [download_pdf(session, entry["URL"], folder_name) for entry in entries]
-        await asyncio.gather(*tasks)
 
-def download_research_paper(entries):
+def new_download_folder() -> str:
+    """Name for a new session folder: its creation time, plus a random suffix so sessions never share one"""
+    return datetime.now().strftime("arxiv_downloads_%Y-%m-%d_%H%M%S_") + uuid.uuid4().hex[:8]
+
+
+def download_research_paper(entries, on_progress=None, folder_name=None):
+    """
+    Download the PDFs for the given entries into a session folder.
+
+    Args:
+        entries (list): Paper dicts with a "URL" key pointing at the PDF and, optionally, their "ArxivID" catalog key.
+        on_progress (callable, optional): Called as on_progress(done, total) after each file finishes.
+        folder_name (str, optional): The session's folder, which keeps the papers of earlier batches.
+            Default is a new folder.
+
+    Returns:
+        tuple: (folder_name, stats) where stats holds one dict per file with bytes, seconds, status and cache use.
+               folder_name is None when there was nothing to download.
+    """
     # Check if entries is empty
     if not entries:
         print("No entries to download.")
-        return
+        return None, []
 
-    # Create folder with current datetime
-    folder_name = datetime.now().strftime("arxiv_downloads_%Y-%m-%d_%H%M%S")
+    folder_name = folder_name or new_download_folder()
     os.makedirs(folder_name, exist_ok=True)
+    os.makedirs(PARTIAL_DIR, exist_ok=True)
 
     # Run the async main function
-    asyncio.run(main(entries, folder_name))
-    return folder_name
-
+    stats = asyncio.run(main(entries, folder_name, on_progress))
+    return folder_name, stats
@@ -4,8 +4,19 @@ import shutil
 import pandas as pd
 import json
 import sys
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+# Maven project root, so the helpers work regardless of the caller's working directory
+PROJECT_DIR = Path(__file__).resolve().parent
+CLASSPATH_FILE = PROJECT_DIR / "target" / "classpath.txt"
+SERVER_CLASS = "io.github.jonathanlink.ExtractionServer"
+
+# Longest one PDF may take before its worker JVM is killed and restarted
+EXTRACTION_TIMEOUT_SECONDS = float(os.getenv("EXTRACTION_TIMEOUT_SECONDS", 120))
+
 def check_maven_installation():
     """Check if Maven is installed and accessible"""
     try:
@@ -52,41 +63,234 @@ def json_to_csv(json_data):
         print(f"Error converting JSON to CSV: {str(e)}")
         return None
 
+def build_classpath():
+    """Compile once and resolve the runtime classpath, so workers start with plain java instead of mvn"""
+    if not CLASSPATH_FILE.exists():
+        print("Compiling Java classes and resolving classpath...")
+        result = run_maven_command(
+            ['mvn', '-q', 'compile', 'dependency:build-classpath', f'-Dmdep.outputFile={CLASSPATH_FILE}'],
+            cwd=PROJECT_DIR,
+        )
+        if result is None or result.returncode != 0:
+            raise RuntimeError("Maven compilation failed. Please check your Java configuration.")
+
+    dependencies = CLASSPATH_FILE.read_text(encoding="utf-8").strip()
+    return os.pathsep.join([str(PROJECT_DIR / "target" / "classes"), dependencies])
+
+
+class ExtractionWorker:
+    """One long-lived JVM running ExtractionServer, spoken to over stdin/stdout"""
+
+    def __init__(self, classpath, timeout=EXTRACTION_TIMEOUT_SECONDS):
+        self.classpath = classpath
+        self.timeout = timeout
+        self.process = None
+        self.replies = None
+        self.start()
+
+    def start(self):
+        self.process = subprocess.Popen(
+            ['java', '-cp', self.classpath, SERVER_CLASS],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            encoding="utf-8",
+            bufsize=1,
+            cwd=PROJECT_DIR,
+        )
+        # Replies are read on a thread so extract() can wait for one with a deadline;
+        # each JVM gets its own queue, so a killed JVM's late output is never taken for a reply
+        self.replies = queue.Queue()
+        threading.Thread(target=self._read_replies, args=(self.process, self.replies), daemon=True).start()
+
+    @staticmethod
+    def _read_replies(process, replies):
+        try:
+            for line in process.stdout:
+                replies.put(line.rstrip("\n"))
+        except (OSError, ValueError):
+            pass
+        finally:
+            # End of output: the JVM exited or was killed
+            replies.put(None)
+
+    def kill(self):
+        if self.process and self.process.poll() is None:
+            self.process.kill()
+            self.process.wait()
+
+    def restart(self):
+        self.kill()
+        self.start()
+
+    def _send(self, request):
+        if self.process.poll() is not None:
+            self.start()
+        self.process.stdin.write(request)
+        self.process.stdin.flush()
+
+    def extract(self, pdf_path, output_dir):
+        """Send one PDF to the JVM and wait up to self.timeout seconds for its reply line"""
+        pdf_path, output_dir = os.path.abspath(pdf_path), os.path.abspath(output_dir)
+        if any(separator in pdf_path + output_dir for separator in "\t\n"):
+            return {"pdf": pdf_path, "ok": False, "error": "paths may not contain tabs or newlines"}
+        request = f"{pdf_path}\t{output_dir}\n"
+
+        try:
+            self._send(request)
+        except OSError:
+            # The JVM exited after the liveness check and before reading the request; try a fresh one once
+            self.restart()
+            try:
+                self._send(request)
+            except OSError as e:
+                self.kill()
+                return {"pdf": pdf_path, "ok": False, "error": f"extraction server unavailable: {e}"}
+
+        try:
+            reply = self.replies.get(timeout=self.timeout)
+        except queue.Empty:
+            # A PDF that hangs PDFBox would otherwise pin this worker; the next request gets a fresh JVM
+            self.restart()
+            return {"pdf": pdf_path, "ok": False, "error": f"extraction timed out after {self.timeout}s"}
+        if not reply:
+            # The JVM died mid-request; the next call starts a fresh one
+            self.kill()
+            return {"pdf": pdf_path, "ok": False, "error": "extraction server exited"}
+
+        fields = reply.split("\t")
+        if fields[0] == "OK":
+            try:
+                return {
+                    "pdf": pdf_path,
+                    "ok": True,
+                    "txt": fields[2],
+                    "csv": fields[3],
+                    "pages": int(fields[4]),
+                    "millis": int(fields[5]),
+                }
+            except (IndexError, ValueError):
+                # Stray output (e.g. a library logging to stdout) puts the JVM out of step with our requests;
+                # a fresh one is back in step
+                self.restart()
+                return {"pdf": pdf_path, "ok": False, "error": f"malformed reply from extraction server: {reply!r}"}
+        return {"pdf": pdf_path, "ok": False, "error": fields[2] if len(fields) > 2 else reply}
+
+    def close(self):
+        if self.process and self.process.poll() is None:
+            try:
+                self.process.stdin.write("\n")
+                self.process.stdin.flush()
+                self.process.wait(timeout=5)
+            except (OSError, subprocess.TimeoutExpired):
+                self.kill()
+
+
+class LayoutExtractorPool:
+    """
+    A small pool of persistent extraction JVMs.
+    Each PDF is parsed once for both layout text and word boxes, and several PDFs are processed at once.
+    """
+
+    def __init__(self, workers=2):
+        classpath = build_classpath()
+        self.workers = [ExtractionWorker(classpath) for _ in range(workers)]
+        self.idle = queue.Queue()
+        for worker in self.workers:
+            self.idle.put(worker)
+
+    def extract(self, pdf_path, output_dir="output"):
+        worker = self.idle.get()
+        try:
+            return worker.extract(pdf_path, output_dir)
+        finally:
+            self.idle.put(worker)
+
+    def extract_batch(self, pdf_paths, output_dir="output"):
+        """Extract many PDFs, returning one result dict per path in input order"""
+        with ThreadPoolExecutor(max_workers=len(self.workers)) as executor:
+            return list(executor.map(lambda path: self.extract(path, output_dir), pdf_paths))
+
+    def extract_folder(self, pdf_folder, output_dir=None):
+        """Extract every PDF in a download folder into <folder>_layout by default"""
+        output_dir = output_dir or f"{pdf_folder}_layout"
+        pdf_paths = [
+            os.path.join(pdf_folder, filename)
+            for filename in sorted(os.listdir(pdf_folder))
+            if filename.endswith(".pdf")
+        ]
+        return self.extract_batch(pdf_paths, output_dir)
+
+    def close(self):
+        for worker in self.workers:
+            worker.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_shared_pool = None
+_shared_pool_lock = threading.Lock()
+
+
+def get_extractor_pool(workers=2):
+    """Process-wide pool, started on first use and reused by every later call"""
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = LayoutExtractorPool(workers=workers)
+        return _shared_pool
+
+
 def ocrFromJava(file_path):
     """Process PDF file using Java OCR"""
-    # Verify Maven installation
-    if not check_maven_installation():
+    # Verify Maven installation; only compiling needs it, so a cached classpath skips the check
+    if not CLASSPATH_FILE.exists() and not check_maven_installation():
         print("Maven is not installed or not in PATH. Please install Maven.")
         return False
     
-    # Check/create target directory
-    if not os.path.exists('target/classes'):
-        print("Compiling Java classes...")
-        
-        compile_result = run_maven_command(['mvn', 'clean', 'compile'])
-        
-        if compile_result is None or compile_result.returncode != 0:
-            print("Maven compilation failed. Please check your Java configuration.")
-            return False
-        
-        print("Compilation completed.")
+    try:
+        pool = get_extractor_pool()
+    except RuntimeError as e:
+        print(e)
+        return False
 
-    # Run Java application
     print("Processing OCR...")
-    exec_command = f'mvn exec:java -Dexec.mainClass=io.github.jonathanlink.test -Dexec.args="{file_path}"'
-    
-    exec_result = run_maven_command(exec_command)
-    
-    if exec_result is None or exec_result.returncode != 0:
-        print("OCR processing failed. Please check the file and try again.")
+    result = pool.extract(file_path)
+
+    if not result["ok"]:
+        print(f"OCR processing failed: {result['error']}")
         return False
-    
+
     print("OCR processing completed successfully.")
     return True
 
+def smoke_test(pdf_path, output_dir="output"):
+    """
+    Round trips through one persistent worker: the PDF twice (the second request reuses the JVM),
+    then a missing file, which must come back as an error without stopping the worker.
+    """
+    with LayoutExtractorPool(workers=1) as pool:
+        worker = pool.workers[0]
+        first = pool.extract(pdf_path, output_dir)
+        pid = worker.process.pid
+        second = pool.extract(pdf_path, output_dir)
+        missing = pool.extract(os.path.join(output_dir, "missing.pdf"), output_dir)
+        checks = {
+            "extracts": first["ok"] and os.path.getsize(first["txt"]) > 0 and os.path.getsize(first["csv"]) > 0,
+            "reuses the JVM": second["ok"] and worker.process.pid == pid,
+            "reports a bad PDF": not missing["ok"] and worker.process.poll() is None,
+        }
+    for name, passed in checks.items():
+        print(f"{'ok  ' if passed else 'FAIL'} {name}")
+    return all(checks.values())
+
+
 if __name__ == "__main__":
-    ocrFromJava(
-        str(
-            "D:/Lit-review-Automation/app_backend/arxiv_downloads_20250429_075959/2504.18393v1.pdf"
-        )
-    )
+    if len(sys.argv) != 2:
+        sys.exit("usage: python app.py <pdf>   (compiles the Java classes and smoke-tests the extraction worker)")
+    sys.exit(0 if smoke_test(sys.argv[1]) else 1)
@@ -0,0 +1,137 @@
+package io.github.jonathanlink;
+
+import java.awt.geom.Rectangle2D;
+import java.io.BufferedReader;
+import java.io.File;
+import java.io.FileOutputStream;
+import java.io.IOException;
+import java.io.InputStreamReader;
+import java.io.OutputStreamWriter;
+import java.io.PrintStream;
+import java.io.PrintWriter;
+import java.io.Writer;
+import java.nio.charset.StandardCharsets;
+import java.util.ArrayList;
+import java.util.List;
+import org.apache.pdfbox.pdmodel.PDDocument;
+import org.apache.pdfbox.text.TextPosition;
+
+/**
+ * Layout stripper that also records word bounding boxes while each page is laid out,
+ * so layout text and boxes come from a single parse of the document.
+ */
+class LayoutAndBoxesStripper extends PDFLayoutTextStripper {
+
+    private PrintWriter boxWriter;
+
+    public LayoutAndBoxesStripper() throws IOException {
+        super();
+    }
+
+    public void setBoxWriter(PrintWriter boxWriter) {
+        this.boxWriter = boxWriter;
+    }
+
+    @Override
+    protected void writePage() throws IOException {
+        // The layout pass sorts each article's characters by position, which is also the order words are read in
+        super.writePage();
+        if (this.boxWriter == null) {
+            return;
+        }
+        String wordSeparator = getWordSeparator();
+        for (List<TextPosition> textList : super.getCharactersByArticle()) {
+            List<TextPosition> word = new ArrayList<>();
+            TextPosition previous = null;
+            for (TextPosition text : textList) {
+                String thisChar = text.getUnicode();
+                boolean newLine = previous != null && Math.abs(text.getYDirAdj() - previous.getYDirAdj()) > 1;
+                if (thisChar == null || thisChar.isEmpty() || thisChar.equals(wordSeparator) || thisChar.trim().isEmpty() || newLine) {
+                    printWord(word);
+                    word.clear();
+                }
+                if (thisChar != null && !thisChar.trim().isEmpty()) {
+                    word.add(text);
+                }
+                previous = text;
+            }
+            printWord(word);
+        }
+    }
+
+    private void printWord(List<TextPosition> word) {
+        if (word.isEmpty()) {
+            return;
+        }
+        Rectangle2D boundingBox = null;
+        StringBuilder builder = new StringBuilder();
+        for (TextPosition text : word) {
+            Rectangle2D box = new Rectangle2D.Float(text.getXDirAdj(), text.getYDirAdj(),
+                    text.getWidthDirAdj(), text.getHeightDir());
+            if (boundingBox == null)
+                boundingBox = box;
+            else
+                boundingBox.add(box);
+            builder.append(text.getUnicode());
+        }
+        // Same line format as GetWordLocationAndSize so existing output.csv readers keep working
+        this.boxWriter.println(builder.toString() + " [(X=" + (int) boundingBox.getX() + ",Y=" + (int) boundingBox.getY()
+                + ") height=" + (int) boundingBox.getHeight() + " width=" + (int) boundingBox.getWidth() + "]");
+    }
+}
+
+/**
+ * Long-lived extraction worker driven over stdin/stdout.
+ *
+ * Each request is one line: {@code <pdfPath>\t<outputDir>}. For every request the server writes
+ * {@code <outputDir>/<name>.txt} (layout text) and {@code <outputDir>/<name>.csv} (word boxes) and answers with
+ * {@code OK\t<pdfPath>\t<txtPath>\t<csvPath>\t<pages>\t<millis>} or {@code ERR\t<pdfPath>\t<message>}.
+ * An empty line or end of input stops the server.
+ */
+public class ExtractionServer {
+
+    public static void main(String[] args) throws IOException {
+        // stdout carries the protocol only; anything else a library prints goes to stderr
+        PrintStream protocol = new PrintStream(System.out, true, "UTF-8");
+        System.setOut(System.err);
+
+        BufferedReader requests = new BufferedReader(new InputStreamReader(System.in, StandardCharsets.UTF_8));
+        String line;
+        while ((line = requests.readLine()) != null && !line.isEmpty()) {
+            String[] parts = line.split("\t");
+            String pdfFilePath = parts[0];
+            String outputDir = parts.length > 1 ? parts[1] : "output";
+            try {
+                protocol.println(extract(pdfFilePath, outputDir));
+            } catch (Exception e) {
+                String message = String.valueOf(e.getMessage()).replace('\t', ' ').replace('\n', ' ');
+                protocol.println("ERR\t" + pdfFilePath + "\t" + message);
+            }
+        }
+    }
+
+    static String extract(String pdfFilePath, String outputDir) throws IOException {
+        long start = System.currentTimeMillis();
+        File dir = new File(outputDir);
+        if (!dir.exists() && !dir.mkdirs()) {
+            throw new IOException("Failed to create directory: " + outputDir);
+        }
+
+        String name = new File(pdfFilePath).getName();
+        if (name.toLowerCase().endsWith(".pdf")) {
+            name = name.substring(0, name.length() - 4);
+        }
+        File txtFile = new File(dir, name + ".txt");
+        File csvFile = new File(dir, name + ".csv");
+
+        try (PDDocument document = PDDocument.load(new File(pdfFilePath));
+             Writer textWriter = new OutputStreamWriter(new FileOutputStream(txtFile), StandardCharsets.UTF_8);
+             PrintWriter boxWriter = new PrintWriter(new OutputStreamWriter(new FileOutputStream(csvFile), StandardCharsets.UTF_8))) {
+            LayoutAndBoxesStripper stripper = new LayoutAndBoxesStripper();
+            stripper.setBoxWriter(boxWriter);
+            stripper.writeText(document, textWriter);
+            return "OK\t" + pdfFilePath + "\t" + txtFile.getPath() + "\t" + csvFile.getPath()
+                    + "\t" + document.getNumberOfPages() + "\t" + (System.currentTimeMillis() - start);
+        }
+    }
+}
@@ -1,10 +1,16 @@
-from langchain_community.document_loaders import TextLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.schema import Document
-from langchain_community.embeddings import OpenAIEmbeddings
+from langchain_community.embeddings import OpenAIEmbeddings, DeterministicFakeEmbedding
 from langchain_community.vectorstores import Chroma
 import os
+import json
 import shutil
+import hashlib
+import threading
+import metrics
+from corpus_store import read_paper
+from RAG.embedding_cache import CachedEmbeddings
+from RAG.vector_index import NumpyVectorIndex
 
 from dotenv import load_dotenv  # type: ignore
 
@@ -13,58 +19,296 @@ load_dotenv()
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
-# Ensure API key is provided
-if not OPENAI_API_KEY:
-    raise ValueError("API key is missing. Set the API_KEY environment variable.")
-
 CHROMA_PATH = "chroma_db"
-DATA_PATH = "D:/Lit-review-Automation/app_backend/txt_output"
+NUMPY_INDEX_PATH = os.getenv("NUMPY_INDEX_PATH", "vector_index")
+DATA_PATH = os.getenv("RAG_DATA_PATH", "txt_output")
+
+# "numpy" keeps a session-sized index in process; "chroma" scales to large stores
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "numpy")
+
+# Which chunks are in the store for each paper, the text hash they came from and who holds the paper;
+# kept inside the store directory. A manifest of another version triggers one rebuild
+MANIFEST_NAME = "index_manifest.json"
+MANIFEST_VERSION = 2
+
+CHUNK_SIZE = int(os.getenv("RAG_CHUNK_SIZE", 8000))
+CHUNK_OVERLAP = int(os.getenv("RAG_CHUNK_OVERLAP", 500))
+
+# "openai" for real embeddings, "local" for a deterministic offline embedder
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "openai")
+OPENAI_EMBEDDING_MODEL = "text-embedding-3-large"
+LOCAL_EMBEDDING_SIZE = 256
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 64))
+
+# Sections not embedded; reference lists would only crowd out real content in retrieval
+RAG_SKIP_SECTIONS = tuple(filter(None, os.getenv("RAG_SKIP_SECTIONS", "references").split(",")))
+
+# (backend, embedding_name, embedding_function, store) kept open across jobs and requests
+_vector_store = None
+_vector_store_lock = threading.Lock()
+
+# The store and its manifest are shared by every session; one indexing job updates them at a time
+_index_lock = threading.Lock()
+
+
+def get_embedding_function(backend: str = None):
+    """
+    Returns (embedding_function, name); the name is recorded so a backend change forces a rebuild.
+    Vectors are cached by chunk hash and name, so no text is embedded twice by the same model.
+    """
+    backend = backend or EMBEDDING_BACKEND
+    if backend == "local":
+        embeddings, name = DeterministicFakeEmbedding(size=LOCAL_EMBEDDING_SIZE), f"local-{LOCAL_EMBEDDING_SIZE}"
+    elif backend == "openai":
+        # Ensure API key is provided
+        if not OPENAI_API_KEY:
+            raise ValueError("API key is missing. Set the OPENAI_API_KEY environment variable.")
+        embeddings = OpenAIEmbeddings(openai_api_key=OPENAI_API_KEY, model=OPENAI_EMBEDDING_MODEL)
+        name = f"openai-{OPENAI_EMBEDDING_MODEL}"
+    else:
+        raise ValueError(f"Unknown embedding backend: {backend}")
+    return CachedEmbeddings(embeddings, name), name
+
+
+def store_path(vector_backend: str = None) -> str:
+    vector_backend = vector_backend or VECTOR_BACKEND
+    if vector_backend == "numpy":
+        return NUMPY_INDEX_PATH
+    if vector_backend == "chroma":
+        return CHROMA_PATH
+    raise ValueError(f"Unknown vector backend: {vector_backend}")
+
+
+def open_vector_store(embedding_function, embedding_name: str) -> tuple:
+    """
+    The persisted vector store of VECTOR_BACKEND, opened once per process and shared by indexing and queries.
+    Returns (store, embedding_function); the store is reopened only when the embedder or backend changes.
+    """
+    global _vector_store
+    with _vector_store_lock:
+        if _vector_store is None or _vector_store[:2] != (VECTOR_BACKEND, embedding_name):
+            path = store_path()
+            os.makedirs(path, exist_ok=True)
+            if VECTOR_BACKEND == "numpy":
+                db = NumpyVectorIndex(path, embedding_function)
+            else:
+                db = Chroma(persist_directory=path, embedding_function=embedding_function)
+            _vector_store = (VECTOR_BACKEND, embedding_name, embedding_function, db)
+        return _vector_store[3], _vector_store[2]
+
+
+def get_vector_store(backend: str = None) -> tuple:
+    """(store, embedding_function) for the configured embedding backend"""
+    embedding_function, embedding_name = get_embedding_function(backend)
+    return open_vector_store(embedding_function, embedding_name)
+
+
+def close_vector_store():
+    """Drops the open store, e.g. before its directory is deleted"""
+    global _vector_store
+    with _vector_store_lock:
+        _vector_store = None
+        if VECTOR_BACKEND == "chroma":
+            # Chroma keeps one client per path; a rebuilt directory needs a fresh one
+            from chromadb.api.client import SharedSystemClient
+            SharedSystemClient.clear_system_cache()
+
+
+def generate_data_store(data_path: str = DATA_PATH, backend: str = None, skip_files=(), paper_keys=None,
+                        holder: str = None) -> dict:
+    embedding_function, embedding_name = get_embedding_function(backend)
+    return save_to_vector_store(data_path, embedding_function, embedding_name, skip_files, paper_keys, holder)
+
 
+def release_data_store(holder: str, backend: str = None) -> dict:
+    """
+    Drops holder's hold on every paper, e.g. when its session ends, and deletes the chunks of the papers
+    that no one holds any more.
+    """
+    with _index_lock:
+        manifest = _load_manifest()
+        # An older manifest has no holders; the next indexing job rebuilds the store
+        papers = manifest.get("papers", {}) if manifest.get("version") == MANIFEST_VERSION else {}
+        if not any(holder in entry["holders"] for entry in papers.values()):
+            return {"released_papers": 0, "deleted_chunks": 0}
+        orphaned = _release(papers, holder, keep=set())
+        to_delete = [chunk for key in orphaned for chunk in papers.pop(key)["chunk_ids"]]
+        embedding_function, embedding_name = get_embedding_function(backend)
+        # A store built by another embedder is rebuilt by the next indexing job anyway
+        if to_delete and manifest.get("embedding") == embedding_name:
+            db, _ = open_vector_store(embedding_function, embedding_name)
+            _delete_chunks(db, to_delete)
+            if isinstance(db, NumpyVectorIndex):
+                db.save()
+        _save_manifest(manifest)
+    return {"released_papers": len(orphaned), "deleted_chunks": len(to_delete)}
 
-def generate_data_store():
-    documents = load_documents(DATA_PATH)
-    save_to_chroma(documents)
 
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
 
-def load_documents(data_path):
+
+def chunk_id(source: str, text: str) -> str:
+    return hashlib.sha256(f"{source}\0{text}".encode("utf-8")).hexdigest()
+
+
+def load_documents(data_path, filenames=None, include=None, exclude=RAG_SKIP_SECTIONS):
+    """
+    Loads and splits .txt files into chunks with content-hash IDs.
+    Only the given filenames are read when provided, and only the selected sections of each.
+    """
     # Helper function to update metadata with relative paths
     documents = []
-    for filename in os.listdir(data_path):
-        if filename.endswith(".txt"):
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    for filename in sorted(os.listdir(data_path)):
+        if filename.endswith(".txt") and (filenames is None or filename in filenames):
             file_path = os.path.join(data_path, filename)
-            loader = TextLoader(file_path, encoding="utf-8")
-            doc = loader.load()[0]  # TextLoader returns a list; we assume one doc per file
-
-            # Add file name as metadata
-            doc.metadata["source"] = filename
+            text = read_paper(file_path, include=include, exclude=exclude)
+            doc = Document(page_content=text, metadata={"source": filename})
 
             # Split this document individually (to avoid overlap)
-            splitter = RecursiveCharacterTextSplitter(
-                chunk_size=8000, chunk_overlap=500
-            )
-            chunks = splitter.split_documents([doc])
-            documents.extend(chunks)
+            seen = set()
+            for chunk in splitter.split_documents([doc]):
+                chunk.metadata["chunk_id"] = chunk_id(filename, chunk.page_content)
+                # Repeated boilerplate inside one paper is embedded once
+                if chunk.metadata["chunk_id"] not in seen:
+                    seen.add(chunk.metadata["chunk_id"])
+                    documents.append(chunk)
 
     return documents
 
 
-def save_to_chroma(chunks: list[Document]):
-    # Clear out the database first.
-    if os.path.exists(CHROMA_PATH):
-        shutil.rmtree(CHROMA_PATH)
+def _load_manifest() -> dict:
+    try:
+        with open(os.path.join(store_path(), MANIFEST_NAME), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_manifest(manifest: dict):
+    path = os.path.join(store_path(), MANIFEST_NAME)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(path + ".tmp", path)
+
+
+def _release(papers: dict, holder: str, keep: set) -> list:
+    """Drops holder from the papers it holds other than keep; returns the keys of papers now held by no one"""
+    orphaned = []
+    for key, entry in papers.items():
+        if key not in keep and holder in entry["holders"]:
+            entry["holders"].remove(holder)
+            if not entry["holders"]:
+                orphaned.append(key)
+    return orphaned
+
+
+def _delete_chunks(db, ids: list):
+    for start in range(0, len(ids), EMBEDDING_BATCH_SIZE):
+        db.delete(ids=ids[start:start + EMBEDDING_BATCH_SIZE])
+
+
+def save_to_vector_store(data_path: str, embedding_function, embedding_name: str, skip_files=(), paper_keys=None,
+                         holder: str = None) -> dict:
+    """
+    Makes the shared vector store hold the .txt files in data_path, leaving out skip_files, for holder
+    (a session ID; the folder by default).
+    Entries are kept per paper (paper_keys maps filename to catalog key; the file stem by default), so
+    holders of the same paper share its chunks, and each entry lists its holders. Only new or changed papers
+    are embedded. A paper holder no longer has (gone from its folder, or now skipped) is released, and a
+    paper's chunks are deleted once no holder is left.
+    """
+    with _index_lock:
+        return _save_to_vector_store(data_path, embedding_function, embedding_name, skip_files, paper_keys or {},
+                                     holder or os.path.abspath(data_path))
+
+
+def _save_to_vector_store(data_path, embedding_function, embedding_name, skip_files, paper_keys, holder) -> dict:
+    manifest = _load_manifest()
+    path = store_path()
+
+    # A store built by another embedder, section selection or chunking (or with an older manifest)
+    # cannot be updated in place
+    skipped_sections = sorted(RAG_SKIP_SECTIONS)
+    chunking = [CHUNK_SIZE, CHUNK_OVERLAP]
+    if os.path.exists(path) and (manifest.get("embedding") != embedding_name
+                                 or manifest.get("skipped_sections", []) != skipped_sections
+                                 or manifest.get("chunking", [8000, 500]) != chunking
+                                 or manifest.get("version") != MANIFEST_VERSION):
+        close_vector_store()
+        shutil.rmtree(path)
+        manifest = {}
+    papers = manifest.get("papers", {})
+
+    current = {
+        filename: (paper_keys.get(filename) or os.path.splitext(filename)[0], file_sha256(os.path.join(data_path, filename)))
+        for filename in os.listdir(data_path)
+        if filename.endswith(".txt") and filename not in skip_files
+    }
+    changed = {
+        filename for filename, (key, digest) in current.items()
+        if papers.get(key, {}).get("sha256") != digest or papers[key].get("source") != filename
+    }
+
+    chunks_by_file = {}
+    with metrics.timed("rag.chunk", files=len(changed)) as span:
+        for chunk in load_documents(data_path, changed):
+            chunks_by_file.setdefault(chunk.metadata["source"], []).append(chunk)
+        span["chunks"] = sum(len(chunks) for chunks in chunks_by_file.values())
+
+    to_add = []
+    to_delete = []
+    for filename in changed:
+        key, digest = current[filename]
+        chunks = chunks_by_file.get(filename, [])
+        old_ids = set(papers.get(key, {}).get("chunk_ids", []))
+        new_ids = [chunk.metadata["chunk_id"] for chunk in chunks]
+        # Chunks whose text did not change keep their embeddings
+        to_add.extend(chunk for chunk in chunks if chunk.metadata["chunk_id"] not in old_ids)
+        to_delete.extend(old_ids - set(new_ids))
+        papers[key] = {"source": filename, "sha256": digest, "chunk_ids": new_ids,
+                       "holders": papers.get(key, {}).get("holders", [])}
+
+    held = {key for key, _ in current.values()}
+    for key in held:
+        if holder not in papers[key]["holders"]:
+            papers[key]["holders"].append(holder)
+    orphaned = _release(papers, holder, keep=held)
+    for key in orphaned:
+        to_delete.extend(papers.pop(key)["chunk_ids"])
+
+    db, embeddings = open_vector_store(embedding_function, embedding_name)
+    hits, misses = embeddings.hits, embeddings.misses
 
-    # Create a new DB from the documents.
-    db = Chroma.from_documents(
-        chunks,
-        OpenAIEmbeddings(
-            openai_api_key=OPENAI_API_KEY,
-            model="text-embedding-3-large",
-        ),
-        persist_directory=CHROMA_PATH,
-    )
-    db.persist()
-    print(f"Saved {len(chunks)} chunks to {CHROMA_PATH}.")
+    _delete_chunks(db, to_delete)
+    for start in range(0, len(to_add), EMBEDDING_BATCH_SIZE):
+        batch = to_add[start:start + EMBEDDING_BATCH_SIZE]
+        with metrics.timed("rag.embed", chunks=len(batch), chars=sum(len(chunk.page_content) for chunk in batch)):
+            db.add_documents(batch, ids=[chunk.metadata["chunk_id"] for chunk in batch])
+    if isinstance(db, NumpyVectorIndex):
+        db.save()
 
+    _save_manifest({"version": MANIFEST_VERSION, "embedding": embedding_name, "skipped_sections": skipped_sections,
+                    "chunking": chunking, "papers": papers})
+    stats = {
+        "vector_backend": VECTOR_BACKEND,
+        "files": len(current),
+        "changed_files": len(changed),
+        "embedded_chunks": len(to_add),
+        "embedding_cache_hits": embeddings.hits - hits,
+        "embedded_texts": embeddings.misses - misses,
+        "deleted_chunks": len(to_delete),
+        "released_papers": len(orphaned),
+        "papers_in_store": len(papers),
+        "total_chunks": sum(len(entry["chunk_ids"]) for entry in papers.values()),
+    }
+    print(f"Indexed {stats['embedded_chunks']} new chunks, deleted {stats['deleted_chunks']} in {path}.")
+    return stats
 
 if __name__ == "__main__":
     generate_data_store()
@@ -0,0 +1,97 @@
+import os
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+from langchain_core.embeddings import Embeddings
+import metrics
+
+# Embeddings are deterministic per model, so entries never expire
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.sqlite3")
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """SQLite store of float32 embedding vectors keyed by (model, text hash)."""
+
+    def __init__(self, path=EMBEDDING_CACHE_PATH):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, text_hash TEXT NOT NULL, vector BLOB NOT NULL, PRIMARY KEY (model, text_hash))"
+        )
+        self._conn.commit()
+
+    def get_many(self, model: str, hashes: list) -> dict:
+        """{text_hash: vector} for the hashes that are cached"""
+        found = {}
+        with self._lock:
+            # Chunked to stay under SQLite's bound-parameter limit
+            for start in range(0, len(hashes), 500):
+                batch = hashes[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({','.join('?' * len(batch))})",
+                    (model, *batch),
+                ).fetchall()
+                found.update((key, np.frombuffer(vector, dtype=np.float32)) for key, vector in rows)
+        return found
+
+    def put_many(self, model: str, items: dict):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector) VALUES (?, ?, ?)",
+                [(model, key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in items.items()],
+            )
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = EmbeddingCache()
+        return _cache
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an embedder so each distinct text is embedded once per model.
+    Only the texts missing from the cache are sent, in a single embed_documents call.
+    """
+
+    def __init__(self, embeddings: Embeddings, model: str, cache: EmbeddingCache = None):
+        self.embeddings = embeddings
+        self.model = model
+        self.cache = cache or get_embedding_cache()
+        self.hits = 0
+        self.misses = 0
+
+    def embed_documents(self, texts: list) -> list:
+        hashes = [text_hash(text) for text in texts]
+        found = self.cache.get_many(self.model, list(set(hashes)))
+        missing = {key: text for key, text in zip(hashes, texts) if key not in found}
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            computed = dict(zip(missing, vectors))
+            self.cache.put_many(self.model, computed)
+            found.update((key, np.asarray(vector, dtype=np.float32)) for key, vector in computed.items())
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        metrics.incr("rag.embedding_cache.hits", len(texts) - len(missing))
+        metrics.incr("rag.embedding_cache.misses", len(missing))
+        return [found[key].tolist() for key in hashes]
+
+    def embed_query(self, text: str) -> list:
+        return self.embed_documents([text])[0]
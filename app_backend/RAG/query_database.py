@@ -0,0 +1,133 @@
+import os
+import time
+import metrics
+from RAG.create_database import get_vector_store, CHUNK_SIZE
+from RAG.vector_index import NumpyVectorIndex
+from llmCalls.llama_call_for_heading import CHARS_PER_TOKEN, estimate_tokens
+
+# Most chunks retrieved per theme, and the source material budget of the outline prompt
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", 4))
+RAG_CONTEXT_TOKENS = int(os.getenv("RAG_CONTEXT_TOKENS", 12000))
+
+# Candidate section themes of a literature review; each one is a retrieval query
+SECTION_THEMES = (
+    "theoretical foundations and frameworks",
+    "methods and methodological frameworks",
+    "practical implementations and systems",
+    "datasets, benchmarks and evaluation",
+    "applications and use cases",
+    "comparative studies",
+    "challenges and limitations",
+    "research gaps",
+    "future directions and open problems",
+)
+
+
+def retrieve(keywords: str, sources: list = None, themes=SECTION_THEMES, k: int = RAG_TOP_K) -> tuple:
+    """
+    Retrieves the top-k chunks for every theme, restricted to the given source files when sources
+    is not None; an empty list retrieves nothing. A chunk is kept only under the first theme that retrieved it.
+
+    Returns:
+        tuple: ({theme: [(source, text, distance)]}, stats)
+    """
+    if sources is not None and not sources:
+        # The index is shared by every session, so no sources must not mean all of them
+        return {theme: [] for theme in themes}, {
+            "themes": len(themes), "top_k": k, "chunks_retrieved": 0, "unique_chunks": 0,
+            "embed_seconds": 0.0, "search_seconds": 0.0,
+        }
+
+    db, embedding_function = get_vector_store()
+
+    # One embedding request for all the theme queries
+    start = time.perf_counter()
+    with metrics.timed("rag.query_embed", queries=len(themes)):
+        vectors = embedding_function.embed_documents([f"{keywords}: {theme}" for theme in themes])
+    embed_seconds = time.perf_counter() - start
+
+    by_theme = {}
+    seen = set()
+    retrieved = 0
+    start = time.perf_counter()
+    with metrics.timed("rag.search", queries=len(themes)) as span:
+        if isinstance(db, NumpyVectorIndex):
+            # Every theme in one vectorized pass
+            results = db.search(vectors, k, sources)
+        else:
+            where = {"source": {"$in": sorted(sources)}} if sources is not None else None
+            results = [db.similarity_search_by_vector_with_relevance_scores(vector, k=k, filter=where) for vector in vectors]
+        for theme, hits in zip(themes, results):
+            retrieved += len(hits)
+            by_theme[theme] = []
+            for doc, distance in hits:
+                chunk = doc.metadata.get("chunk_id") or doc.page_content
+                if chunk not in seen:
+                    seen.add(chunk)
+                    by_theme[theme].append((doc.metadata.get("source"), doc.page_content, distance))
+        span["chunks"] = retrieved
+    search_seconds = time.perf_counter() - start
+
+    stats = {
+        "themes": len(themes),
+        "top_k": k,
+        "chunks_retrieved": retrieved,
+        "unique_chunks": len(seen),
+        "embed_seconds": round(embed_seconds, 4),
+        "search_seconds": round(search_seconds, 4),
+    }
+    return by_theme, stats
+
+
+def build_rag_context(txt_folder: str, keywords: str, budget: int = RAG_CONTEXT_TOKENS, skip_files=()) -> tuple:
+    """
+    Builds the outline source material from retrieved chunks only.
+
+    k is sized so the retrieved chunks roughly fill the token budget, and whole chunks go into the
+    prompt by rank, every theme's best chunk first, until the budget is spent. The prompt stays
+    the same size however many papers the session accepted.
+
+    Returns:
+        tuple: (context, stats) with retrieval latency and chunk counts.
+    """
+    sources = [filename for filename in os.listdir(txt_folder) if filename.endswith(".txt") and filename not in skip_files]
+    budget_chars = budget * CHARS_PER_TOKEN
+    k = max(1, min(RAG_TOP_K, budget_chars // (CHUNK_SIZE * len(SECTION_THEMES)) + 1))
+    by_theme, stats = retrieve(keywords, sources, k=k)
+
+    # Round-robin over the themes by rank; a chunk that does not fit is left out rather than cut
+    selected = {theme: [] for theme in by_theme}
+    used_chars = 0
+    for rank in range(k):
+        for theme, chunks in by_theme.items():
+            if rank >= len(chunks):
+                continue
+            source, text, _ = chunks[rank]
+            if used_chars + len(text) > budget_chars and used_chars:
+                continue
+            # Only a single chunk larger than the whole budget is ever truncated
+            text = text[:budget_chars]
+            selected[theme].append((source, text))
+            used_chars += len(text)
+
+    parts = []
+    used = 0
+    cited = set()
+    for theme, chunks in selected.items():
+        if not chunks:
+            continue
+        parts.append(f"\n\n### {theme}")
+        for source, text in chunks:
+            parts.append(f"\n--- From {source} ---\n{text}")
+            used += 1
+            cited.add(source)
+    context = "".join(parts)
+
+    stats.update({
+        "papers": len(sources),
+        "papers_cited": len(cited),
+        "chunks_in_context": used,
+        "budget_tokens": budget,
+        "context_tokens": estimate_tokens(context),
+    })
+    return context, stats
@@ -0,0 +1,114 @@
+import os
+import json
+import threading
+import numpy as np
+from langchain.schema import Document
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+class NumpyVectorIndex:
+    """
+    In-process cosine-similarity index for small stores.
+
+    Unit-length float32 vectors are saved to vectors.npy and memory-mapped on load; chunk IDs,
+    sources and texts go to chunks.json. A query batch is answered with one matrix product
+    and a partial sort per query, so a session's index is searched in milliseconds.
+    Changes are kept in memory until save().
+    """
+
+    def __init__(self, path: str, embedding_function):
+        self.path = path
+        self.embedding_function = embedding_function
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+        self._vectors_path = os.path.join(path, "vectors.npy")
+        self._chunks_path = os.path.join(path, "chunks.json")
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self._chunks_path, "r", encoding="utf-8") as f:
+                chunks = json.load(f)
+            vectors = np.load(self._vectors_path, mmap_mode="r")
+        except (OSError, ValueError):
+            chunks, vectors = {"ids": [], "sources": [], "texts": []}, None
+        self.ids = chunks["ids"]
+        self.sources = chunks["sources"]
+        self.texts = chunks["texts"]
+        self.vectors = vectors if vectors is not None and len(vectors) == len(self.ids) and len(vectors) else None
+        if self.vectors is None:
+            self.ids, self.sources, self.texts = [], [], []
+        self._sources = np.array(self.sources, dtype=object)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add_documents(self, documents: list, ids: list):
+        vectors = _normalize(np.asarray(
+            self.embedding_function.embed_documents([doc.page_content for doc in documents]), dtype=np.float32
+        ))
+        with self._lock:
+            self.vectors = vectors if self.vectors is None else np.concatenate([self.vectors, vectors])
+            self.ids.extend(ids)
+            self.sources.extend(doc.metadata.get("source") for doc in documents)
+            self.texts.extend(doc.page_content for doc in documents)
+            self._sources = np.array(self.sources, dtype=object)
+
+    def delete(self, ids: list):
+        removed = set(ids)
+        with self._lock:
+            keep = [index for index, chunk_id in enumerate(self.ids) if chunk_id not in removed]
+            if len(keep) == len(self.ids):
+                return
+            self.vectors = self.vectors[keep] if keep else None
+            self.ids = [self.ids[index] for index in keep]
+            self.sources = [self.sources[index] for index in keep]
+            self.texts = [self.texts[index] for index in keep]
+            self._sources = np.array(self.sources, dtype=object)
+
+    def save(self):
+        """Writes both files atomically and maps the saved vectors"""
+        with self._lock:
+            vectors = self.vectors if self.vectors is not None else np.zeros((0, 0), dtype=np.float32)
+            with open(self._vectors_path + ".tmp", "wb") as f:
+                np.save(f, np.ascontiguousarray(vectors, dtype=np.float32))
+            with open(self._chunks_path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump({"ids": self.ids, "sources": self.sources, "texts": self.texts}, f)
+            os.replace(self._vectors_path + ".tmp", self._vectors_path)
+            os.replace(self._chunks_path + ".tmp", self._chunks_path)
+            if len(self.ids):
+                self.vectors = np.load(self._vectors_path, mmap_mode="r")
+
+    def search(self, vectors, k: int, sources=None) -> list:
+        """
+        Top-k chunks for each query vector, optionally restricted to the given sources.
+        Returns one [(Document, cosine distance)] list per query, best match first.
+        """
+        queries = _normalize(np.asarray(vectors, dtype=np.float32))
+        with self._lock:
+            if self.vectors is None or not len(self.ids):
+                return [[] for _ in queries]
+            matrix, ids, chunk_sources, texts = self.vectors, self.ids, self.sources, self.texts
+            allowed = np.isin(self._sources, list(sources)) if sources is not None else None
+
+        scores = queries @ matrix.T
+        if allowed is not None:
+            scores[:, ~allowed] = -np.inf
+        k = min(k, len(ids))
+        # Partial sort for the k best columns of every row, then order just those
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+
+        results = []
+        for row, columns in enumerate(np.take_along_axis(top, order, axis=1)):
+            results.append([
+                (Document(page_content=texts[column], metadata={"source": chunk_sources[column], "chunk_id": ids[column]}),
+                 float(1 - scores[row, column]))
+                for column in columns if scores[row, column] > -np.inf
+            ])
+        return results
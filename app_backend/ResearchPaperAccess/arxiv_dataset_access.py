@@ -2,11 +2,141 @@
 @author:Rahul parida
 date:11/02/2025 23.34'''
 
-import arxiv
+import os
 import time
+import arxiv
+import threading
+import requests
+from cachetools import TTLCache # type: ignore
+import metrics
+
+# arXiv asks for 3 seconds between requests; a local stand-in (see benchmarks/) can use another URL and no delay
+ARXIV_API_URL = os.getenv("ARXIV_API_URL")
+ARXIV_DELAY_SECONDS = float(os.getenv("ARXIV_DELAY_SECONDS", 3.0))
+
+# The arxiv package sends its requests without a timeout, so a hung page would hold its thread forever
+ARXIV_REQUEST_TIMEOUT = float(os.getenv("ARXIV_REQUEST_TIMEOUT", 15))
+
+
+class _TimeoutSession(requests.Session):
+    """Session that gives every request sent without a timeout ARXIV_REQUEST_TIMEOUT"""
+
+    def request(self, method, url, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = ARXIV_REQUEST_TIMEOUT
+        return super().request(method, url, **kwargs)
+
+
+class _Client(arxiv.Client):
+    """arxiv.Client that sends its page requests through a session of ours; arxiv.Client takes no timeout"""
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        self._session = _TimeoutSession()
+
+
+#Initialize arXiv client, shared by every search function
+client = _Client(page_size=50, delay_seconds=ARXIV_DELAY_SECONDS, num_retries=3)
+if ARXIV_API_URL:
+    client.query_url_format = ARXIV_API_URL + "?{}"
+
+# Query results are kept for a while so repeated searches skip the network
+CACHE_TTL_SECONDS = 15 * 60
+_query_cache = TTLCache(maxsize=256, ttl=CACHE_TTL_SECONDS)
+_id_cache = TTLCache(maxsize=4096, ttl=CACHE_TTL_SECONDS)
+_cache_lock = threading.Lock()
+cache_stats = {"hits": 0, "misses": 0}
+
+ID_BATCH_SIZE = 100
+
+
+class _CachedResults:
+    """
+    Results of one arXiv query, fetched a page at a time as callers consume them.
+    Every caller of the same query shares the pages already fetched, and a caller that
+    wants more results than the previous one continues from where the last page ended.
+    """
+
+    def __init__(self, search: arxiv.Search):
+        self._source = client.results(search)
+        self._items = []
+        self._exhausted = False
+        self._lock = threading.Lock()
+
+    def iterate(self, limit: int = None):
+        index = 0
+        while limit is None or index < limit:
+            with self._lock:
+                if index >= len(self._items):
+                    if self._exhausted:
+                        return
+                    try:
+                        result = next(self._source)
+                    except StopIteration:
+                        self._exhausted = True
+                        return
+                    self._items.append(result)
+                    _cache_ids([result])
+                item = self._items[index]
+            yield item
+            index += 1
+
+
+def _cache_ids(results) -> dict:
+    """Caches results under their versioned and bare IDs for search_by_ids; returns them keyed the same way"""
+    by_id = {}
+    for result in results:
+        short_id = result.get_short_id()
+        by_id[short_id] = result
+        by_id.setdefault(short_id.rsplit("v", 1)[0], result)
+    with _cache_lock:
+        _id_cache.update(by_id)
+    return by_id
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def _query(query: str, max_results: int, sort_by=arxiv.SortCriterion.SubmittedDate):
+    """Lazy generator over the cached results of an arXiv query string."""
+    key = (query, sort_by)
+    with _cache_lock:
+        entry = _query_cache.get(key)
+        cache_hit = entry is not None
+        if entry is None:
+            cache_stats["misses"] += 1
+            # No max_results here: the entry serves any later request for more results
+            entry = _CachedResults(arxiv.Search(query=query, max_results=None, sort_by=sort_by))
+            _query_cache[key] = entry
+        else:
+            cache_stats["hits"] += 1
+
+    # Only time spent fetching counts towards the query latency, not time the caller spends between results
+    busy = 0.0
+    results = 0
+    items = entry.iterate(max_results)
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(items)
+            except StopIteration:
+                break
+            finally:
+                busy += time.perf_counter() - start
+            results += 1
+            yield item
+    except Exception:
+        # A failed page fetch leaves the underlying generator closed; drop it so the next call retries
+        with _cache_lock:
+            if _query_cache.get(key) is entry:
+                del _query_cache[key]
+        metrics.incr("arxiv.query.errors")
+        raise
+    finally:
+        metrics.record("arxiv.query", busy, results=results, cache_hits=int(cache_hit))
 
-#Initialize arXiv client
-client = arxiv.Client()
 
 def search_by_title(title: str, max_results: int = 15):
     """
@@ -14,21 +144,12 @@ def search_by_title(title: str, max_results: int = 15):
 
     Args:
         title (str): The title or keywords to search for in the paper titles.
-        max_results (int, optional): The maximum number of results to retrieve. Default is 5.
+        max_results (int, optional): The maximum number of results to retrieve. Default is 15.
 
     Returns:
-        None: Prints the paper details including title, authors, publication date, and PDF link.
+        Iterator[arxiv.Result]: Lazily fetched results, newest first.
     """
-    start_time = time.time()
-    search = arxiv.Search(
-        query=f'ti:"{title}"', 
-        max_results=max_results,
-        sort_by=arxiv.SortCriterion.SubmittedDate
-    )
-    final_result = []
-    for result in client.results(search):
-        final_result.append(result)
-    return final_result
+    return _query(f'ti:"{_normalize(title)}"', max_results)
 
 def search_by_author(author: str, max_results: int = 5):
     """
@@ -39,15 +160,9 @@ def search_by_author(author: str, max_results: int = 5):
         max_results (int, optional): The maximum number of results to retrieve. Default is 5.
 
     Returns:
-        None: Prints the paper details including title, authors, publication date, and PDF link.
+        Iterator[arxiv.Result]: Lazily fetched results, newest first.
     """
-    start_time = time.time()
-    search = arxiv.Search(
-        query=f'au:"{author}"', 
-        max_results=max_results,
-        sort_by=arxiv.SortCriterion.SubmittedDate
-    )
-
+    return _query(f'au:"{_normalize(author)}"', max_results)
 
 
 def search_by_category(category: str, max_results: int = 5):
@@ -59,13 +174,9 @@ def search_by_category(category: str, max_results: int = 5):
         max_results (int, optional): The maximum number of results to retrieve. Default is 5.
 
     Returns:
-        None: Prints the paper details including title, authors, publication date, and PDF link.
+        Iterator[arxiv.Result]: Lazily fetched results, newest first.
     """
-    search = arxiv.Search(
-        query=f'cat:{category}', 
-        max_results=max_results,
-        sort_by=arxiv.SortCriterion.SubmittedDate
-    )
+    return _query(f'cat:{category.strip()}', max_results)
 
 def search_by_abstract(keyword: str, max_results: int = 5):
     """
@@ -76,13 +187,40 @@ def search_by_abstract(keyword: str, max_results: int = 5):
         max_results (int, optional): The maximum number of results to retrieve. Default is 5.
 
     Returns:
-        None: Prints the paper details including title, authors, publication date, and PDF link.
+        Iterator[arxiv.Result]: Lazily fetched results, newest first.
+    """
+    return _query(f'abs:"{_normalize(keyword)}"', max_results)
+
+
+def search_by_ids(paper_ids: list):
+    """
+    Retrieve many research papers on arXiv by their IDs.
+    IDs not already cached are fetched together, ID_BATCH_SIZE per request.
+
+    Args:
+        paper_ids (list): arXiv IDs, with or without version (e.g., "2401.12345" or "2401.12345v2").
+
+    Returns:
+        list[arxiv.Result]: The papers found, in the order of paper_ids.
     """
-    search = arxiv.Search(
-        query=f'abs:"{keyword}"', 
-        max_results=max_results,
-        sort_by=arxiv.SortCriterion.SubmittedDate
-    )
+    paper_ids = [paper_id.strip() for paper_id in paper_ids]
+    with _cache_lock:
+        found = {paper_id: _id_cache[paper_id] for paper_id in paper_ids if paper_id in _id_cache}
+        cache_stats["hits"] += len(found)
+    missing = list(dict.fromkeys(paper_id for paper_id in paper_ids if paper_id not in found))
+
+    for start in range(0, len(missing), ID_BATCH_SIZE):
+        batch = missing[start:start + ID_BATCH_SIZE]
+        search = arxiv.Search(id_list=batch, max_results=len(batch))
+        with metrics.timed("arxiv.ids", ids=len(batch)) as span:
+            fetched = _cache_ids(client.results(search))
+            span["results"] = sum(1 for paper_id in batch if paper_id in fetched)
+
+        with _cache_lock:
+            cache_stats["misses"] += 1
+        found.update((paper_id, fetched[paper_id]) for paper_id in batch if paper_id in fetched)
+
+    return [found[paper_id] for paper_id in paper_ids if paper_id in found]
 
 
 def search_by_id(paper_id: str):
@@ -93,7 +231,7 @@ def search_by_id(paper_id: str):
         paper_id (str): The unique identifier of the paper (e.g., "2401.12345").
 
     Returns:
-        None: Prints the paper details including title, authors, publication date, and PDF link.
+        arxiv.Result: The paper, or None if arXiv does not know the ID.
     """
-    start_time = time.time()
-    search = arxiv.Search(id_list=[paper_id])
\ No newline at end of file
+    results = search_by_ids([paper_id])
+    return results[0] if results else None
@@ -0,0 +1,335 @@
+import os
+import re
+import time
+import queue
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor, wait
+from ResearchPaperAccess.arxiv_dataset_access import search_by_title
+from ResearchPaperAccess.openAlex_dataset_access import client as openalex_client, normalize_doi
+import metrics
+
+# Each source gets this long; a slower source contributes the hits it has by then and is stopped
+SOURCE_TIMEOUT_SECONDS = float(os.getenv("SEARCH_SOURCE_TIMEOUT", 15))
+RRF_K = 60  # Reciprocal rank fusion constant
+
+# Results asked of each source by default, and the most one search may ask for
+SEARCH_MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", 15))
+SEARCH_MAX_RESULTS_LIMIT = int(os.getenv("SEARCH_MAX_RESULTS_LIMIT", 500))
+
+_ARXIV_URL = re.compile(r"arxiv\.org/(?:abs|pdf)/([^\s?#]+?)(?:\.pdf)?$", re.IGNORECASE)
+
+
+@dataclass
+class PaperRecord:
+    """A search hit from any source, normalized to the fields the rest of the pipeline uses."""
+    title: str
+    summary: str = ""
+    authors: list = field(default_factory=list)
+    published: str = None
+    year: int = None
+    venue: str = None
+    doi: str = None
+    arxiv_id: str = None
+    openalex_id: str = None
+    pdf_url: str = None
+    sources: list = field(default_factory=list)
+    score: float = 0.0
+
+    @property
+    def key(self) -> str:
+        """Stable catalog key: the arXiv ID when there is one, otherwise the DOI or OpenAlex ID."""
+        if self.arxiv_id:
+            return self.arxiv_id
+        if self.doi:
+            return f"doi:{self.doi}"
+        return f"openalex:{self.openalex_id}"
+
+
+def normalize_title(title: str) -> str:
+    return " ".join(re.findall(r"[a-z0-9]+", (title or "").lower()))
+
+
+def base_arxiv_id(arxiv_id: str) -> str:
+    return re.sub(r"v\d+$", "", arxiv_id) if arxiv_id else None
+
+
+def arxiv_version(arxiv_id: str) -> int:
+    """2 for "2401.12345v2"; 0 when the ID has no version"""
+    match = re.search(r"v(\d+)$", arxiv_id or "")
+    return int(match.group(1)) if match else 0
+
+
+def from_arxiv(result) -> PaperRecord:
+    return PaperRecord(
+        title=result.title,
+        summary=result.summary or "",
+        authors=[author.name for author in result.authors],
+        published=result.published.isoformat() if result.published else None,
+        year=result.published.year if result.published else None,
+        venue=result.journal_ref or "arXiv",
+        doi=normalize_doi(result.doi),
+        arxiv_id=result.get_short_id(),
+        pdf_url=result.pdf_url,
+        sources=["arxiv"],
+    )
+
+
+def _abstract_from_index(inverted_index: dict) -> str:
+    if not inverted_index:
+        return ""
+    positions = [(position, word) for word, indexes in inverted_index.items() for position in indexes]
+    return " ".join(word for _, word in sorted(positions))
+
+
+def from_openalex(work: dict) -> PaperRecord:
+    arxiv_id = None
+    pdf_url = None
+    for location in (work.get("best_oa_location"), work.get("primary_location")):
+        if not location:
+            continue
+        for url in (location.get("landing_page_url"), location.get("pdf_url")):
+            match = _ARXIV_URL.search(url or "")
+            if match and not arxiv_id:
+                arxiv_id = match.group(1)
+        pdf_url = pdf_url or location.get("pdf_url")
+
+    return PaperRecord(
+        title=work.get("title") or "",
+        summary=_abstract_from_index(work.get("abstract_inverted_index")),
+        authors=[authorship["author"]["display_name"] for authorship in work.get("authorships") or []],
+        published=work.get("publication_date"),
+        year=work.get("publication_year"),
+        venue=((work.get("primary_location") or {}).get("source") or {}).get("display_name"),
+        doi=normalize_doi(work.get("doi")),
+        arxiv_id=arxiv_id,
+        openalex_id=(work.get("id") or "").rsplit("/", 1)[-1] or None,
+        pdf_url=pdf_url,
+        sources=["openalex"],
+    )
+
+
+def _merge(into: PaperRecord, other: PaperRecord):
+    """Fill gaps in one record from a duplicate found by another source."""
+    # Versions of one arXiv paper collapse into the latest, with that version's metadata
+    if (into.arxiv_id and other.arxiv_id and base_arxiv_id(into.arxiv_id) == base_arxiv_id(other.arxiv_id)
+            and arxiv_version(other.arxiv_id) > arxiv_version(into.arxiv_id)):
+        for name in ("arxiv_id", "title", "summary", "published", "pdf_url"):
+            setattr(into, name, getattr(other, name) or getattr(into, name))
+    for name in ("summary", "published", "year", "venue", "doi", "arxiv_id", "openalex_id", "pdf_url"):
+        if not getattr(into, name) and getattr(other, name):
+            setattr(into, name, getattr(other, name))
+    if not into.authors:
+        into.authors = other.authors
+    into.sources = sorted(set(into.sources) | set(other.sources))
+    into.score += other.score
+
+
+def merge_results(ranked_lists: list) -> list:
+    """
+    De-duplicates records across sources by DOI, arXiv ID and normalized title,
+    and ranks the merged records by reciprocal rank fusion.
+    """
+    merged = _Deduplicator()
+    for records in ranked_lists:
+        for rank, record in enumerate(records):
+            record.score = 1.0 / (RRF_K + rank + 1)
+            merged.add(record)
+    return sorted(merged.records, key=lambda record: record.score, reverse=True)
+
+
+class _Deduplicator:
+    """Records seen so far, indexed by DOI, arXiv ID and normalized title."""
+
+    def __init__(self):
+        self.records = []
+        self._index = {}  # dedup key -> position in records
+
+    def add(self, record: PaperRecord) -> tuple:
+        """Returns (record, is_new): the record itself if unseen, else the earlier record it was merged into."""
+        keys = [
+            f"doi:{record.doi}" if record.doi else None,
+            f"arxiv:{base_arxiv_id(record.arxiv_id)}" if record.arxiv_id else None,
+            f"title:{normalize_title(record.title)}" if normalize_title(record.title) else None,
+        ]
+        keys = [key for key in keys if key]
+        position = next((self._index[key] for key in keys if key in self._index), None)
+        is_new = position is None
+        if is_new:
+            position = len(self.records)
+            self.records.append(record)
+        else:
+            _merge(self.records[position], record)
+        for key in keys:
+            self._index.setdefault(key, position)
+        return self.records[position], is_new
+
+
+# Each source appends to hits as its pages arrive, so a source that runs past the timeout still
+# contributes the results it already fetched. Sources stop asking for pages once the deadline
+# (a time.monotonic() value) has passed, so an abandoned search does not keep paging in the background
+def _search_arxiv(query: str, max_results: int, hits: list, deadline: float) -> list:
+    for result in search_by_title(query, max_results):
+        hits.append(from_arxiv(result))
+        # A large max_results takes many rate-limited pages
+        if time.monotonic() >= deadline:
+            break
+    return hits
+
+
+def _search_openalex(query: str, max_results: int, hits: list, deadline: float) -> list:
+    for work in openalex_client.iter_works(search=query, max_results=max_results, deadline=deadline):
+        hits.append(from_openalex(work))
+    return hits
+
+
+def _source_result(future, hits: list, seconds: float, in_time: bool = True) -> tuple:
+    """
+    (records, stats) of one source; a source still running, or one that stopped at the deadline,
+    keeps the hits it has so far (status "partial")
+    """
+    if not future.done() or (not in_time and future.exception() is None):
+        records = list(hits)
+        return records, {"status": "partial" if records else "timeout", "seconds": seconds, "hits": len(records)}
+    try:
+        records = future.result()
+    except Exception as e:
+        # Pages fetched before the failure are still good
+        records = list(hits)
+        return records, {"status": "error", "error": str(e), "seconds": seconds, "hits": len(records)}
+    return records, {"status": "ok", "seconds": seconds, "hits": len(records)}
+
+
+SOURCES = {
+    "arxiv": _search_arxiv,
+    "openalex": _search_openalex,
+}
+
+
+class _StreamedHits(list):
+    """Hits list that also hands every hit to a queue, so they can be yielded as they arrive"""
+
+    def __init__(self, arrivals: queue.Queue):
+        super().__init__()
+        self.arrivals = arrivals
+
+    def append(self, record):
+        super().append(record)
+        self.arrivals.put(record)
+
+
+def _start_sources(query: str, max_results: int, sources, hits: dict, deadline: float) -> tuple:
+    """
+    Runs every source on an executor of its own, so an abandoned source never holds a worker that later
+    searches need. Returns (executor, futures, finished_at); the caller shuts the executor down.
+    """
+    finished_at = {}
+
+    def run(name):
+        try:
+            return SOURCES[name](query, max_results, hits[name], deadline)
+        finally:
+            finished_at[name] = time.monotonic()
+            if isinstance(hits[name], _StreamedHits):
+                hits[name].arrivals.put(None)
+
+    executor = ThreadPoolExecutor(max_workers=max(len(sources), 1), thread_name_prefix="search")
+    futures = {name: executor.submit(metrics.in_context(run), name) for name in sources}
+    return executor, futures, finished_at
+
+
+def _source_stats(name: str, future, hits: list, start: float, deadline: float, finished_at: dict) -> tuple:
+    finished = finished_at.get(name)
+    seconds = round((finished if future.done() and finished else deadline) - start, 3)
+    return _source_result(future, hits, seconds, in_time=finished is not None and finished < deadline)
+
+
+def federated_search(query: str, max_results: int = SEARCH_MAX_RESULTS, sources=("arxiv", "openalex"), timeout: float = SOURCE_TIMEOUT_SECONDS):
+    """
+    Queries every source concurrently and merges the results.
+
+    Args:
+        query (str): Keywords to search for.
+        max_results (int, optional): Results requested from each source. Default is SEARCH_MAX_RESULTS.
+        sources (tuple, optional): Names from SOURCES to query.
+        timeout (float, optional): Seconds to wait for the slowest source.
+
+    Returns:
+        tuple: (records, stats) where records are merged PaperRecords, best first, and stats
+               maps each source to its latency, hit count and status.
+    """
+    start = time.monotonic()
+    deadline = start + timeout
+    hits = {name: [] for name in sources}
+    executor, futures, finished_at = _start_sources(query, max_results, sources, hits, deadline)
+    try:
+        wait(futures.values(), timeout=timeout)
+    finally:
+        # A source still running stops at its next page; queued ones never start
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    ranked_lists = []
+    stats = {}
+    for name, future in futures.items():
+        records, stats[name] = _source_stats(name, future, hits[name], start, deadline, finished_at)
+        if records:
+            ranked_lists.append(records)
+
+    merged = merge_results(ranked_lists)
+    stats["merged"] = len(merged)
+    stats["seconds"] = round(time.monotonic() - start, 3)
+    return merged, stats
+
+
+def iter_federated_search(query: str, max_results: int = SEARCH_MAX_RESULTS, sources=("arxiv", "openalex"), timeout: float = SOURCE_TIMEOUT_SECONDS):
+    """
+    Streaming variant of federated_search. arXiv hits are yielded as its paged search produces them,
+    while the other sources run in the background; their hits follow once arXiv is drained.
+    Every source runs off the caller's thread, so a hung page never holds the stream past the timeout.
+
+    Yields:
+        tuple: ("record", record, is_new) for each hit, where is_new is False when the hit was merged
+               into a record yielded earlier, and finally ("stats", stats, None).
+    """
+    start = time.monotonic()
+    deadline = start + timeout
+    hits = {name: [] for name in sources}
+    arrivals = queue.Queue()
+    if "arxiv" in hits:
+        hits["arxiv"] = _StreamedHits(arrivals)
+    executor, futures, finished_at = _start_sources(query, max_results, sources, hits, deadline)
+    merged = _Deduplicator()
+    stats = {}
+
+    try:
+        if "arxiv" in futures:
+            count = 0
+            while True:
+                try:
+                    record = arrivals.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if record is None:
+                    # The source has returned; let its future settle before reading its status
+                    wait([futures["arxiv"]], timeout=max(0.0, deadline - time.monotonic()))
+                    break
+                record.score = 1.0 / (RRF_K + count + 1)
+                count += 1
+                yield ("record",) + merged.add(record)
+            _, stats["arxiv"] = _source_stats("arxiv", futures["arxiv"], hits["arxiv"], start, deadline, finished_at)
+            stats["arxiv"]["hits"] = count
+
+        # Background sources get whatever is left of the timeout
+        background = {name: future for name, future in futures.items() if name != "arxiv"}
+        wait(background.values(), timeout=max(0.0, deadline - time.monotonic()))
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    for name, future in background.items():
+        records, stats[name] = _source_stats(name, future, hits[name], start, deadline, finished_at)
+        for rank, record in enumerate(records):
+            record.score = 1.0 / (RRF_K + rank + 1)
+            yield ("record",) + merged.add(record)
+
+    stats["merged"] = len(merged.records)
+    stats["seconds"] = round(time.monotonic() - start, 3)
+    yield ("stats", stats, None)
@@ -1,25 +1,134 @@
+import os
+import re
+import time
 import requests
-import urllib.parse
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import metrics
 
-def search_openalex(title, max_results=5):
-    base_url = "https://api.openalex.org/works"
-    query = urllib.parse.quote(title)
-    url = f"{base_url}?search={query}&per-page={max_results}"
+BASE_URL = os.getenv("OPENALEX_API_URL", "https://api.openalex.org")
 
-    print(f"\n🔍 Searching for: {title}\n")
+# Optional contact address; OpenAlex routes requests that carry one to its faster "polite pool"
+MAILTO = os.getenv("OPENALEX_MAILTO")
+
+# Exactly the fields federated_search.from_openalex reads, so each work is a fraction of its full size.
+# The abstract is the one large field; ranking, rating and near-duplicate detection all need it
+SELECT_FIELDS = (
+    "id,doi,title,publication_year,publication_date,authorships,"
+    "primary_location,best_oa_location,abstract_inverted_index"
+)
+
+MAX_PER_PAGE = 200  # OpenAlex page size limit
+
+
+def normalize_doi(doi: str) -> str:
+    """Bare, lower-case DOI ("10.1234/abc") from a DOI or a doi.org URL"""
+    if not doi:
+        return None
+    return re.sub(r"^https?://(dx\.)?doi\.org/", "", doi.strip(), flags=re.IGNORECASE).lower()
+
+
+class OpenAlexClient:
+    """
+    OpenAlex works API client with a pooled, retrying session and field projection.
+    """
+
+    def __init__(self, base_url: str = BASE_URL, mailto: str = MAILTO, timeout: float = 10):
+        self.base_url = base_url.rstrip("/")
+        self.mailto = mailto
+        self.timeout = timeout
+        self.session = requests.Session()
+        retry = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _params(self, **params) -> dict:
+        params = {key: value for key, value in params.items() if value is not None}
+        params["select"] = SELECT_FIELDS
+        if self.mailto:
+            params["mailto"] = self.mailto
+        return params
+
+    def _get(self, params: dict, timeout: float = None) -> dict:
+        with metrics.timed("openalex.request") as span:
+            response = self.session.get(f"{self.base_url}/works", params=params, timeout=timeout or self.timeout)
+            response.raise_for_status()
+            span["bytes"] = len(response.content)
+            return response.json()
+
+    def search(self, query: str, max_results: int = 5, timeout: float = None) -> list:
+        """Best matches for a free-text query, in one request when max_results fits a page"""
+        return list(self.iter_works(search=query, max_results=max_results, timeout=timeout))
 
-    response = requests.get(url)
-    data = response.json()
+    def iter_works(self, search: str = None, filter: str = None, max_results: int = None,
+                   per_page: int = MAX_PER_PAGE, timeout: float = None, deadline: float = None):
+        """
+        Lazily yields works page by page using cursor pagination.
+
+        Args:
+            search (str, optional): Free-text search.
+            filter (str, optional): OpenAlex filter expression, e.g. "publication_year:2024".
+            max_results (int, optional): Stop after this many works. Default is all matches.
+            per_page (int, optional): Page size, at most 200.
+            deadline (float, optional): time.monotonic() value after which no page is requested;
+                each page's timeout is cut to the time left.
+        """
+        per_page = min(per_page, MAX_PER_PAGE, max_results or MAX_PER_PAGE)
+        cursor = "*"
+        yielded = 0
+        while cursor:
+            page_timeout = timeout or self.timeout
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                page_timeout = min(page_timeout, remaining)
+            data = self._get(
+                self._params(search=search, filter=filter, cursor=cursor, **{"per-page": per_page}),
+                timeout=page_timeout,
+            )
+            for work in data.get("results") or []:
+                yield work
+                yielded += 1
+                if max_results and yielded >= max_results:
+                    return
+            cursor = (data.get("meta") or {}).get("next_cursor")
+            if not data.get("results"):
+                return
+
+
+# Shared client, so every search reuses the same connection pool
+client = OpenAlexClient()
+
+
+def search_openalex(title, max_results=5, timeout=10):
+    """
+    Search OpenAlex works by title or keywords.
+
+    Args:
+        title (str): The title or keywords to search for.
+        max_results (int, optional): The maximum number of results to retrieve. Default is 5.
+        timeout (float, optional): Seconds to wait for OpenAlex. Default is 10.
+
+    Returns:
+        list[dict]: OpenAlex work objects (projected to SELECT_FIELDS), best match first.
+    """
+    return client.search(title, max_results=max_results, timeout=timeout)
+
+
+def print_results(title, results):
+    print(f"\n🔍 Searching for: {title}\n")
 
-    if "results" not in data or not data["results"]:
+    if not results:
         print("❌ No results found.\n")
         return
 
-    for idx, item in enumerate(data["results"], 1):
+    for idx, item in enumerate(results, 1):
         title = item.get("title", "No title")
         authors = [author["author"]["display_name"] for author in item.get("authorships", [])]
         year = item.get("publication_year", "N/A")
-        venue = item.get("host_venue", {}).get("display_name", "Unknown Journal")
+        venue = ((item.get("primary_location") or {}).get("source") or {}).get("display_name", "Unknown Journal")
         doi = item.get("doi")
         url = doi if doi else item.get("id")
 
@@ -33,4 +142,4 @@ def search_openalex(title, max_results=5):
 # Example usage
 if __name__ == "__main__":
     paper_title = input("Enter a paper title to search: ")
-    search_openalex(paper_title)
+    print_results(paper_title, search_openalex(paper_title))
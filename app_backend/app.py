@@ -1,29 +1,89 @@
-from flask import Flask, request, jsonify # type: ignore
-import pandas as pd # type: ignore
+from flask import Flask, request, jsonify, Response, stream_with_context, g # type: ignore
+import os
+import json
 import time
-from ResearchPaperAccess.arxiv_dataset_access import search_by_title
-from llmCalls.llama_ratings import get_rating
+import itertools
+import metrics
+from ResearchPaperAccess.federated_search import (
+    federated_search, iter_federated_search, SOURCES, SEARCH_MAX_RESULTS, SEARCH_MAX_RESULTS_LIMIT,
+)
+from llmCalls.llama_ratings import get_rating, iter_ratings
 from llmCalls.llama_call_for_keyword import get_keyword_from_userquery
-from llmCalls.llama_call_for_heading import get_headings_from_llm
-from DownloadResearchPaper.get_papers import download_research_paper
-from RAG.create_database import generate_data_store
-from temp_pdf_to_txt import pdf_to_txt
+from llmCalls.llm_client import get_stats as get_llm_stats
+from llmCalls.llama_call_for_heading import get_headings_from_llm, get_headings_from_context
+from temp_pdf_to_txt import pdf_to_txt, get_cache_stats
+from corpus_store import get_corpus_store
+from jobs import JobManager, QueueFullError
+from session_store import SessionRegistry
+from paper_catalog import get_catalog
+
+# Downloading (aiohttp) and RAG indexing (LangChain, Chroma, embeddings) are imported inside the jobs
+# that use them, so the server starts quickly and a worker that only serves /search never loads them.
+# The paper catalog (get_catalog()) is opened on first use, so importing the app creates no database file.
 
 app = Flask(__name__)
 
-# Store session-like data
-data_store = {
-    "all_data": pd.DataFrame(),
-    "accepted_papers": []
-}
+# Long-running work (downloads, extraction, LLM outlines, indexing) runs here instead of in request threads
+job_manager = JobManager()
+
+
+def release_sessions(evicted):
+    """Queues the release of the papers each evicted session indexed, so the vector store drops the unheld ones"""
+    for session in evicted:
+        if session.indexed:
+            try:
+                job_manager.submit("release", release_job, session.id)
+            except QueueFullError:
+                # The papers stay in the store, unheld, until a later job releases or reindexes them
+                metrics.incr("sessions.release_dropped")
+
+
+def release_job(job, session_id):
+    from RAG.create_database import release_data_store
+
+    with job.stage("release"):
+        return release_data_store(session_id)
+
+
+# Per-client search results and accepted papers
+sessions = SessionRegistry(on_evict=release_sessions)
+
+
+@app.before_request
+def begin_trace():
+    g.trace, g.trace_token = metrics.start_trace(f"{request.method} {request.path}")
+    g.request_start = time.perf_counter()
+
+
+@app.after_request
+def add_trace_header(response):
+    if "trace" in g:
+        response.headers["X-Trace-ID"] = g.trace.id
+    return response
+
+
+@app.teardown_request
+def finish_trace(exc):
+    # For streamed responses this runs once the stream is done, so the trace covers the whole stream.
+    # stream_with_context can run it a second time; only the first run records and ends the trace
+    token = g.pop("trace_token", None)
+    if token is not None:
+        metrics.record(f"http.{request.endpoint}", time.perf_counter() - g.request_start)
+        metrics.end_trace(g.trace, token)
+
+
+def current_session():
+    """Session chosen by the X-Session-ID header (or a session_id field/arg); one shared default otherwise."""
+    session_id = request.headers.get("X-Session-ID") or request.args.get("session_id")
+    if not session_id and request.is_json:
+        session_id = (request.get_json(silent=True) or {}).get("session_id")
+    return sessions.get(session_id)
 
-folder_name = None
-keywords = None
 
 @app.route('/search', methods=['POST'])
 def search():
     try:
-        global keywords
+        session = current_session()
         data = request.json
         description = data.get("description")
         if description:
@@ -34,91 +94,440 @@ def search():
         if not keywords:
             return jsonify({"error": "Please provide keywords for search."}), 400
 
-        ar_responses = search_by_title(keywords)
-        ratings = get_rating(ar_responses)
-
-        data_list = []
-        for idx, response in enumerate(ar_responses):
-            paper_id = int(time.time()) + idx  # Unique ID
-            data_list.append({
-                "id": paper_id,
-                "Title": response.title,
-                "URL": response.pdf_url,
-                "Published": response.published,
-                "Rating": ratings.get(response.pdf_url, "N/A")
-            })
-
-        data_store["all_data"] = pd.DataFrame(data_list)
-        return jsonify({"papers": data_list})
+        sources = data.get("sources") or ["arxiv", "openalex"]
+        if not isinstance(sources, list) or any(not isinstance(name, str) or name not in SOURCES for name in sources):
+            return jsonify({"error": f"sources must be a list of source names: {', '.join(SOURCES)}."}), 400
+        sources = tuple(dict.fromkeys(sources))
+        try:
+            max_results = int(data.get("max_results") or SEARCH_MAX_RESULTS)
+        except (TypeError, ValueError):
+            return jsonify({"error": "max_results must be a number."}), 400
+        # Only the best lexical matches are rated by the LLM, so a wide search costs no more LLM calls
+        max_results = max(1, min(max_results, SEARCH_MAX_RESULTS_LIMIT))
+        if wants_stream():
+            return Response(
+                stream_with_context(stream_search(session, keywords, sources, max_results)),
+                mimetype="application/x-ndjson",
+            )
+
+        # A recent identical search is answered from the catalog without touching arXiv or OpenAlex
+        search_stats = {"catalog": True}
+        papers = get_catalog().cached_search(keywords, max_results, sources)
+        if papers is None:
+            records, search_stats = federated_search(keywords, max_results=max_results, sources=sources)
+            papers = get_catalog().upsert_results(records)
+            get_catalog().record_search(keywords, papers, requested_results(search_stats, max_results), sources)
+        search_stats["duplicates"] = flag_duplicates(papers)
+        shortlist = rank_results(keywords, papers)
+        search_stats["shortlisted"] = len(shortlist)
+
+        # Papers rated in any earlier search keep their rating; near-duplicates take their canonical paper's.
+        # Of the rest, only the shortlist goes to the LLM; the others keep just their relevance score
+        unrated = [paper for paper in papers if paper.rating is None]
+        if unrated:
+            to_rate, ratings, followers = plan_ratings(papers, shortlist)
+            search_stats["sent_for_rating"] = len(to_rate)
+            if to_rate:
+                ratings.update(get_rating(to_rate))
+            ratings = with_duplicates(ratings, followers)
+            new_ratings = {paper.arxiv_id: ratings[paper.arxiv_id] for paper in unrated if paper.arxiv_id in ratings}
+            get_catalog().set_ratings(new_ratings)
+            for paper in unrated:
+                paper.rating = new_ratings.get(paper.arxiv_id)
+
+        data_list = [paper.to_response() for paper in papers]
+
+        # Only this session's results are replaced
+        with session.lock:
+            session.keywords = keywords
+            session.replace_results(data_list)
+        return jsonify({"papers": data_list, "search_stats": search_stats})
+    except Exception as e:
+        return jsonify({"Error": str(e)}), 500
+
+
+def requested_results(search_stats: dict, max_results: int) -> int:
+    """max_results to store with a search; a search cut short by a slow source is not reused from the catalog"""
+    complete = all(stats.get("status") == "ok" for stats in search_stats.values() if isinstance(stats, dict))
+    return max_results if complete else 0
+
+
+def flag_duplicates(papers, results=None) -> int:
+    """
+    Marks older arXiv versions and near-duplicates (by title and abstract) with the id of the paper
+    they duplicate, in the catalog and in results (papers by default), which may hold papers checked earlier.
+    Returns how many of results are duplicates.
+    """
+    from dedup import get_paper_deduplicator
+
+    results = papers if results is None else results
+    with metrics.timed("dedup.search", papers=len(papers)) as span:
+        flags = get_paper_deduplicator().check(papers)
+        by_id = {paper.id: paper for paper in results}
+        changed = {
+            paper_id: canonical for paper_id, canonical in flags.items()
+            if paper_id not in by_id or by_id[paper_id].duplicate_of != canonical
+        }
+        if changed:
+            get_catalog().set_duplicates(changed)
+        for paper_id, canonical in flags.items():
+            if paper_id in by_id:
+                by_id[paper_id].duplicate_of = canonical
+        span["duplicates"] = sum(1 for paper in results if paper.duplicate_of is not None)
+    return span["duplicates"]
+
+
+def rank_results(keywords, papers) -> set:
+    """Sets each paper's lexical relevance to the keywords and returns the ids of the papers worth an LLM rating"""
+    from ranking import rank_papers
+
+    with metrics.timed("ranking.lexical", papers=len(papers)) as span:
+        relevance, shortlist = rank_papers(keywords, papers)
+        for paper in papers:
+            paper.relevance = relevance.get(paper.id)
+        span["shortlisted"] = len(shortlist)
+    return shortlist
+
+
+def plan_ratings(papers, shortlist=None) -> tuple:
+    """
+    Splits the unrated papers into those sent for rating and near-duplicates that take their canonical paper's rating.
+    With a shortlist (paper ids), papers outside it are neither sent nor inherit a pending rating.
+
+    Returns:
+        tuple: (to_rate, inherited, followers) where inherited maps arXiv ID to a rating copied from an already
+               rated canonical paper, and followers maps a canonical paper's arXiv ID to the duplicates
+               waiting for its rating.
+    """
+    in_results = {paper.id: paper for paper in papers}
+    outside = {
+        paper.duplicate_of for paper in papers
+        if paper.rating is None and paper.duplicate_of is not None and paper.duplicate_of not in in_results
+    }
+    canonicals = {**{paper.id: paper for paper in get_catalog().get_many(list(outside))}, **in_results}
+
+    to_rate, inherited, followers = [], {}, {}
+    for paper in papers:
+        if paper.rating is not None:
+            continue
+        canonical = canonicals.get(paper.duplicate_of)
+        if canonical is not None and canonical.rating is not None:
+            inherited[paper.arxiv_id] = canonical.rating
+        elif canonical is not None and canonical.id in in_results:
+            followers.setdefault(canonical.arxiv_id, []).append(paper)
+        elif shortlist is None or paper.id in shortlist:
+            to_rate.append(paper)
+    return to_rate, inherited, followers
+
+
+def with_duplicates(ratings: dict, followers: dict) -> dict:
+    """ratings plus the same rating for each duplicate following a rated paper"""
+    expanded = dict(ratings)
+    for key, rating in ratings.items():
+        for duplicate in followers.get(key, []):
+            expanded[duplicate.arxiv_id] = rating
+    return expanded
+
+
+def wants_stream():
+    return request.args.get("stream") in ("1", "true") or request.accept_mimetypes.best == "application/x-ndjson"
+
+
+def stream_search(session, keywords, sources, max_results=SEARCH_MAX_RESULTS):
+    """
+    NDJSON events for a streaming /search, one JSON object per line:
+    {"event": "paper"} as each paper arrives, {"event": "relevance"} with every paper's lexical score once
+    all have arrived, {"event": "ratings"} as each rating batch completes for the shortlisted papers,
+    then {"event": "done"} with the search stats, or {"event": "error"}.
+    A paper event with "replaces" swaps out an earlier paper, e.g. for a newer arXiv version of it.
+    Near-duplicate flags can change as later papers arrive; "done" carries the final ones.
+    """
+    def event(kind, **fields):
+        return json.dumps({"event": kind, **fields}) + "\n"
+
+    try:
+        search_stats = {"catalog": True}
+        papers = get_catalog().cached_search(keywords, max_results, sources)
+        if papers is not None:
+            flag_duplicates(papers)
+            for paper in papers:
+                yield event("paper", paper=paper.to_response())
+        else:
+            papers, seen, positions = [], set(), {}
+            for kind, record, is_new in iter_federated_search(keywords, max_results=max_results, sources=sources):
+                if kind == "stats":
+                    search_stats = record
+                    continue
+                # Merged duplicates are stored again so the catalog picks up the fields they add
+                paper = get_catalog().upsert_results([record])[0]
+                if is_new and paper.id not in seen:
+                    seen.add(paper.id)
+                    positions[id(record)] = len(papers)
+                    papers.append(paper)
+                    flag_duplicates([paper], papers)
+                    yield event("paper", paper=paper.to_response())
+                elif not is_new and id(record) in positions and paper.id not in seen:
+                    # The merge moved the record to a newer arXiv version, which is a new catalog paper
+                    replaced = papers[positions[id(record)]]
+                    seen.add(paper.id)
+                    papers[positions[id(record)]] = paper
+                    flag_duplicates([paper], papers)
+                    yield event("paper", paper=paper.to_response(), replaces=replaced.id)
+            get_catalog().record_search(keywords, papers, requested_results(search_stats, max_results), sources)
+        search_stats["duplicates"] = sum(1 for paper in papers if paper.duplicate_of is not None)
+        shortlist = rank_results(keywords, papers)
+        search_stats["shortlisted"] = len(shortlist)
+
+        # Results can be accepted while ratings are still coming in
+        with session.lock:
+            session.keywords = keywords
+            session.replace_results([paper.to_response() for paper in papers])
+        yield event("relevance", relevance=[{"id": paper.id, "Relevance": paper.relevance} for paper in papers])
+
+        unrated = [paper for paper in papers if paper.rating is None]
+        by_key = {paper.arxiv_id: paper for paper in unrated}
+        to_rate, inherited, followers = plan_ratings(papers, shortlist)
+        search_stats["sent_for_rating"] = len(to_rate)
+        # Ratings copied from canonical papers go out first, like cached ones
+        for completed in itertools.chain([inherited] if inherited else [], iter_ratings(to_rate)):
+            completed = {key: rating for key, rating in with_duplicates(completed, followers).items() if key in by_key}
+            get_catalog().set_ratings(completed)
+            for key, rating in completed.items():
+                by_key[key].rating = rating
+            yield event("ratings", ratings=[
+                {"id": by_key[key].id, "ArxivID": key, "Rating": rating} for key, rating in completed.items()
+            ])
+
+        with session.lock:
+            session.replace_results([paper.to_response() for paper in papers])
+        yield event("done", count=len(papers), search_stats=search_stats, duplicates={
+            paper.id: paper.duplicate_of for paper in papers if paper.duplicate_of is not None
+        })
     except Exception as e:
-        return jsonify({"Error":e})
+        yield event("error", error=str(e))
 
 
 @app.route('/accept', methods=['POST'])
 def accept_papers():
-    global folder_name
+    session = current_session()
     data = request.json
     paper_ids = data.get("ids")  # Expecting a list of IDs
 
     if not paper_ids or not isinstance(paper_ids, list):
         return jsonify({"error": "Please provide a list of paper IDs to accept."}), 400
 
-    print("All Papers Data:\n", data_store["all_data"])
-
-    # Filter papers with matching IDs
-    papers = data_store["all_data"][data_store["all_data"]["id"].isin(paper_ids)]
+    accepted, skipped, unknown = session.accept(paper_ids)
 
-    if papers.empty:
+    if not accepted and not skipped:
         return jsonify({"error": "No valid paper IDs found."}), 404
+    # Nothing new to download: no job, and the session keeps its current folder
+    if not accepted:
+        return jsonify({"message": "0 papers accepted.", "accepted_papers": [], "skipped_ids": skipped}), 200
 
-    accepted = []
-    skipped = []
+    try:
+        job = job_manager.submit("accept", download_job, session, accepted, skipped)
+    except QueueFullError as e:
+        # The papers were never queued for download, so a retry must be able to accept them
+        session.release(accepted)
+        return jsonify({"error": str(e)}), 503
+    return job_response(job)
 
-    for _, row in papers.iterrows():
-        paper = row.to_dict()
-        if paper not in data_store["accepted_papers"]:
-            data_store["accepted_papers"].append(paper)
-            accepted.append(paper)
-        else:
-            skipped.append(paper["id"])
 
-    folder_name = download_research_paper(accepted)
+def submit_job(kind, fn, *args):
+    """Queue a background job and answer with its ID and polling URLs."""
+    try:
+        job = job_manager.submit(kind, fn, *args)
+    except QueueFullError as e:
+        return jsonify({"error": str(e)}), 503
+    return job_response(job)
 
+
+def job_response(job):
     return jsonify({
-        "message": f"{len(accepted)} papers accepted.",
-        "accepted_papers": accepted,
-        "skipped_ids": skipped
-    })
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/jobs/{job.id}",
+        "result_url": f"/jobs/{job.id}/result"
+    }), 202
 
-@app.route("/get_headings_rag", methods=['POST'])
-def get_headings():
-    if not folder_name:
-        return jsonify({"Please Accept Ids or give Description to get the headings."}), 405
+
+def catalog_keys(papers) -> dict:
+    """Maps the file stem each paper is saved under (its sanitized key) back to its catalog key"""
+    from DownloadResearchPaper.get_papers import paper_key
+    return {paper_key(paper["URL"], paper.get("ArxivID")): paper.get("ArxivID") for paper in papers}
+
+
+def download_job(job, session, accepted, skipped):
+    from DownloadResearchPaper.get_papers import download_research_paper, new_download_folder, paper_key
+
+    # Every batch goes into the session's one folder, so headings and RAG see all the papers it accepted
+    with session.lock:
+        session.download_folder = session.download_folder or new_download_folder()
+        folder_name = session.download_folder
+    try:
+        with job.stage("download"):
+            _, download_stats = download_research_paper(accepted, on_progress=job.set_progress, folder_name=folder_name)
+    except Exception:
+        # Nothing was downloaded, so a retry must be able to accept the papers again
+        session.release(accepted)
+        raise
+
+    keys = catalog_keys(accepted)
+    saved = {
+        os.path.splitext(stats["file"])[0]: os.path.join(folder_name, stats["file"])
+        for stats in download_stats
+        if stats["status"] in (200, 206, "cached")
+    }
+    downloaded = {keys.get(stem): path for stem, path in saved.items()}
+    downloaded.pop(None, None)
+    get_catalog().set_paths("download_path", downloaded)
+    if saved:
+        with session.lock:
+            session.folder_name = folder_name
+
+    # Papers whose download failed are released like unqueued ones, so they can be accepted again and retried
+    failed = [paper for paper in accepted if paper_key(paper["URL"], paper.get("ArxivID")) not in saved]
+    session.release(failed)
+    failed_ids = [paper["id"] for paper in failed]
+
+    return {
+        "message": f"{len(accepted) - len(failed)} papers accepted.",
+        "accepted_papers": [paper for paper in accepted if paper["id"] not in failed_ids],
+        "skipped_ids": skipped,
+        "failed_ids": failed_ids,
+        "download_stats": download_stats
+    }
+
+
+def headings_rag_job(job, session, pdf_folder, keywords, papers):
+    from RAG.create_database import generate_data_store
+    from RAG.query_database import build_rag_context
 
     # Do PDF to txt first
-    pdf_to_txt(folder_name)
+    txt_folder, duplicates, paper_keys = extract_job_stage(job, pdf_folder, papers)
+
+    # Update Vector DB from txt folder; only new or changed papers are embedded, near-duplicates not at all.
+    # The session holds its papers in the shared store until it is evicted
+    with job.stage("index"):
+        index_stats = generate_data_store(txt_folder, skip_files=duplicates, paper_keys=paper_keys, holder=session.id)
+    with session.lock:
+        session.indexed = True
+
+    # Outline prompt built from the chunks retrieved for each section theme
+    with job.stage("retrieve"):
+        context, retrieval_stats = build_rag_context(txt_folder, keywords, skip_files=duplicates)
+    with job.stage("outline"):
+        headings = get_headings_from_context(keywords, context, stats=retrieval_stats)
+    return {"headings": headings, "index_stats": index_stats, "retrieval_stats": retrieval_stats,
+            "duplicates": duplicates}
 
-    # Create Vector DB from txt folder
-    generate_data_store()
+
+def extract_job_stage(job, pdf_folder, papers):
+    """
+    Converts the session's PDFs, adds the texts to the corpus store and records where each paper's text lives.
+    Returns (txt_folder, duplicates, paper_keys) where duplicates maps each near-duplicate text to the text it
+    duplicates and paper_keys maps each text file to the catalog key of the accepted paper it came from.
+    """
+    from dedup import find_duplicate_files
+
+    with job.stage("extract"):
+        txt_folder = pdf_to_txt(pdf_folder)
+        get_corpus_store().add_folder(txt_folder)
+    with job.stage("dedup"):
+        duplicates = find_duplicate_files(txt_folder)
+    # Files are named by the sanitized key, which only equals the catalog key for arXiv papers
+    keys = catalog_keys(papers)
+    paper_keys = {
+        filename: keys[os.path.splitext(filename)[0]]
+        for filename in os.listdir(txt_folder)
+        if filename.endswith(".txt") and keys.get(os.path.splitext(filename)[0])
+    }
+    get_catalog().set_paths("text_path", {key: os.path.join(txt_folder, filename) for filename, key in paper_keys.items()})
+    return txt_folder, duplicates, paper_keys
+
+
+def headings_job(job, pdf_folder, keywords, papers):
+    # Do PDF to txt first
+    txt_folder, duplicates, _ = extract_job_stage(job, pdf_folder, papers)
+
+    # Ask LLM to give the headings; near-duplicate papers are left out
+    with job.stage("outline"):
+        context_stats = {}
+        headings = get_headings_from_llm(txt_folder, keywords, stats=context_stats, skip_files=duplicates)
+    return {"headings": headings, "extraction_cache": get_cache_stats(), "context_stats": context_stats,
+            "duplicates": duplicates}
+
+
+@app.route("/get_headings_rag", methods=['POST'])
+def get_headings():
+    session = current_session()
+    if not session.folder_name:
+        return jsonify({"error": "Please Accept Ids or give Description to get the headings."}), 405
+
+    return submit_job("get_headings_rag", headings_rag_job, session, session.folder_name, session.keywords,
+                      session.accepted_papers())
 
 
 @app.route("/get_headings", methods=["POST"])
 def get_headings_llm():
-    global folder_name, keywords
-    if not folder_name:
-        return jsonify({"Please Accept Ids or give Description to get the headings."}), 405
+    session = current_session()
+    if not session.folder_name:
+        return jsonify({"error": "Please Accept Ids or give Description to get the headings."}), 405
+
+    return submit_job("get_headings", headings_job, session.folder_name, session.keywords, session.accepted_papers())
+
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job_status(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job ID."}), 404
+    return jsonify(job.to_dict())
+
+
+@app.route("/jobs/<job_id>/result", methods=["GET"])
+def get_job_result(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job ID."}), 404
+    if job.status == "failed":
+        return jsonify(job.to_dict()), 500
+    if job.status != "done":
+        return jsonify(job.to_dict()), 202
+    return jsonify(job.to_dict(include_result=True))
+
+
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    llm_stats = get_llm_stats()
+    llm_stats.pop("recent_calls", None)
+    return jsonify({
+        **metrics.registry.snapshot(),
+        "jobs": job_manager.stats(),
+        "extraction_cache": get_cache_stats(),
+        "corpus": get_corpus_store().stats(),
+        "llm": llm_stats,
+    })
 
-    # Do PDF to txt first
-    txt_folder = pdf_to_txt(folder_name)
 
-    # Ask LLM to give the headings
-    headings = get_headings_from_llm(txt_folder, keywords)
-    return ({"headings": headings})
+@app.route("/metrics/traces/<trace_id>", methods=["GET"])
+def get_trace(trace_id):
+    """Spans of a recent request (X-Trace-ID header) or job (its job ID)"""
+    trace = metrics.registry.get_trace(trace_id)
+    if trace is None:
+        return jsonify({"error": "Unknown or expired trace ID."}), 404
+    return jsonify(trace.to_dict())
 
 
 @app.route('/accepted_titles', methods=['GET'])
 def get_accepted_titles():
-    return jsonify({"accepted_papers": data_store["accepted_papers"]})
+    # Ratings and paths come from the catalog, so they reflect work done since the paper was accepted
+    paper_ids = [paper["id"] for paper in current_session().accepted_papers()]
+    accepted = [
+        {**paper.to_response(), "DownloadPath": paper.download_path, "TextPath": paper.text_path}
+        for paper in get_catalog().get_many(paper_ids)
+    ]
+    return jsonify({"accepted_papers": accepted})
 
 if __name__ == '__main__':
     app.run(debug=True)
@@ -0,0 +1,53 @@
+'''
+Synthetic PDF corpus for the benchmarks: deterministic papers of varying length,
+laid out like research papers so extraction and chunking see realistic text.
+'''
+
+import os
+import random
+import fitz # type: ignore
+
+# Page counts of the generated papers; the fake download server cycles through them
+DEFAULT_PAGE_COUNTS = (2, 6, 12, 24, 40)
+
+WORDS = (
+    "model learning data network training method results performance dataset approach "
+    "graph attention retrieval language neural evaluation baseline accuracy optimization "
+    "representation transformer feature inference benchmark robust efficient scalable "
+    "framework analysis experiment proposed task distribution loss gradient sample"
+).split()
+
+SECTIONS = ("Abstract", "Introduction", "Related Work", "Method", "Experiments", "Results", "Conclusion", "References")
+
+
+def _paragraph(rng: random.Random, sentences: int = 6) -> str:
+    return " ".join(
+        " ".join(rng.choice(WORDS) for _ in range(rng.randint(10, 20))).capitalize() + "."
+        for _ in range(sentences)
+    )
+
+
+def make_pdf(path: str, pages: int, seed: int = 0):
+    """Writes one synthetic paper with the given number of pages."""
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for number in range(pages):
+        page = doc.new_page()
+        # Spread the section headings over the pages, in paper order
+        section = SECTIONS[min(number * len(SECTIONS) // pages, len(SECTIONS) - 1)]
+        text = f"{section}\n\n" + "\n\n".join(_paragraph(rng) for _ in range(5))
+        page.insert_textbox(fitz.Rect(50, 50, 545, 790), text, fontsize=9)
+    doc.save(path)
+    doc.close()
+
+
+def build_corpus(folder: str, page_counts=DEFAULT_PAGE_COUNTS) -> list:
+    """Creates the corpus in folder (once) and returns the PDF paths, shortest first."""
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    for index, pages in enumerate(page_counts):
+        path = os.path.join(folder, f"synthetic_{pages:03d}p.pdf")
+        if not os.path.exists(path):
+            make_pdf(path, pages, seed=index)
+        paths.append(path)
+    return paths
@@ -0,0 +1,250 @@
+'''
+Local stand-ins for the external services the backend calls, served from one HTTP server:
+
+    GET  /api/query             arXiv Atom feed (point ARXIV_API_URL here)
+    GET  /works                 OpenAlex works JSON (OPENALEX_API_URL)
+    GET  /pdf/<id>              PDF downloads from the synthetic corpus, with Range support (416 past the end)
+    POST /v1/chat/completions   Together-compatible chat completions (LLM_BASE_URL)
+
+Responses are deterministic for a given query, so runs are comparable.
+'''
+
+import re
+import json
+import time
+import zlib
+import random
+import threading
+from urllib.parse import urlparse, parse_qs
+from xml.sax.saxutils import escape
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Vocabulary of the generated abstracts; each paper draws its own words, so abstracts are not near-duplicates
+ABSTRACT_WORDS = (
+    "model learning data network training method results performance dataset approach graph attention "
+    "retrieval language neural evaluation baseline accuracy optimization representation transformer feature "
+    "inference benchmark robust efficient scalable framework analysis experiment task distribution loss"
+).split()
+
+ATOM_HEADER = """<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom" xmlns:opensearch="http://a9.com/-/spec/opensearch/1.1/" xmlns:arxiv="http://arxiv.org/schemas/atom">
+<title>arXiv Query</title>
+<id>http://arxiv.org/api/benchmark</id>
+<updated>2024-01-01T00:00:00Z</updated>
+<opensearch:totalResults>{total}</opensearch:totalResults>
+<opensearch:startIndex>{start}</opensearch:startIndex>
+<opensearch:itemsPerPage>{count}</opensearch:itemsPerPage>
+"""
+
+ATOM_ENTRY = """<entry>
+<id>http://arxiv.org/abs/{arxiv_id}</id>
+<updated>2024-01-01T00:00:00Z</updated>
+<published>2024-01-01T00:00:00Z</published>
+<title>{title}</title>
+<summary>{summary}</summary>
+<author><name>Author {index}</name></author>
+<link href="http://arxiv.org/abs/{arxiv_id}" rel="alternate" type="text/html"/>
+<link title="pdf" href="{base_url}/pdf/{arxiv_id}" rel="related" type="application/pdf"/>
+<arxiv:primary_category term="cs.LG" scheme="http://arxiv.org/schemas/atom"/>
+<category term="cs.LG" scheme="http://arxiv.org/schemas/atom"/>
+</entry>
+"""
+
+
+class FakeServices:
+    """
+    Threaded HTTP server with configurable per-request latencies.
+
+    Args:
+        corpus (list): PDF paths served by /pdf/, picked by a hash of the requested ID.
+        results_per_query (int): Total hits for every arXiv query.
+        openalex_results (int): Hits for every OpenAlex query; half of them are arXiv papers.
+        search_latency, download_latency, llm_latency (float): Seconds added to each request of that kind.
+        llm_error_rate (float): Share of chat completions rejected with a 429, to exercise retries.
+    """
+
+    def __init__(self, corpus: list, results_per_query: int = 30, openalex_results: int = 10,
+                 search_latency: float = 0.02, download_latency: float = 0.01, llm_latency: float = 0.05,
+                 llm_error_rate: float = 0.0):
+        self.corpus = [open(path, "rb").read() for path in corpus]
+        self.results_per_query = results_per_query
+        self.openalex_results = openalex_results
+        self.search_latency = search_latency
+        self.download_latency = download_latency
+        self.llm_latency = llm_latency
+        self.llm_error_rate = llm_error_rate
+        self.requests = {"arxiv": 0, "openalex": 0, "pdf": 0, "llm": 0, "llm_rejected": 0}
+        self._rng = random.Random(0)
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self, port: int = 0) -> str:
+        services = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                services._handle_get(self)
+
+            def do_POST(self):
+                services._handle_post(self)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self.base_url
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def _count(self, kind: str):
+        with self._lock:
+            self.requests[kind] += 1
+
+    @staticmethod
+    def _send(handler, status: int, body: bytes, content_type: str, headers: dict = None):
+        handler.send_response(status)
+        handler.send_header("Content-Type", content_type)
+        handler.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    @staticmethod
+    def _paper_ids(query: str, count: int) -> list:
+        # Distinct queries get (mostly) distinct papers, the same query always the same ones
+        seed = zlib.crc32(query.encode()) % 90000
+        return [f"2401.{seed + i:05d}v1" for i in range(count)]
+
+    def _handle_get(self, handler):
+        url = urlparse(handler.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+
+        if url.path == "/api/query":
+            self._count("arxiv")
+            time.sleep(self.search_latency)
+            self._send(handler, 200, self._atom_feed(params).encode(), "application/atom+xml")
+        elif url.path == "/works":
+            self._count("openalex")
+            time.sleep(self.search_latency)
+            self._send(handler, 200, json.dumps(self._openalex(params)).encode(), "application/json")
+        elif url.path.startswith("/pdf/"):
+            self._count("pdf")
+            time.sleep(self.download_latency)
+            self._send_pdf(handler, url.path[len("/pdf/"):])
+        else:
+            self._send(handler, 404, b"not found", "text/plain")
+
+    def _atom_feed(self, params: dict) -> str:
+        query = params.get("search_query", "")
+        start = int(params.get("start", 0))
+        count = max(0, min(int(params.get("max_results", 10)), self.results_per_query - start))
+        ids = self._paper_ids(query, self.results_per_query)[start:start + count]
+        topic = re.sub(r"^\w+:", "", query).strip('"')
+        entries = "".join(
+            ATOM_ENTRY.format(
+                arxiv_id=arxiv_id, index=start + offset, base_url=self.base_url,
+                title=escape(f"{topic} study {start + offset}"),
+                summary=escape(self._abstract(topic, arxiv_id)),
+            )
+            for offset, arxiv_id in enumerate(ids)
+        )
+        return ATOM_HEADER.format(total=self.results_per_query, start=start, count=len(ids)) + entries + "</feed>"
+
+    @staticmethod
+    def _abstract(topic: str, arxiv_id: str) -> str:
+        rng = random.Random(zlib.crc32(arxiv_id.encode()))
+        return f"We study {topic}. " + " ".join(rng.choice(ABSTRACT_WORDS) for _ in range(60)) + "."
+
+    def _openalex(self, params: dict) -> dict:
+        query = params.get("search") or params.get("filter", "")
+        per_page = int(params.get("per-page", 25))
+        # Every other work is one of the arXiv hits, so the federated merge has duplicates to collapse
+        arxiv_ids = self._paper_ids(f'ti:"{query}"', self.openalex_results)
+        works = []
+        for index in range(min(per_page, self.openalex_results)):
+            work = {
+                "id": f"https://openalex.org/W{zlib.crc32(f'{query}{index}'.encode())}",
+                "doi": f"https://doi.org/10.5555/bench.{zlib.crc32(query.encode())}.{index}",
+                "title": f"{query} study {index}" if index % 2 == 0 else f"{query} journal article {index}",
+                "publication_year": 2024,
+                "publication_date": "2024-01-01",
+                "authorships": [{"author": {"display_name": f"Author {index}"}}],
+                "primary_location": {"source": {"display_name": "Benchmark Journal"}},
+                "best_oa_location": None,
+                "abstract_inverted_index": {"Benchmark": [0], "abstract": [1]},
+            }
+            if index % 2 == 0:
+                work["best_oa_location"] = {
+                    "landing_page_url": f"https://arxiv.org/abs/{arxiv_ids[index]}",
+                    "pdf_url": f"{self.base_url}/pdf/{arxiv_ids[index]}",
+                }
+            works.append(work)
+        return {"meta": {"count": len(works), "next_cursor": None}, "results": works}
+
+    def _send_pdf(self, handler, paper_id: str):
+        body = self.corpus[zlib.crc32(paper_id.encode()) % len(self.corpus)]
+        match = re.match(r"bytes=(\d+)-", handler.headers.get("Range") or "")
+        if match and int(match.group(1)) >= len(body):
+            # Nothing past the end: the client already has the whole file
+            self._send(handler, 416, b"", "application/pdf", {"Content-Range": f"bytes */{len(body)}"})
+        elif match:
+            start = int(match.group(1))
+            self._send(handler, 206, body[start:], "application/pdf",
+                       {"Content-Range": f"bytes {start}-{len(body) - 1}/{len(body)}"})
+        else:
+            self._send(handler, 200, body, "application/pdf")
+
+    def _handle_post(self, handler):
+        if urlparse(handler.path).path != "/v1/chat/completions":
+            self._send(handler, 404, b"not found", "text/plain")
+            return
+        self._count("llm")
+        request = json.loads(handler.rfile.read(int(handler.headers.get("Content-Length", 0))))
+        with self._lock:
+            rejected = self._rng.random() < self.llm_error_rate
+        if rejected:
+            self._count("llm_rejected")
+            body = {"error": {"message": "rate limit exceeded", "type": "rate_limit_error"}}
+            self._send(handler, 429, json.dumps(body).encode(), "application/json")
+            return
+        prompt = request["messages"][-1]["content"]
+        time.sleep(self.llm_latency)
+        content = self._completion(prompt)
+        body = {
+            "id": "bench", "object": "chat.completion", "created": int(time.time()), "model": request["model"],
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4,
+                      "total_tokens": (len(prompt) + len(content)) // 4},
+        }
+        self._send(handler, 200, json.dumps(body).encode(), "application/json")
+
+    @staticmethod
+    def _completion(prompt: str) -> str:
+        ids = re.findall(r"ID: (\S+)", prompt)
+        if ids:
+            return json.dumps({paper_id: zlib.crc32(paper_id.encode()) % 10 + 1 for paper_id in ids})
+        if '"sections"' in prompt:
+            return json.dumps({
+                "title": "Literature Review", "total_pages": 64,
+                "sections": [
+                    {"heading": f"{number}. Section {number}", "pages": 8,
+                     "subsections": [{"subheading": f"{number}.1 Subsection", "pages": 4}]}
+                    for number in range(1, 9)
+                ],
+            })
+        if "Summarize" in prompt or "Condense" in prompt:
+            return "The paper studies a method, evaluates it on benchmarks and discusses limitations. " * 8
+        return "benchmark keywords"
@@ -0,0 +1,108 @@
+'''
+Cold-start benchmark: imports the app in fresh interpreters, without any API keys set,
+and checks import time, resident memory and which heavy packages got loaded.
+
+Run from app_backend:
+
+    python benchmarks/import_time.py            # 5 runs, fail if over budget
+    python benchmarks/import_time.py --top 20   # also list the slowest imports
+
+Exits with status 1 when a budget is exceeded or a lazily loaded subsystem is imported at startup.
+'''
+
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+import statistics
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+
+IMPORT_BUDGET_SECONDS = 1.0
+RSS_BUDGET_MB = 100
+
+# Loaded on first use by the jobs or calls that need them, never by importing the app
+LAZY_PACKAGES = ("langchain", "langchain_community", "chromadb", "fitz", "pymupdf", "together", "aiohttp", "pandas", "openai", "numpy")
+
+PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+import app
+seconds = time.perf_counter() - start
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({"seconds": seconds, "rss_mb": rss_kb / 1024,
+                  "loaded": sorted(name for name in %r if name in sys.modules)}))
+""" % (LAZY_PACKAGES,)
+
+
+def probe_environment() -> dict:
+    """The caller's environment minus the API keys: the server must boot without them."""
+    env = {key: value for key, value in os.environ.items() if key not in ("API_KEY", "OPENAI_API_KEY")}
+    env["PYTHONPATH"] = BACKEND_DIR + os.pathsep + env.get("PYTHONPATH", "")
+    return env
+
+
+def run_probe(workdir: str) -> dict:
+    # A temporary working directory keeps anything created at startup out of the tree
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=workdir, env=probe_environment(),
+        capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def slowest_imports(workdir: str, top: int) -> list:
+    """(cumulative microseconds, module) for the slowest imports, from python -X importtime."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"], cwd=workdir,
+        env=probe_environment(), capture_output=True, text=True,
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, module = line[len("import time:"):].split("|")
+            if cumulative.strip().isdigit():
+                rows.append((int(cumulative), module.rstrip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=0, help="list this many of the slowest imports")
+    parser.add_argument("--budget-seconds", type=float, default=IMPORT_BUDGET_SECONDS)
+    parser.add_argument("--budget-mb", type=float, default=RSS_BUDGET_MB)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="litreview-import-")
+    runs = [run_probe(workdir) for _ in range(args.runs)]
+    seconds = [run["seconds"] for run in runs]
+    rss = [run["rss_mb"] for run in runs]
+    loaded = sorted({name for run in runs for name in run["loaded"]})
+
+    print(f"import app: median {statistics.median(seconds):.3f}s, max {max(seconds):.3f}s over {args.runs} runs")
+    print(f"peak RSS:   median {statistics.median(rss):.1f} MB, max {max(rss):.1f} MB")
+    print(f"lazy packages loaded at startup: {', '.join(loaded) or 'none'}")
+
+    if args.top:
+        print("\nslowest imports (cumulative):")
+        for microseconds, module in slowest_imports(workdir, args.top):
+            print(f"  {microseconds / 1000:8.1f} ms  {module}")
+
+    problems = []
+    if statistics.median(seconds) > args.budget_seconds:
+        problems.append(f"import time {statistics.median(seconds):.3f}s is over the {args.budget_seconds}s budget")
+    if statistics.median(rss) > args.budget_mb:
+        problems.append(f"RSS {statistics.median(rss):.1f} MB is over the {args.budget_mb} MB budget")
+    if loaded:
+        problems.append(f"{', '.join(loaded)} should only be imported on first use")
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
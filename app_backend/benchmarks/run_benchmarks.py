@@ -0,0 +1,244 @@
+'''
+Offline end-to-end benchmark: drives the Flask app through search -> accept -> headings
+against the local stand-ins in fake_services.py, and reports latency percentiles and
+throughput per endpoint and per job stage.
+
+Run from app_backend:
+
+    python benchmarks/run_benchmarks.py                     # compare against benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py --update-baseline   # record a new baseline
+    python benchmarks/run_benchmarks.py --llm-latency 0.5   # slower fake LLM
+
+Exits with status 1 when a metric regressed past the tolerance.
+'''
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from corpus import build_corpus
+from fake_services import FakeServices
+
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+
+# A metric regresses when its p50 is this much slower than the baseline, and more than MIN_DELTA seconds past
+# the baseline's own spread (its p90). Tail percentiles are reported but not gated: each rests on a couple of samples
+TOLERANCE = 0.25
+MIN_DELTA_SECONDS = 0.02
+
+
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    index = (len(ordered) - 1) * q
+    low = int(index)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (index - low)
+
+
+def summarize(samples: dict) -> dict:
+    """Latency percentiles (seconds) and single-stream throughput for every metric."""
+    summary = {}
+    for name, values in sorted(samples.items()):
+        summary[name] = {
+            "count": len(values),
+            "mean": round(statistics.fmean(values), 4),
+            "p50": round(percentile(values, 0.50), 4),
+            "p90": round(percentile(values, 0.90), 4),
+            "p99": round(percentile(values, 0.99), 4),
+            "max": round(max(values), 4),
+            "per_second": round(len(values) / sum(values), 2) if sum(values) else None,
+        }
+    return summary
+
+
+def configure_environment(base_url: str, workdir: str):
+    """Points every service client at the fakes. Must run before the app is imported."""
+    os.environ.update({
+        "ARXIV_API_URL": f"{base_url}/api/query",
+        "ARXIV_DELAY_SECONDS": "0",
+        "OPENALEX_API_URL": base_url,
+        "LLM_BASE_URL": f"{base_url}/v1",
+        "API_KEY": "benchmark",
+        "EMBEDDING_BACKEND": "local",
+        # The fake LLM has no quota; the real API's limits would throttle longer runs and time the limiter, not the app
+        "LLM_REQUESTS_PER_MINUTE": "100000",
+        "LLM_TOKENS_PER_MINUTE": "100000000",
+    })
+    # Catalog, caches, downloads and vector store all use paths relative to the working directory
+    os.chdir(workdir)
+
+
+class Runner:
+    def __init__(self, client, samples: dict):
+        self.client = client
+        self.samples = samples
+
+    def record(self, name: str, seconds: float):
+        self.samples.setdefault(name, []).append(seconds)
+
+    def timed_post(self, name: str, path: str, session_id: str, body: dict):
+        start = time.perf_counter()
+        response = self.client.post(path, json=body, headers={"X-Session-ID": session_id})
+        self.record(name, time.perf_counter() - start)
+        if response.status_code >= 400:
+            raise RuntimeError(f"{path} returned {response.status_code}: {response.get_data(as_text=True)[:300]}")
+        return response
+
+    def stream_search(self, session_id: str, keywords: str):
+        """Streaming /search; records time to the first paper and to the done event."""
+        start = time.perf_counter()
+        response = self.client.post("/search?stream=1", json={"keywords": keywords},
+                                    headers={"X-Session-ID": session_id}, buffered=False)
+        first = None
+        for line in response.response:
+            for event in line.decode().splitlines():
+                kind = json.loads(event)["event"]
+                if kind == "paper" and first is None:
+                    first = time.perf_counter() - start
+                    self.record("search_stream.first_paper", first)
+                if kind == "error":
+                    raise RuntimeError(f"streaming search failed: {event}")
+        self.record("search_stream", time.perf_counter() - start)
+
+    def run_job(self, name: str, path: str, session_id: str, body: dict = None, timeout: float = 300):
+        """Submits a job endpoint, waits for the result and records the end-to-end time and each stage."""
+        start = time.perf_counter()
+        response = self.timed_post(f"{name}.submit", path, session_id, body or {})
+        job_id = response.get_json()["job_id"]
+        while True:
+            status = self.client.get(f"/jobs/{job_id}").get_json()
+            if status["status"] in ("done", "failed"):
+                break
+            if time.perf_counter() - start > timeout:
+                raise RuntimeError(f"{name} job did not finish in {timeout}s")
+            time.sleep(0.01)
+        self.record(name, time.perf_counter() - start)
+        if status["status"] == "failed":
+            raise RuntimeError(f"{name} job failed: {status.get('error')}")
+        for stage in status["stages"]:
+            self.record(f"{name}.{stage['name']}", stage["seconds"])
+        return self.client.get(f"/jobs/{job_id}/result").get_json()["result"]
+
+    def iteration(self, index: int, accept_count: int):
+        session_id = f"bench-{index}"
+        keywords = f"benchmark topic {index}"
+
+        papers = self.timed_post("search", "/search", session_id, {"keywords": keywords}).get_json()["papers"]
+        # The same keywords again are answered from the catalog
+        self.timed_post("search.cached", "/search", session_id, {"keywords": keywords})
+        self.stream_search(f"{session_id}-stream", f"streamed topic {index}")
+
+        self.run_job("accept", "/accept", session_id, {"ids": [paper["id"] for paper in papers[:accept_count]]})
+        self.run_job("get_headings", "/get_headings", session_id)
+        self.run_job("get_headings_rag", "/get_headings_rag", session_id)
+
+
+def compare(current: dict, baseline: dict) -> list:
+    """Returns (metric, statistic, baseline, current) for every regression."""
+    regressions = []
+    for name, stats in baseline.get("metrics", {}).items():
+        if name not in current:
+            continue
+        before, after = stats["p50"], current[name]["p50"]
+        if after > before * (1 + TOLERANCE) and after - max(before, stats.get("p90", before)) > MIN_DELTA_SECONDS:
+            regressions.append((name, "p50", before, after))
+    return regressions
+
+
+def print_report(summary: dict, baseline: dict, regressions: list):
+    flagged = {name for name, _, _, _ in regressions}
+    previous = baseline.get("metrics", {})
+    print(f"\n{'metric':34} {'n':>4} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>8} {'ops/s':>8}  vs baseline p50")
+    for name, stats in summary.items():
+        change = ""
+        if name in previous and previous[name]["p50"]:
+            change = f"{(stats['p50'] / previous[name]['p50'] - 1) * 100:+.0f}%"
+        if name in flagged:
+            change += "  REGRESSION"
+        print(f"{name:34} {stats['count']:>4} {stats['p50']:>8.3f} {stats['p90']:>8.3f} {stats['p99']:>8.3f} "
+              f"{stats['max']:>8.3f} {stats['per_second'] or 0:>8.1f}  {change}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    # Fewer runs leave the p90 of each metric to one or two samples
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--accept", type=int, default=5, help="papers accepted per iteration")
+    parser.add_argument("--results", type=int, default=30, help="arXiv hits per query")
+    parser.add_argument("--search-latency", type=float, default=0.02)
+    parser.add_argument("--download-latency", type=float, default=0.01)
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="share of LLM requests answered with a 429")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--output", help="also write the results JSON here")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="litreview-bench-")
+    corpus = build_corpus(os.path.join(workdir, "corpus"))
+    services = FakeServices(corpus, results_per_query=args.results, search_latency=args.search_latency,
+                            download_latency=args.download_latency, llm_latency=args.llm_latency,
+                            llm_error_rate=args.llm_error_rate)
+    base_url = services.start()
+    configure_environment(base_url, workdir)
+
+    import_start = time.perf_counter()
+    import app
+    import_seconds = time.perf_counter() - import_start
+
+    samples = {}
+    runner = Runner(app.app.test_client(), samples)
+    wall_start = time.perf_counter()
+    for index in range(args.iterations):
+        runner.iteration(index, args.accept)
+    wall_seconds = time.perf_counter() - wall_start
+    services.stop()
+
+    settings = {key: value for key, value in vars(args).items() if key not in ("baseline", "update_baseline", "output")}
+    results = {
+        "settings": settings,
+        "import_seconds": round(import_seconds, 3),
+        "wall_seconds": round(wall_seconds, 3),
+        "upstream_requests": services.requests,
+        "metrics": summarize(samples),
+    }
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.update_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        # Settings added after the baseline was recorded were at their defaults then
+        recorded = {**{key: parser.get_default(key) for key in settings}, **baseline.get("settings", {})}
+        if recorded != settings:
+            print("Note: baseline was recorded with different settings; comparisons are indicative only.")
+
+    regressions = compare(results["metrics"], baseline)
+    print_report(results["metrics"], baseline, regressions)
+    print(f"\nApp import {results['import_seconds']}s, {args.iterations} iterations in {results['wall_seconds']}s, "
+          f"upstream requests {services.requests}, work dir {workdir}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+    elif regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {TOLERANCE:.0%}:")
+        for name, key, before, after in regressions:
+            print(f"  {name} {key}: {before:.3f}s -> {after:.3f}s")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
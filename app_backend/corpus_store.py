@@ -0,0 +1,254 @@
+import os
+import json
+import mmap
+import time
+import sqlite3
+import hashlib
+import threading
+from dataclasses import dataclass
+import metrics
+from temp_pdf_to_txt import load_section_index, read_text
+
+# Extracted texts of every paper, appended into a few large segment files
+CORPUS_DIR = os.getenv("CORPUS_DIR", "corpus_store")
+SEGMENT_MAX_BYTES = int(os.getenv("CORPUS_SEGMENT_MAX_BYTES", 256 << 20))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    paper_id TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL,
+    segment INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    sections TEXT,
+    source_size INTEGER,
+    source_mtime_ns INTEGER,
+    added_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS documents_sha256 ON documents (sha256);
+"""
+
+
+@dataclass
+class CorpusEntry:
+    """Where one paper's text lives: a byte range of a segment file, plus its section index."""
+    paper_id: str
+    sha256: str
+    segment: int
+    offset: int
+    length: int
+    sections: list = None
+    source_size: int = None
+    source_mtime_ns: int = None
+
+    def byte_ranges(self, include=None, exclude=None) -> list:
+        """(start, end) ranges, relative to the entry, of the selected sections; the whole text without a selection."""
+        if not (include or exclude) or not self.sections or len(self.sections) <= 1:
+            return [(0, self.length)]
+        return [
+            (section["byte_start"], section["byte_end"]) for section in self.sections
+            if (not include or section["name"] in include) and (not exclude or section["name"] not in exclude)
+        ]
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class CorpusStore:
+    """
+    Append-only store of extracted texts keyed by paper ID.
+
+    Texts are appended to segment files of up to SEGMENT_MAX_BYTES; a SQLite index maps each paper ID to
+    (segment, offset, length) and the paper's section index. Readers slice the segments through memory maps,
+    so only the pages actually touched are loaded, and identical texts are stored once.
+    """
+
+    def __init__(self, root: str = CORPUS_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(root, "index.sqlite3"), check_same_thread=False, isolation_level=None)
+        self._conn.executescript(SCHEMA)
+        self._maps = {}  # segment -> mmap
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.root, f"segment-{segment:05d}.dat")
+
+    def _row_to_entry(self, row) -> CorpusEntry:
+        paper_id, sha256, segment, offset, length, sections, source_size, source_mtime_ns = row
+        return CorpusEntry(paper_id, sha256, segment, offset, length, json.loads(sections) if sections else None,
+                           source_size, source_mtime_ns)
+
+    def get(self, paper_id: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT paper_id, sha256, segment, offset, length, sections, source_size, source_mtime_ns "
+                "FROM documents WHERE paper_id = ?",
+                (paper_id,),
+            ).fetchone()
+        return self._row_to_entry(row) if row else None
+
+    def add(self, paper_id: str, txt_path: str) -> str:
+        """
+        Stores the text file as paper_id, replacing an older version.
+        Returns "unchanged", "deduplicated" (same text already stored under another ID) or "added".
+        """
+        stat = os.stat(txt_path)
+        index = load_section_index(txt_path)
+        sections = json.dumps(index["sections"], separators=(",", ":")) if index else None
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sha256, source_size, source_mtime_ns, sections FROM documents WHERE paper_id = ?", (paper_id,)
+            ).fetchone()
+            # Same file as last time: nothing to hash or copy
+            if row and row[1] == stat.st_size and row[2] == stat.st_mtime_ns and row[3] == sections:
+                return "unchanged"
+
+        digest = _file_sha256(txt_path)
+        with self._lock:
+            # BEGIN IMMEDIATE serializes writers across processes as well as threads
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Another writer may have stored this paper since the check above
+                row = self._conn.execute(
+                    "SELECT sha256, source_size, source_mtime_ns, sections FROM documents WHERE paper_id = ?", (paper_id,)
+                ).fetchone()
+                if row and row[0] == digest and row[3] == sections:
+                    self._conn.execute(
+                        "UPDATE documents SET source_size = ?, source_mtime_ns = ? WHERE paper_id = ?",
+                        (stat.st_size, stat.st_mtime_ns, paper_id),
+                    )
+                    self._conn.execute("COMMIT")
+                    return "unchanged"
+
+                same_text = self._conn.execute(
+                    "SELECT segment, offset, length FROM documents WHERE sha256 = ? LIMIT 1", (digest,)
+                ).fetchone()
+                if same_text:
+                    segment, offset, length = same_text
+                    outcome = "deduplicated"
+                else:
+                    segment, offset, length = self._append(txt_path, stat.st_size)
+                    outcome = "added"
+
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO documents "
+                    "(paper_id, sha256, segment, offset, length, sections, source_size, source_mtime_ns, added_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (paper_id, digest, segment, offset, length, sections, stat.st_size, stat.st_mtime_ns, time.time()),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return outcome
+
+    def _append(self, txt_path: str, size: int) -> tuple:
+        """Copies the file to the end of the current segment, starting a new one when it is full."""
+        segment = self._conn.execute("SELECT COALESCE(MAX(segment), 0) FROM documents").fetchone()[0]
+        path = self._segment_path(segment)
+        if os.path.exists(path) and 0 < os.path.getsize(path) and os.path.getsize(path) + size > SEGMENT_MAX_BYTES:
+            segment += 1
+            path = self._segment_path(segment)
+
+        with open(path, "ab") as out, open(txt_path, "rb") as source:
+            offset = out.tell()
+            for chunk in iter(lambda: source.read(1 << 20), b""):
+                out.write(chunk)
+        return segment, offset, size
+
+    def add_folder(self, txt_folder: str) -> dict:
+        """Stores every .txt of an extraction folder under its file name (the paper key)."""
+        counts = {"added": 0, "deduplicated": 0, "unchanged": 0}
+        with metrics.timed("corpus.add_folder") as span:
+            for filename in sorted(os.listdir(txt_folder)):
+                if filename.endswith(".txt"):
+                    counts[self.add(os.path.splitext(filename)[0], os.path.join(txt_folder, filename))] += 1
+            span.update(counts)
+        return counts
+
+    def _view(self, segment: int, start: int, end: int) -> memoryview:
+        # An empty text may sit in a segment that is still empty, and a zero-length file cannot be mapped
+        if end <= start:
+            return memoryview(b"")
+        with self._lock:
+            mapped = self._maps.get(segment)
+            if mapped is None or len(mapped) < end:
+                # The segment grew since it was mapped; the old map stays valid for views already handed out
+                with open(self._segment_path(segment), "rb") as f:
+                    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self._maps[segment] = mapped
+        return memoryview(mapped)[start:end]
+
+    def view(self, entry: CorpusEntry) -> memoryview:
+        """Zero-copy view of a paper's UTF-8 text"""
+        return self._view(entry.segment, entry.offset, entry.offset + entry.length)
+
+    def text(self, entry: CorpusEntry, include=None, exclude=None) -> str:
+        """Decodes only the selected sections of the paper"""
+        return "".join(
+            str(self._view(entry.segment, entry.offset + start, entry.offset + end), "utf-8", errors="replace")
+            for start, end in entry.byte_ranges(include, exclude)
+        )
+
+    def stats(self) -> dict:
+        with self._lock:
+            documents, text_bytes = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(length), 0) FROM documents").fetchone()
+            segments = self._conn.execute("SELECT COUNT(DISTINCT segment) FROM documents").fetchone()[0]
+        stored = sum(
+            os.path.getsize(os.path.join(self.root, name))
+            for name in os.listdir(self.root) if name.startswith("segment-")
+        )
+        return {"documents": documents, "text_bytes": text_bytes, "stored_bytes": stored, "segments": segments}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_corpus_store() -> CorpusStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = CorpusStore()
+        return _store
+
+
+def _stored_entry(txt_path: str):
+    """
+    The store's entry for a session .txt file, if it holds this version of it: the file's size and mtime
+    must be those recorded when it was added, since an edit can keep the length the same
+    """
+    entry = get_corpus_store().get(os.path.splitext(os.path.basename(txt_path))[0])
+    if entry is None:
+        return None
+    stat = os.stat(txt_path)
+    if entry.source_size == stat.st_size and entry.source_mtime_ns == stat.st_mtime_ns:
+        return entry
+    return None
+
+
+def read_paper(txt_path: str, include=None, exclude=None) -> str:
+    """
+    Text of a session .txt file, served from the corpus store's memory maps when the store holds it,
+    and read from the file otherwise. include/exclude select sections as in temp_pdf_to_txt.read_text.
+    """
+    entry = _stored_entry(txt_path)
+    if entry is None:
+        return read_text(txt_path, include=include, exclude=exclude)
+    return get_corpus_store().text(entry, include=include, exclude=exclude)
+
+
+def paper_size(txt_path: str, include=None, exclude=None) -> int:
+    """UTF-8 size of the selected sections, from the indexes alone, without reading the text"""
+    entry = _stored_entry(txt_path)
+    if entry is None:
+        index = load_section_index(txt_path)
+        entry = CorpusEntry(None, None, 0, 0, os.path.getsize(txt_path), index["sections"] if index else None)
+    return sum(end - start for start, end in entry.byte_ranges(include, exclude))
@@ -0,0 +1,265 @@
+import os
+import re
+import zlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from ResearchPaperAccess.federated_search import base_arxiv_id, arxiv_version
+from corpus_store import read_paper
+
+# MinHash signature length and LSH banding: 16 bands of 4 rows make pairs above ~0.5 Jaccard candidates
+NUM_PERM = 64
+LSH_BANDS = 16
+
+# Estimated Jaccard similarity above which two papers count as the same work
+ABSTRACT_DUPLICATE_THRESHOLD = float(os.getenv("ABSTRACT_DUPLICATE_THRESHOLD", 0.7))
+TEXT_DUPLICATE_THRESHOLD = float(os.getenv("TEXT_DUPLICATE_THRESHOLD", 0.8))
+
+# Word shingle lengths; texts with fewer distinct shingles than MIN_SHINGLES are too short to compare
+ABSTRACT_SHINGLE_WORDS = 3
+TEXT_SHINGLE_WORDS = 5
+MIN_SHINGLES = 8
+
+# Full-text signatures kept in memory, by (path, size, mtime)
+MAX_CACHED_SIGNATURES = 4096
+
+# Search results the process-wide deduplicator remembers; the least recently seen are forgotten first
+MAX_DEDUP_PAPERS = int(os.getenv("MAX_DEDUP_PAPERS", 20000))
+
+# Multiply-shift hash family: h(x) = ((a * x + b) mod 2^64) >> 32 with odd a
+_rng = np.random.default_rng(20240101)
+_A = _rng.integers(1, 2 ** 63, size=NUM_PERM, dtype=np.uint64) | np.uint64(1)
+_B = _rng.integers(0, 2 ** 63, size=NUM_PERM, dtype=np.uint64)
+_SHINGLE_BASE = np.uint64(1000003)
+_MINHASH_BLOCK = 2048
+
+
+def minhash(text: str, shingle_words: int = ABSTRACT_SHINGLE_WORDS):
+    """MinHash signature (NUM_PERM uint32 values) of the text's word shingles, or None for too short a text"""
+    words = re.findall(r"[a-z0-9]+", (text or "").lower())
+    if len(words) < shingle_words:
+        return None
+    # Each distinct word is hashed once; a shingle's hash combines its words' hashes polynomially
+    vocabulary = {}
+    positions = np.fromiter((vocabulary.setdefault(word, len(vocabulary)) for word in words), dtype=np.intp,
+                            count=len(words))
+    word_hashes = np.fromiter((zlib.crc32(word.encode("utf-8")) for word in vocabulary), dtype=np.uint64,
+                              count=len(vocabulary))[positions]
+    count = len(words) - shingle_words + 1
+    with np.errstate(over="ignore"):
+        shingles = np.zeros(count, dtype=np.uint64)
+        for offset in range(shingle_words):
+            shingles = shingles * _SHINGLE_BASE + word_hashes[offset:offset + count]
+        shingles = np.unique(shingles)
+        if len(shingles) < MIN_SHINGLES:
+            return None
+        # (NUM_PERM, block) products, in blocks that stay in cache; uint64 arithmetic wraps, which is the mod 2^64
+        signature = np.full(NUM_PERM, np.iinfo(np.uint64).max, dtype=np.uint64)
+        for start in range(0, len(shingles), _MINHASH_BLOCK):
+            block = shingles[None, start:start + _MINHASH_BLOCK]
+            np.minimum(signature, ((_A[:, None] * block + _B[:, None]) >> np.uint64(32)).min(axis=1), out=signature)
+    return signature.astype(np.uint32)
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of the shingle sets behind two signatures"""
+    return float(np.count_nonzero(a == b)) / len(a)
+
+
+class NearDuplicateIndex:
+    """
+    MinHash signatures bucketed by LSH band. A lookup only compares against keys that share a band
+    with the query, so it stays sublinear in the number of indexed papers. Only canonical papers are
+    indexed: a paper found to duplicate another is reported, not added. With max_entries, the least
+    recently added or matched keys are dropped once the index is full.
+    """
+
+    def __init__(self, threshold: float, bands: int = LSH_BANDS, max_entries: int = None):
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = NUM_PERM // bands
+        self.max_entries = max_entries
+        self._signatures = OrderedDict()  # key -> signature, least recently used first
+        self._buckets = {}  # (band, band bytes) -> set of keys
+        self._lock = threading.Lock()
+
+    def _band_keys(self, signature: np.ndarray) -> list:
+        return [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+
+    def _query(self, signature: np.ndarray) -> tuple:
+        candidates = set()
+        for band_key in self._band_keys(signature):
+            candidates |= self._buckets.get(band_key, set())
+        best, best_similarity = None, 0.0
+        for candidate in candidates:
+            score = similarity(signature, self._signatures[candidate])
+            if score > best_similarity:
+                best, best_similarity = candidate, score
+        if best_similarity >= self.threshold:
+            self._signatures.move_to_end(best)
+            return best, best_similarity
+        return None, best_similarity
+
+    def query(self, signature: np.ndarray) -> tuple:
+        """(key, similarity) of the closest indexed paper at or above the threshold; (None, best similarity) otherwise"""
+        with self._lock:
+            return self._query(signature)
+
+    def _add(self, key, signature: np.ndarray):
+        self._signatures[key] = signature
+        for band_key in self._band_keys(signature):
+            self._buckets.setdefault(band_key, set()).add(key)
+        while self.max_entries and len(self._signatures) > self.max_entries:
+            self._remove(next(iter(self._signatures)))
+
+    def _remove(self, key):
+        signature = self._signatures.pop(key, None)
+        if signature is not None:
+            for band_key in self._band_keys(signature):
+                bucket = self._buckets.get(band_key)
+                if bucket is not None:
+                    bucket.discard(key)
+                    if not bucket:
+                        del self._buckets[band_key]
+
+    def add(self, key, signature: np.ndarray):
+        """Indexes key unless it duplicates an indexed paper; returns the key it duplicates, or None"""
+        with self._lock:
+            if key in self._signatures:
+                self._signatures.move_to_end(key)
+                return None
+            duplicate_of, _ = self._query(signature)
+            if duplicate_of is None:
+                self._add(key, signature)
+            return duplicate_of
+
+    def replace(self, old_key, new_key, signature: np.ndarray):
+        """Makes new_key the canonical entry in place of old_key, e.g. for a newer version of a paper"""
+        with self._lock:
+            self._remove(old_key)
+            self._add(new_key, signature)
+
+    def __contains__(self, key) -> bool:
+        with self._lock:
+            return key in self._signatures
+
+    def __len__(self):
+        with self._lock:
+            return len(self._signatures)
+
+
+class PaperDeduplicator:
+    """
+    Flags search results that duplicate a paper already seen: older arXiv versions of the same ID,
+    and near-duplicates by title and abstract (retitled preprints, reposted versions).
+    The newest arXiv version is always the canonical paper.
+    At most max_papers papers are remembered; the least recently seen are forgotten first, so a
+    long-running server does not grow without bound (flags already given are kept in the catalog).
+    """
+
+    def __init__(self, threshold: float = ABSTRACT_DUPLICATE_THRESHOLD, max_papers: int = MAX_DEDUP_PAPERS):
+        self.max_papers = max_papers
+        self.index = NearDuplicateIndex(threshold, max_entries=max_papers)
+        self._versions = OrderedDict()  # base arXiv ID -> (version, paper id)
+        self._flags = OrderedDict()  # paper id -> canonical paper id or None, for every paper checked
+        self._lock = threading.Lock()
+
+    def _trim(self):
+        for table in (self._flags, self._versions):
+            while len(table) > self.max_papers:
+                table.popitem(last=False)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._flags)
+
+    def check(self, papers) -> dict:
+        """
+        Checks papers (catalog papers, in rank order) against every paper seen so far.
+        Returns {paper id: canonical paper id, or None for a canonical paper}. When a newer arXiv
+        version shows up, the older version's id is included too, even if it is not in papers.
+        """
+        flags = {}
+        with self._lock:
+            for paper in papers:
+                # Cached searches repeat the same papers; their flags only change when a newer version shows up
+                if paper.id in self._flags:
+                    self._flags.move_to_end(paper.id)
+                    flags[paper.id] = self._flags[paper.id]
+                    continue
+                signature = minhash(f"{paper.title} {paper.summary}")
+                # Catalog keys of works not on arXiv (doi:..., openalex:...) have no versions
+                if ":" in paper.arxiv_id:
+                    base, version = paper.arxiv_id, 0
+                else:
+                    base, version = base_arxiv_id(paper.arxiv_id), arxiv_version(paper.arxiv_id)
+                seen = self._versions.get(base)
+                if seen:
+                    self._versions.move_to_end(base)
+                if seen and seen[1] != paper.id:
+                    if seen[0] >= version:
+                        flags[paper.id] = seen[1]
+                        continue
+                    # A newer version replaces the old one as the canonical paper
+                    flags[seen[1]] = paper.id
+                    if seen[1] in self.index and signature is not None:
+                        self.index.replace(seen[1], paper.id, signature)
+                        self._versions[base] = (version, paper.id)
+                        flags[paper.id] = None
+                        continue
+                self._versions[base] = (version, paper.id)
+                flags[paper.id] = self.index.add(paper.id, signature) if signature is not None else None
+            self._flags.update(flags)
+            self._trim()
+        return flags
+
+
+_paper_deduplicator = None
+_paper_deduplicator_lock = threading.Lock()
+_text_signatures = OrderedDict()
+_text_signatures_lock = threading.Lock()
+
+
+def get_paper_deduplicator() -> PaperDeduplicator:
+    """One index of every search result seen by this process"""
+    global _paper_deduplicator
+    with _paper_deduplicator_lock:
+        if _paper_deduplicator is None:
+            _paper_deduplicator = PaperDeduplicator()
+        return _paper_deduplicator
+
+
+def text_signature(txt_path: str):
+    """MinHash signature of an extracted text (references left out), cached while the file is unchanged"""
+    stat = os.stat(txt_path)
+    key = (txt_path, stat.st_size, stat.st_mtime_ns)
+    with _text_signatures_lock:
+        if key in _text_signatures:
+            _text_signatures.move_to_end(key)
+            return _text_signatures[key]
+    signature = minhash(read_paper(txt_path, exclude=("references",)), TEXT_SHINGLE_WORDS)
+    with _text_signatures_lock:
+        _text_signatures[key] = signature
+        while len(_text_signatures) > MAX_CACHED_SIGNATURES:
+            _text_signatures.popitem(last=False)
+    return signature
+
+
+def find_duplicate_files(txt_folder: str, threshold: float = TEXT_DUPLICATE_THRESHOLD) -> dict:
+    """
+    Near-duplicate extracted texts in a session folder: {filename: filename of the text it duplicates}.
+    The newest arXiv version of a paper is compared first, so it is the one kept.
+    """
+    filenames = [filename for filename in os.listdir(txt_folder) if filename.endswith(".txt")]
+    stems = {filename: os.path.splitext(filename)[0] for filename in filenames}
+    filenames.sort(key=lambda filename: (base_arxiv_id(stems[filename]), -arxiv_version(stems[filename])))
+
+    index = NearDuplicateIndex(threshold)
+    duplicates = {}
+    for filename in filenames:
+        signature = text_signature(os.path.join(txt_folder, filename))
+        if signature is not None:
+            duplicate_of = index.add(filename, signature)
+            if duplicate_of is not None:
+                duplicates[filename] = duplicate_of
+    return duplicates
@@ -0,0 +1,135 @@
+import os
+import time
+import uuid
+import threading
+import traceback
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+import metrics
+
+# Executor size, how many jobs may wait for a worker, and how long finished jobs are kept
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 4))
+JOB_QUEUE_LIMIT = int(os.getenv("JOB_QUEUE_LIMIT", 16))
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", 3600))
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while JOB_QUEUE_LIMIT jobs are already waiting."""
+
+
+class Job:
+    """State of one background job: status, progress, per-stage timings and the final result."""
+
+    def __init__(self, kind: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = "queued"
+        self.stage_name = None
+        self.progress = {}
+        self.stages = []
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str):
+        """Times a named stage of the job, e.g. `with job.stage("download"): ...`"""
+        with self._lock:
+            self.stage_name = name
+            self.progress = {}
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            metrics.record(f"job.{self.kind}.{name}", seconds)
+            with self._lock:
+                self.stages.append({"name": name, "seconds": round(seconds, 3)})
+
+    def set_progress(self, done: int, total: int, message: str = None):
+        with self._lock:
+            self.progress = {"done": done, "total": total}
+            if message:
+                self.progress["message"] = message
+
+    def to_dict(self, include_result: bool = False) -> dict:
+        with self._lock:
+            data = {
+                "job_id": self.id,
+                "trace_id": self.id,
+                "kind": self.kind,
+                "status": self.status,
+                "stage": self.stage_name,
+                "progress": dict(self.progress),
+                "stages": list(self.stages),
+                "created": self.created,
+                "started": self.started,
+                "finished": self.finished,
+            }
+            if self.error:
+                data["error"] = self.error
+            if include_result and self.status == "done":
+                data["result"] = self.result
+        return data
+
+
+class JobManager:
+    """Runs jobs on a bounded thread pool and keeps their state for polling."""
+
+    def __init__(self, workers: int = JOB_WORKERS, queue_limit: int = JOB_QUEUE_LIMIT):
+        self.queue_limit = queue_limit
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, fn, *args, **kwargs) -> Job:
+        """
+        Queue fn(job, *args, **kwargs) to run in the background.
+        fn's return value becomes the job result; an exception marks the job as failed.
+        """
+        with self._lock:
+            self._prune()
+            queued = sum(1 for job in self._jobs.values() if job.status == "queued")
+            if queued >= self.queue_limit:
+                raise QueueFullError(f"{queued} jobs are already waiting; try again later.")
+            job = Job(kind)
+            self._jobs[job.id] = job
+
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def get(self, job_id: str):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+        return {"queue_limit": self.queue_limit, "jobs": counts}
+
+    def _run(self, job: Job, fn, args, kwargs):
+        job.status = "running"
+        job.started = time.time()
+        # Every span recorded while the job runs lands in a trace with the job's ID
+        trace, token = metrics.start_trace(f"job {job.kind}", job.id)
+        try:
+            job.result = fn(job, *args, **kwargs)
+            job.status = "done"
+        except Exception as e:
+            traceback.print_exc()
+            job.error = str(e) or type(e).__name__
+            job.status = "failed"
+        finally:
+            job.finished = time.time()
+            metrics.end_trace(trace, token)
+            metrics.record(f"job.{job.kind}", job.finished - job.started)
+
+    def _prune(self):
+        cutoff = time.time() - JOB_RETENTION_SECONDS
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished and job.finished < cutoff]:
+            del self._jobs[job_id]
@@ -1,24 +1,27 @@
-from together import Together  # type: ignore
 import os
-from dotenv import load_dotenv  # type: ignore
 import json
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from json_repair import repair_json
-# Load environment variables from .env
-load_dotenv()
+from llmCalls.llm_client import chat, model_name, ResponseCache
+from corpus_store import read_paper, paper_size
+import metrics
 
-# Retrieve API key
-api_key = os.getenv("API_KEY")
+# Token budgeting (rough estimate: ~4 characters per token for English text)
+CHARS_PER_TOKEN = 4
+CONTEXT_TOKEN_BUDGET = int(os.getenv("HEADING_CONTEXT_TOKENS", 24000))  # Source material in the outline prompt
+MAP_INPUT_TOKENS = 12000  # Text of one paper sent to the summarizer
+SUMMARY_MAX_TOKENS = 400
+SUMMARY_CONCURRENCY = int(os.getenv("SUMMARY_CONCURRENCY", 4))
 
-# Ensure API key is set
-if not api_key:
-    raise ValueError("API key is missing. Set the API_KEY environment variable.")
+# Sections left out of the outline material; reference lists cost tokens without adding themes
+HEADING_SKIP_SECTIONS = tuple(filter(None, os.getenv("HEADING_SKIP_SECTIONS", "references").split(",")))
 
-# Define the LLM model to use
-model_name = "meta-llama/Llama-3.3-70B-Instruct-Turbo"
+_summary_cache = None
+_summary_cache_lock = threading.Lock()
 
 
-import json
-
 def clean_and_format_json(raw_response: str) -> dict:
     """
     Cleans and formats the raw JSON string returned by the LLM into a valid JSON object.
@@ -42,29 +45,156 @@ def clean_and_format_json(raw_response: str) -> dict:
         raise
 
 
-def read_all_txt(folder_path: str) -> str:
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def iter_txt(folder_path: str, include=None, exclude=None, skip_files=()):
+    """
+    Yields (filename, text) for every .txt file in a folder but skip_files, one file in memory at a time.
+    include/exclude select sections by name (see temp_pdf_to_txt.SECTION_NAMES).
+    """
+    for filename in sorted(os.listdir(folder_path)):
+        if filename.endswith(".txt") and filename not in skip_files:
+            yield filename, read_paper(os.path.join(folder_path, filename), include=include, exclude=exclude)
+
+
+def read_all_txt(folder_path: str, include=None, exclude=None, skip_files=()) -> str:
     """
     Reads all .txt files from a folder and aggregates their content.
     Each file's content is prefixed by a header indicating the filename.
     """
-    all_text = ""
-    for filename in os.listdir(folder_path):
-        if filename.endswith(".txt"):
-            with open(os.path.join(folder_path, filename), "r", encoding="utf-8") as f:
-                text = f.read()
-                all_text += f"\n\n--- Content from {filename} ---\n{text}"
-    return all_text
-def get_headings_from_llm(txt_folder: str, keywords: str) -> dict:
+    return "".join(
+        f"\n\n--- Content from {filename} ---\n{text}"
+        for filename, text in iter_txt(folder_path, include=include, exclude=exclude, skip_files=skip_files)
+    )
+
+
+def get_summary_cache():
+    """Paper summaries by text hash; summaries are topic-independent so every session can reuse them"""
+    global _summary_cache
+    with _summary_cache_lock:
+        if _summary_cache is None:
+            _summary_cache = ResponseCache(namespace="summaries")
+        return _summary_cache
+
+
+def summarize_paper(text: str) -> tuple:
     """
-    Uses the Together API to generate a structured outline for a literature review paper.
-    Returns a valid Python dictionary parsed from the LLM's JSON response.
+    Map step: condenses one paper into a short structured summary.
+    Returns (summary, tokens_sent), where tokens_sent is 0 when the summary came from the cache.
     """
-    print("Keyword:", keywords)
+    key = f"{model_name}:{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+    cache = get_summary_cache()
+    summary = cache.get(key)
+    if summary is not None:
+        return summary, 0
+
+    # Long papers are cut to the map budget; the opening pages carry the abstract, intro and method
+    excerpt = text[:MAP_INPUT_TOKENS * CHARS_PER_TOKEN]
+    prompt = f"""
+Summarize the following research paper for someone planning a literature review.
+Cover: research problem, theoretical foundations, methods, datasets or applications, key findings, limitations and open problems.
+Be concise and factual, at most 250 words, plain text only.
+
+Paper:
+{excerpt}
+"""
+    summary = chat(prompt, max_tokens=SUMMARY_MAX_TOKENS, priority="outline")
+    cache.put(key, summary)
+    return summary, estimate_tokens(prompt)
 
-    client = Together(api_key=api_key)
-    context = read_all_txt(txt_folder)
 
-    prompt_template = f"""
+def _merge_summaries(summaries: list, max_tokens: int) -> tuple:
+    """Reduce step: condenses several summaries into one. Returns (summary, tokens_sent)."""
+    joined = "\n\n".join(summaries)
+    prompt = f"""
+Condense the following paper summaries into a single summary that keeps every distinct theme, method, application, challenge and open problem.
+Plain text only.
+
+Summaries:
+{joined}
+"""
+    return chat(prompt, max_tokens=max_tokens, priority="outline"), estimate_tokens(prompt)
+
+
+def build_context(txt_folder: str, budget: int = CONTEXT_TOKEN_BUDGET, include=None, exclude=HEADING_SKIP_SECTIONS,
+                  skip_files=()) -> tuple:
+    """
+    Builds the source material for the outline prompt within a token budget.
+
+    Papers that fit the budget are used as they are. Otherwise each paper is summarized in
+    parallel (map), and the summaries are merged in groups until they fit (reduce).
+    Only the selected sections of each paper are read; references are skipped by default,
+    and skip_files (e.g. near-duplicate papers) are left out.
+    The size check uses the section indexes alone, and in map-reduce mode each paper is
+    read by the worker summarizing it, so the texts are never all in memory at once.
+
+    Returns:
+        tuple: (context, stats) where stats reports the tokens sent at each stage.
+    """
+    paths = [
+        os.path.join(txt_folder, filename) for filename in sorted(os.listdir(txt_folder))
+        if filename.endswith(".txt") and filename not in skip_files
+    ]
+    filenames = [os.path.basename(path) for path in paths]
+    # UTF-8 bytes slightly overcount characters, which only errs towards summarizing
+    source_tokens = sum(paper_size(path, include, exclude) // CHARS_PER_TOKEN + 1 for path in paths)
+    stats = {
+        "papers": len(paths),
+        "source_tokens": source_tokens,
+        "budget_tokens": budget,
+        "map_tokens_sent": 0,
+        "reduce_tokens_sent": 0,
+        "summaries_cached": 0,
+        "sections": {"include": list(include or []), "exclude": list(exclude or [])},
+    }
+
+    if source_tokens <= budget:
+        stats["mode"] = "direct"
+        context = read_all_txt(txt_folder, include=include, exclude=exclude, skip_files=skip_files)
+        stats["context_tokens"] = estimate_tokens(context)
+        return context, stats
+
+    stats["mode"] = "map_reduce"
+    with ThreadPoolExecutor(max_workers=SUMMARY_CONCURRENCY) as executor:
+        mapped = list(executor.map(
+            metrics.in_context(lambda path: summarize_paper(read_paper(path, include=include, exclude=exclude))), paths
+        ))
+    stats["map_tokens_sent"] = sum(tokens for _, tokens in mapped)
+    stats["summaries_cached"] = sum(1 for _, tokens in mapped if tokens == 0)
+
+    summaries = [f"--- Summary of {filename} ---\n{summary}" for filename, (summary, _) in zip(filenames, mapped)]
+
+    # Merge neighbouring summaries until everything fits; each round roughly halves the total
+    while sum(estimate_tokens(summary) for summary in summaries) > budget and len(summaries) > 1:
+        groups, group, group_tokens = [], [], 0
+        for summary in summaries:
+            tokens = estimate_tokens(summary)
+            if group and group_tokens + tokens > budget // 2:
+                groups.append(group)
+                group, group_tokens = [], 0
+            group.append(summary)
+            group_tokens += tokens
+        groups.append(group)
+        if len(groups) == len(summaries):
+            # Every summary is already its own group; pair them up so the round makes progress
+            groups = [summaries[i:i + 2] for i in range(0, len(summaries), 2)]
+
+        max_tokens = max(SUMMARY_MAX_TOKENS, budget // (2 * len(groups)))
+        with ThreadPoolExecutor(max_workers=SUMMARY_CONCURRENCY) as executor:
+            reduced = list(executor.map(metrics.in_context(lambda group: _merge_summaries(group, max_tokens)), groups))
+        stats["reduce_tokens_sent"] += sum(tokens for _, tokens in reduced)
+        summaries = [summary for summary, _ in reduced]
+
+    context = "\n\n".join(summaries)
+    stats["context_tokens"] = estimate_tokens(context)
+    return context, stats
+
+
+def outline_prompt(keywords: str, context: str) -> str:
+    """The outline request for a literature review on keywords, grounded in context"""
+    return f"""
 You are a research assistant specializing in {keywords}.
 
 Using the provided content from multiple academic and research texts, generate a structured and academically rigorous outline for a literature review paper on the topic: {keywords}.
@@ -118,26 +248,43 @@ Text Content:
 {context}
 """
 
-    # Call the LLM
-    response = client.chat.completions.create(
-        model=model_name,
-        messages=[{"role": "user", "content": prompt_template}],
-        max_tokens=4096,
-    )
-
-    # Extract the content string
-    raw_response = response.choices[0].message.content.strip()
 
+def parse_outline(raw_response: str) -> dict:
+    """Parses the outline JSON, repairing it when the model's output is malformed"""
     # Step 1: Clean off backticks and ```json if present
     if raw_response.startswith("```json") or raw_response.startswith("```"):
         raw_response = raw_response.strip("` \n").replace("```json", "").replace("```", "").strip()
 
     try:
         # Step 2: Try direct load
-        parsed_json = json.loads(raw_response)
+        return json.loads(raw_response)
     except json.JSONDecodeError:
         # Step 3: Fallback to json repair
-        repaired = repair_json(raw_response)
-        parsed_json = json.loads(repaired)
+        return json.loads(repair_json(raw_response))
+
+
+def get_headings_from_context(keywords: str, context: str, stats: dict = None) -> dict:
+    """
+    Asks the LLM for the outline, given source material already within the prompt budget.
+    If a stats dict is given the tokens sent are added to it.
+    """
+    prompt = outline_prompt(keywords, context)
+    raw_response = chat(prompt, max_tokens=4096, priority="outline")
+    if stats is not None:
+        stats["outline_tokens_sent"] = estimate_tokens(prompt)
+    return parse_outline(raw_response)
+
+
+def get_headings_from_llm(txt_folder: str, keywords: str, stats: dict = None, skip_files=()) -> dict:
+    """
+    Uses the Together API to generate a structured outline for a literature review paper.
+    Returns a valid Python dictionary parsed from the LLM's JSON response.
+    If a stats dict is given it is filled with the token counts of each stage.
+    """
+    print("Keyword:", keywords)
 
-    return parsed_json
+    context, context_stats = build_context(txt_folder, skip_files=skip_files)
+    headings = get_headings_from_context(keywords, context, stats=context_stats)
+    if stats is not None:
+        stats.update(context_stats)
+    return headings
@@ -1,42 +1,113 @@
-from together import Together # type: ignore
 import os, json
-from dotenv import load_dotenv # type: ignore
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from json_repair import repair_json # type: ignore
+from llmCalls.llm_client import chat, model_name, ResponseCache
+import metrics
 
-# Load environment variables
-load_dotenv()
+# Papers per LLM call and number of calls in flight at once
+RATING_BATCH_SIZE = int(os.getenv("RATING_BATCH_SIZE", 8))
+RATING_CONCURRENCY = int(os.getenv("RATING_CONCURRENCY", 4))
+ABSTRACT_CHARS = 1200  # Enough of the abstract to judge the paper while keeping prompts small
 
-api_key = os.getenv("API_KEY")
+_rating_cache = None
+_rating_cache_lock = threading.Lock()
 
-# Ensure API key is provided
-if not api_key:
-    raise ValueError(
-        "API key is missing. Set the TOGETHER_API_KEY environment variable."
-    )
 
-# Define model (ensure it exists on Together API)
-model_name = "meta-llama/Llama-3.3-70B-Instruct-Turbo"
+def get_rating_cache():
+    """Ratings by arXiv ID, so a paper that shows up in several searches is rated once"""
+    global _rating_cache
+    with _rating_cache_lock:
+        if _rating_cache is None:
+            _rating_cache = ResponseCache(namespace="ratings")
+        return _rating_cache
 
-def get_rating(response):
-    client = Together(api_key=api_key)
 
-    prompt = ""
-    for result in response:
-        formatted_string = f"""
-            PDF: {result.pdf_url}"""
-        prompt += formatted_string
+def paper_id(result) -> str:
+    if hasattr(result, "get_short_id"):
+        return result.get_short_id()
+    return getattr(result, "arxiv_id", None) or result.pdf_url
+
+
+def _rate_batch(batch) -> dict:
+    """Rates one batch from title and abstract and returns {paper_id: rating}"""
+    ids = [paper_id(result) for result in batch]
+    papers = ""
+    for pid, result in zip(ids, batch):
+        abstract = " ".join((result.summary or "").split())[:ABSTRACT_CHARS]
+        papers += f"""
+            ID: {pid}
+            Title: {result.title}
+            Abstract: {abstract}
+            """
 
     # Message content (Ensuring UTF-8 encoding is used)
-    message_content = f"""Provide the output in proper JSON format, with the PDF URL as the key and value is the rating for each paper out of 10. 
-    Only provide the JSON output, without any explanations. \n\n{prompt}"""
-
-    # Make the API call
-    response = client.chat.completions.create(
-        model=model_name,
-        messages=[{"role": "user", "content": message_content}],
-        max_tokens=1024,  
-    )
-
-    # Print the response
-    response = repair_json(response.choices[0].message.content)
-    return json.loads(response)
+    message_content = f"""Provide the output in proper JSON format, with the paper ID as the key and value is the rating for each paper out of 10.
+    Only provide the JSON output, without any explanations. \n\n{papers}"""
+
+    with metrics.timed("rating.batch", papers=len(batch)) as span:
+        # Output stays small and bounded: one short key/value pair per paper
+        content = chat(message_content, max_tokens=32 + 24 * len(batch), priority="rating")
+        parsed = json.loads(repair_json(content))
+        if not isinstance(parsed, dict):
+            return {}
+        ratings = {pid: parsed[pid] for pid in ids if pid in parsed}
+        span["rated"] = len(ratings)
+    return ratings
+
+
+def iter_ratings(response, batch_size: int = None, max_workers: int = None):
+    """
+    Rates papers in concurrent batches and yields {paper_id: rating} dicts as each batch completes.
+    Cached ratings are yielded first, without any LLM call.
+
+    Args:
+        response (list): arXiv results or catalog papers (anything with title, summary and an ID).
+        batch_size (int, optional): Papers per LLM call. Defaults to RATING_BATCH_SIZE.
+        max_workers (int, optional): Batches rated at once. Defaults to RATING_CONCURRENCY.
+    """
+    batch_size = batch_size or RATING_BATCH_SIZE
+    max_workers = max_workers or RATING_CONCURRENCY
+    cache = get_rating_cache()
+
+    cached = {}
+    pending = []
+    for result in response:
+        rating = cache.get(f"{model_name}:{paper_id(result)}")
+        if rating is not None:
+            cached[paper_id(result)] = rating
+        else:
+            pending.append(result)
+    metrics.incr("rating.cache_hits", len(cached))
+    if cached:
+        yield cached
+
+    batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+    if not batches:
+        return
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(metrics.in_context(_rate_batch), batch): batch for batch in batches}
+        for future in as_completed(futures):
+            try:
+                ratings = future.result()
+            except Exception as e:
+                # A failed batch only loses its own ratings
+                print(f"Rating batch failed: {e}")
+                continue
+
+            completed = {}
+            for result in futures[future]:
+                pid = paper_id(result)
+                if pid in ratings:
+                    cache.put(f"{model_name}:{pid}", ratings[pid])
+                    completed[pid] = ratings[pid]
+            yield completed
+
+
+def get_rating(response, batch_size: int = None, max_workers: int = None):
+    """Rates every paper and returns {paper_id: rating}; papers that could not be rated are left out"""
+    ratings = {}
+    for completed in iter_ratings(response, batch_size=batch_size, max_workers=max_workers):
+        ratings.update(completed)
+    return ratings
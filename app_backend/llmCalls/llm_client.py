@@ -0,0 +1,185 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import deque
+from dotenv import load_dotenv  # type: ignore
+import metrics
+from llmCalls.scheduler import get_scheduler
+
+# Load environment variables once for every llmCalls module
+load_dotenv()
+
+# Point at a Together-compatible mock server (e.g. http://127.0.0.1:8000/v1) to run offline
+base_url = os.getenv("LLM_BASE_URL")
+
+# Define the LLM model to use
+model_name = "meta-llama/Llama-3.3-70B-Instruct-Turbo"
+
+# Response cache settings
+CACHE_PATH = os.getenv("LLM_CACHE_PATH", "llm_cache.sqlite3")
+CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 5000))
+
+
+class ResponseCache:
+    """
+    Small SQLite key/value store with TTL and size-based eviction.
+    Each namespace is its own table, so other stages can keep their own entries in the same file.
+    """
+
+    def __init__(self, path=CACHE_PATH, namespace="responses", ttl=CACHE_TTL_SECONDS, max_entries=CACHE_MAX_ENTRIES):
+        self.table = namespace
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_accessed ON {self.table} (accessed)")
+        self._conn.commit()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, created FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl:
+                self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute(f"UPDATE {self.table} SET accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def put(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        self._conn.execute(f"DELETE FROM {self.table} WHERE created < ?", (now - self.ttl,))
+        # Least recently used entries go first once the table is over its size limit
+        self._conn.execute(
+            f"DELETE FROM {self.table} WHERE key IN ("
+            f"SELECT key FROM {self.table} ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+
+_client = None
+_client_lock = threading.Lock()
+_cache = None
+
+_stats_lock = threading.Lock()
+stats = {"calls": 0, "hits": 0, "misses": 0, "prompt_tokens": 0, "completion_tokens": 0}
+recent_calls = deque(maxlen=200)
+
+
+def get_client():
+    """
+    One Together client per process, so its HTTP connection pool is reused across calls.
+    The SDK is imported and the API key checked on first use, so the server boots without either.
+    Its own retries are off: the scheduler retries, with backoff shared by every caller.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            api_key = os.getenv("API_KEY")
+            # Ensure API key is provided
+            if not api_key:
+                raise ValueError("API key is missing. Set the API_KEY environment variable.")
+            from together import Together  # type: ignore
+            _client = Together(api_key=api_key, base_url=base_url, max_retries=0)
+        return _client
+
+
+def get_cache():
+    global _cache
+    with _client_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
+
+
+def cache_key(model: str, prompt: str, params: dict) -> str:
+    prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    payload = json.dumps({"model": model, "prompt": prompt_hash, "params": params}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _record(call: dict):
+    metrics.record("llm.chat", call["seconds"], prompt_tokens=call["prompt_tokens"],
+                   completion_tokens=call["completion_tokens"], cache_hits=int(call["cached"]))
+    with _stats_lock:
+        stats["calls"] += 1
+        stats["hits" if call["cached"] else "misses"] += 1
+        stats["prompt_tokens"] += call["prompt_tokens"]
+        stats["completion_tokens"] += call["completion_tokens"]
+        recent_calls.append(call)
+
+
+def get_stats() -> dict:
+    """Totals, scheduler queue depths plus the most recent per-call records (cache hit, tokens, latency)."""
+    with _stats_lock:
+        return {**stats, "scheduler": get_scheduler().stats(), "recent_calls": list(recent_calls)}
+
+
+def chat(prompt: str, max_tokens: int, model: str = model_name, use_cache: bool = True, priority: str = "outline",
+         **params) -> str:
+    """
+    Sends a single-message chat completion and returns the stripped response text.
+    Identical (model, prompt, max_tokens, params) calls are answered from the on-disk cache, or share
+    the request already in flight. Requests go through the scheduler in priority order
+    ("keyword", "rating" or "outline"), within the API rate limits.
+    """
+    key = cache_key(model, prompt, {"max_tokens": max_tokens, **params})
+    start = time.perf_counter()
+
+    if use_cache:
+        cached = get_cache().get(key)
+        if cached is not None:
+            _record({"model": model, "key": key[:12], "cached": True, "prompt_tokens": 0,
+                     "completion_tokens": 0, "seconds": round(time.perf_counter() - start, 4)})
+            return cached["content"]
+
+    def request():
+        response = get_client().chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=max_tokens,
+            **params,
+        )
+        content = response.choices[0].message.content.strip()
+        usage = response.usage
+        call = {
+            "model": model,
+            "key": key[:12],
+            "cached": False,
+            "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+            "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+            "seconds": round(time.perf_counter() - start, 4),
+        }
+        if use_cache:
+            get_cache().put(key, {"content": content})
+        _record(call)
+        return content, call["prompt_tokens"] + call["completion_tokens"]
+
+    # About 4 characters per token; the reservation is settled against the reported usage
+    return get_scheduler().run(key, request, priority=priority, tokens=len(prompt) // 4 + max_tokens)
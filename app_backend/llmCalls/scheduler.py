@@ -0,0 +1,250 @@
+import os
+import time
+import heapq
+import random
+import itertools
+import threading
+import metrics
+
+# API plan limits; 0 turns a limit off
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", 600))
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", 180000))
+
+# Requests in flight at once, across every caller
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", 8))
+
+# Retries of a 429, 5xx or connection error, with full-jitter exponential backoff
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 4))
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", 0.5))
+LLM_RETRY_MAX_SECONDS = 30.0
+
+# Lower runs first: interactive keyword extraction, then search ratings, then background outlines
+PRIORITIES = {"keyword": 0, "rating": 1, "outline": 2}
+
+# Together SDK errors that are worth another attempt, matched by name so the SDK stays lazily imported
+TRANSIENT_ERRORS = ("RateLimitError", "ServiceUnavailableError", "Timeout", "APIConnectionError")
+
+
+class TokenBucket:
+    """Holds up to capacity units and refills at capacity per minute. Not locked: the scheduler's lock guards it."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.capacity / 60)
+        self._updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until amount is available; 0 if it is now or the bucket is unlimited"""
+        if not self.capacity:
+            return 0.0
+        self._refill(now)
+        # A request larger than the whole bucket waits for a full bucket instead of forever
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.level) * 60 / self.capacity)
+
+    def available(self, now: float):
+        """Units available now; None for an unlimited bucket"""
+        if not self.capacity:
+            return None
+        self._refill(now)
+        return self.level
+
+    def take(self, amount: float):
+        if self.capacity:
+            self.level -= min(amount, self.capacity)
+
+    def give_back(self, amount: float):
+        if self.capacity:
+            self.level = min(self.capacity, self.level + amount)
+
+
+def status_code(error: Exception):
+    return getattr(error, "http_status", None) or getattr(error, "status_code", None)
+
+
+def is_transient(error: Exception) -> bool:
+    status = status_code(error)
+    if status is not None:
+        return status == 429 or status >= 500
+    return type(error).__name__ in TRANSIENT_ERRORS or isinstance(error, (ConnectionError, TimeoutError))
+
+
+def retry_after(error: Exception):
+    """Seconds the server asked us to wait (Retry-After header), if it said"""
+    headers = getattr(error, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after") or headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+class _Call:
+    """One distinct request: the caller that submitted it runs it, identical callers wait for its outcome"""
+
+    def __init__(self, priority: int):
+        self.priority = priority
+        self.queued = False
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class LLMScheduler:
+    """
+    Admits LLM requests from every thread in priority order, within the request and token rate
+    limits and the concurrency cap, so a burst of ratings or a long outline job cannot starve an
+    interactive keyword call, and a 429 slows every caller down instead of failing the request.
+
+    Identical requests (same cache key) already queued or in flight are coalesced: later callers
+    wait for the first one's result, and a higher-priority joiner moves the shared request up the queue.
+    """
+
+    def __init__(self, requests_per_minute: int = LLM_REQUESTS_PER_MINUTE, tokens_per_minute: int = LLM_TOKENS_PER_MINUTE,
+                 concurrency: int = LLM_CONCURRENCY, max_retries: int = LLM_MAX_RETRIES):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self._cond = threading.Condition()
+        self._queue = []  # heap of (priority, sequence, call); a call may appear more than once after a priority bump
+        self._sequence = itertools.count()
+        self._active = 0
+        self._inflight = {}  # key -> _Call
+        self._paused_until = 0.0  # set by a 429, holds every request back
+        self._max_queued = 0
+
+    def run(self, key: str, fn, priority: str = "outline", tokens: int = 0):
+        """
+        Runs fn, one API request, once it is admitted, and returns its value.
+
+        Args:
+            key (str): Identity of the request for coalescing; None never coalesces.
+            fn (callable): Makes the request and returns (value, tokens actually used).
+            priority (str): A PRIORITIES class.
+            tokens (int): Estimated prompt plus completion tokens, reserved until the real usage is known.
+        """
+        rank = PRIORITIES[priority]
+        with self._cond:
+            call = self._inflight.get(key) if key is not None else None
+            leader = call is None
+            if leader:
+                call = _Call(rank)
+                if key is not None:
+                    self._inflight[key] = call
+            elif call.queued and rank < call.priority:
+                call.priority = rank
+                heapq.heappush(self._queue, (rank, next(self._sequence), call))
+                self._cond.notify_all()
+
+        if not leader:
+            metrics.incr("llm.scheduler.coalesced")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._execute(call, fn, tokens, priority)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._cond:
+                if key is not None:
+                    self._inflight.pop(key, None)
+            call.done.set()
+
+    def _execute(self, call: _Call, fn, tokens: int, priority: str):
+        for attempt in itertools.count():
+            self._acquire(call, tokens, priority)
+            try:
+                value, used = fn()
+            except Exception as e:
+                # A rejected or failed request still counts against the request rate, not the token rate
+                self._release(tokens, 0)
+                if attempt >= self.max_retries or not is_transient(e):
+                    metrics.incr("llm.scheduler.failed")
+                    raise
+                metrics.incr("llm.scheduler.retries")
+                delay = random.uniform(0, min(LLM_RETRY_MAX_SECONDS, LLM_RETRY_BASE_SECONDS * 2 ** attempt))
+                if status_code(e) == 429 or type(e).__name__ == "RateLimitError":
+                    # The limit is shared, so everyone backs off, for at least as long as the server asked
+                    delay = max(delay, retry_after(e) or 0.0)
+                    with self._cond:
+                        self._paused_until = max(self._paused_until, time.monotonic() + delay)
+                    metrics.incr("llm.scheduler.rate_limited")
+                else:
+                    time.sleep(delay)
+                continue
+            self._release(tokens, used or tokens)
+            return value
+
+    def _acquire(self, call: _Call, tokens: int, priority: str):
+        start = time.monotonic()
+        with self._cond:
+            heapq.heappush(self._queue, (call.priority, next(self._sequence), call))
+            call.queued = True
+            self._max_queued = max(self._max_queued, len(self._queue))
+            while True:
+                timeout = None
+                if self._queue[0][2] is call and self._active < self.concurrency:
+                    now = time.monotonic()
+                    timeout = max(self._paused_until - now, self.requests.wait_time(1, now),
+                                  self.tokens.wait_time(tokens, now))
+                    if timeout <= 0:
+                        break
+                self._cond.wait(timeout)
+            self._queue = [entry for entry in self._queue if entry[2] is not call]
+            heapq.heapify(self._queue)
+            call.queued = False
+            self.requests.take(1)
+            self.tokens.take(tokens)
+            self._active += 1
+            # The next request in line may be admissible too
+            self._cond.notify_all()
+        metrics.record(f"llm.queue_wait.{priority}", time.monotonic() - start)
+
+    def _release(self, reserved: int, used: int):
+        with self._cond:
+            self._active -= 1
+            # Settle the token reservation against the real usage
+            if used < reserved:
+                self.tokens.give_back(reserved - used)
+            elif used > reserved:
+                self.tokens.take(used - reserved)
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        """Queue depth per priority class, requests in flight and what is left of each rate limit"""
+        with self._cond:
+            now = time.monotonic()
+            queued = {call for _, _, call in self._queue}
+            by_priority = {name: sum(1 for call in queued if call.priority == rank) for name, rank in PRIORITIES.items()}
+            requests, tokens = self.requests.available(now), self.tokens.available(now)
+            return {
+                "queued": by_priority,
+                "max_queued": self._max_queued,
+                "active": self._active,
+                "distinct_requests": len(self._inflight),
+                "paused_seconds": round(max(0.0, self._paused_until - now), 3),
+                "requests_available": round(requests, 1) if requests is not None else None,
+                "tokens_available": round(tokens) if tokens is not None else None,
+            }
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> LLMScheduler:
+    """One scheduler per process, shared by every llmCalls module"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = LLMScheduler()
+        return _scheduler
@@ -0,0 +1,216 @@
+import os
+import time
+import uuid
+import bisect
+import threading
+import contextvars
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the latency histogram buckets; one more bucket catches everything slower
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+# A trace with a span at least this slow is kept in the slow trace list
+SLOW_STAGE_SECONDS = float(os.getenv("SLOW_STAGE_SECONDS", 5))
+MAX_RECENT_TRACES = 200
+MAX_SLOW_TRACES = 50
+MAX_SPANS_PER_TRACE = 1000
+
+
+class Histogram:
+    """Fixed-bucket latency histogram with count, sum and max."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Estimate, interpolating linearly inside the bucket the quantile falls in."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                low = self.buckets[index - 1] if index > 0 else 0.0
+                high = self.buckets[index] if index < len(self.buckets) else self.max
+                return min(low + (high - low) * (rank - seen) / count, self.max)
+            seen += count
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 4),
+            "mean": round(self.sum / self.count, 4) if self.count else 0.0,
+            "max": round(self.max, 4),
+            "p50": round(self.quantile(0.50), 4),
+            "p90": round(self.quantile(0.90), 4),
+            "p99": round(self.quantile(0.99), 4),
+            "buckets": {
+                **{str(bound): count for bound, count in zip(self.buckets, self.counts)},
+                "inf": self.counts[-1],
+            },
+        }
+
+
+class Trace:
+    """Spans recorded while serving one request or running one job."""
+
+    def __init__(self, name: str, trace_id: str = None):
+        self.id = trace_id or uuid.uuid4().hex
+        self.name = name
+        self.started = time.time()
+        self.seconds = None
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, span: dict):
+        with self._lock:
+            if len(self.spans) < MAX_SPANS_PER_TRACE:
+                self.spans.append(span)
+
+    def slowest(self) -> float:
+        with self._lock:
+            return max((span["seconds"] for span in self.spans), default=0.0)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {"trace_id": self.id, "name": self.name, "started": self.started,
+                    "seconds": self.seconds, "spans": list(self.spans)}
+
+
+_current_trace = contextvars.ContextVar("trace", default=None)
+
+
+class MetricsRegistry:
+    """Process-wide latency histograms, counters and recent traces."""
+
+    def __init__(self):
+        self.started = time.time()
+        self._histograms = {}
+        self._counters = {}
+        self._traces = OrderedDict()
+        self._slow_traces = deque(maxlen=MAX_SLOW_TRACES)
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, seconds: float):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+    def incr(self, name: str, value=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def finish_trace(self, trace: Trace):
+        trace.seconds = round(time.time() - trace.started, 4)
+        with self._lock:
+            self._traces[trace.id] = trace
+            while len(self._traces) > MAX_RECENT_TRACES:
+                self._traces.popitem(last=False)
+            if trace.slowest() >= SLOW_STAGE_SECONDS:
+                self._slow_traces.append(trace)
+
+    def get_trace(self, trace_id: str):
+        with self._lock:
+            return self._traces.get(trace_id)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            uptime = time.time() - self.started
+            return {
+                "uptime_seconds": round(uptime, 1),
+                "histograms": {name: histogram.to_dict() for name, histogram in sorted(self._histograms.items())},
+                "counters": dict(sorted(self._counters.items())),
+                "rates_per_second": {name: round(value / uptime, 4) for name, value in sorted(self._counters.items())},
+                "slow_traces": [
+                    {"trace_id": trace.id, "name": trace.name, "seconds": trace.seconds, "slowest_span": trace.slowest()}
+                    for trace in self._slow_traces
+                ],
+            }
+
+
+registry = MetricsRegistry()
+
+
+def incr(name: str, value=1):
+    registry.incr(name, value)
+
+
+def record(stage: str, seconds: float, **counts):
+    """
+    Records one completed stage: its latency goes into the stage histogram, every count
+    (bytes, pages, tokens, cache hits...) is added to the "<stage>.<name>" counter, and the
+    span is attached to the current request or job trace.
+    """
+    registry.observe(stage, seconds)
+    registry.incr(f"{stage}.calls")
+    for name, value in counts.items():
+        if value:
+            registry.incr(f"{stage}.{name}", value)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add({"stage": stage, "seconds": round(seconds, 4), **counts})
+
+
+@contextmanager
+def timed(stage: str, **counts):
+    """
+    Times a block as one stage. The yielded dict can be filled with counts while the block runs:
+
+        with timed("rag.embed") as span:
+            span["chunks"] = len(batch)
+    """
+    span = dict(counts)
+    start = time.perf_counter()
+    try:
+        yield span
+    except Exception:
+        registry.incr(f"{stage}.errors")
+        raise
+    finally:
+        record(stage, time.perf_counter() - start, **span)
+
+
+def start_trace(name: str, trace_id: str = None) -> tuple:
+    """Makes a new trace current for this thread or task. Returns (trace, token) for end_trace."""
+    trace = Trace(name, trace_id)
+    return trace, _current_trace.set(trace)
+
+
+def end_trace(trace: Trace, token):
+    try:
+        _current_trace.reset(token)
+    except (RuntimeError, ValueError):
+        # Token already used, or set in another context (a streamed response finishing elsewhere)
+        pass
+    registry.finish_trace(trace)
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+def in_context(fn):
+    """Wraps fn so that, on any worker thread, its spans join the trace current where in_context was called."""
+    trace = _current_trace.get()
+
+    def run(*args, **kwargs):
+        token = _current_trace.set(trace)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current_trace.reset(token)
+    return run
@@ -0,0 +1,243 @@
+import os
+import time
+import sqlite3
+import threading
+from dataclasses import dataclass, asdict
+
+CATALOG_PATH = os.getenv("CATALOG_PATH", "papers.sqlite3")
+
+# How long a stored keyword search is served from the catalog before arXiv is asked again
+SEARCH_FRESH_SECONDS = int(os.getenv("SEARCH_FRESH_SECONDS", 6 * 3600))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS papers (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    arxiv_id TEXT NOT NULL UNIQUE,
+    doi TEXT,
+    title TEXT,
+    abstract TEXT,
+    published TEXT,
+    pdf_url TEXT,
+    rating REAL,
+    download_path TEXT,
+    text_path TEXT,
+    duplicate_of INTEGER,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS papers_rating ON papers (rating);
+
+CREATE TABLE IF NOT EXISTS search_results (
+    keyword TEXT NOT NULL,
+    paper_id INTEGER NOT NULL REFERENCES papers (id),
+    rank INTEGER NOT NULL,
+    searched_at REAL NOT NULL,
+    requested INTEGER NOT NULL DEFAULT 15,
+    PRIMARY KEY (keyword, paper_id)
+);
+CREATE INDEX IF NOT EXISTS search_results_keyword ON search_results (keyword, searched_at);
+"""
+
+
+@dataclass
+class CatalogPaper:
+    """
+    One catalog row. Attribute names follow arxiv.Result where they overlap, so the rating stage accepts either.
+    arxiv_id is the paper's catalog key: its arXiv ID, or a doi:/openalex: key for works not on arXiv.
+    """
+    id: int
+    arxiv_id: str
+    title: str
+    summary: str
+    published: str
+    pdf_url: str
+    rating: float = None
+    download_path: str = None
+    text_path: str = None
+    doi: str = None
+    duplicate_of: int = None  # id of the paper this one duplicates (older version or near-duplicate)
+    relevance: float = None  # lexical match with the current search's keywords, 0-1; not stored
+
+    def to_response(self) -> dict:
+        return {
+            "id": self.id,
+            "ArxivID": self.arxiv_id,
+            "DOI": self.doi,
+            "Title": self.title,
+            "URL": self.pdf_url,
+            "Published": self.published,
+            "Rating": self.rating if self.rating is not None else "N/A",
+            "DuplicateOf": self.duplicate_of,
+            "Relevance": self.relevance,
+        }
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def normalize_keyword(keyword: str) -> str:
+    return " ".join(keyword.lower().split())
+
+
+def search_key(keyword: str, sources=("arxiv", "openalex")) -> str:
+    """Stored searches are per keyword and set of sources, so an arXiv-only search never answers a federated one"""
+    return f"{normalize_keyword(keyword)}\t{','.join(sorted(set(sources)))}"
+
+
+class PaperCatalog:
+    """
+    SQLite catalog of every paper seen, with stable integer IDs per arXiv ID.
+    Remembers ratings, download and text paths, and which papers each keyword search returned.
+    """
+
+    def __init__(self, path: str = CATALOG_PATH):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+        self._conn.commit()
+
+    def _migrate(self):
+        """Adds columns introduced after a catalog file was first created"""
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(papers)")}
+        if "doi" not in columns:
+            self._conn.execute("ALTER TABLE papers ADD COLUMN doi TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS papers_doi ON papers (doi)")
+        if "duplicate_of" not in columns:
+            self._conn.execute("ALTER TABLE papers ADD COLUMN duplicate_of INTEGER")
+        # Searches stored before max_results could be chosen asked each source for 15 results
+        search_columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(search_results)")}
+        if "requested" not in search_columns:
+            self._conn.execute("ALTER TABLE search_results ADD COLUMN requested INTEGER NOT NULL DEFAULT 15")
+
+    def _rows_to_papers(self, rows) -> list:
+        return [
+            CatalogPaper(
+                id=row["id"], arxiv_id=row["arxiv_id"], title=row["title"], summary=row["abstract"],
+                published=row["published"], pdf_url=row["pdf_url"], rating=row["rating"],
+                download_path=row["download_path"], text_path=row["text_path"], doi=row["doi"],
+                duplicate_of=row["duplicate_of"],
+            )
+            for row in rows
+        ]
+
+    def upsert_results(self, records) -> list:
+        """
+        Stores search records (new or refreshed metadata) and returns them as CatalogPapers, in order.
+        Records are federated_search.PaperRecord objects; a record without an arXiv ID that matches a
+        stored paper by DOI updates that paper instead of creating another one.
+        """
+        now = time.time()
+        keys = []
+        with self._lock:
+            for record in records:
+                key = record.key
+                if not record.arxiv_id and record.doi:
+                    row = self._conn.execute("SELECT arxiv_id FROM papers WHERE doi = ?", (record.doi,)).fetchone()
+                    key = row["arxiv_id"] if row else key
+                self._conn.execute(
+                    "INSERT INTO papers (arxiv_id, doi, title, abstract, published, pdf_url, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (arxiv_id) DO UPDATE SET doi = COALESCE(excluded.doi, doi), title = excluded.title, "
+                    "abstract = COALESCE(NULLIF(excluded.abstract, ''), abstract), published = excluded.published, "
+                    "pdf_url = COALESCE(excluded.pdf_url, pdf_url), updated_at = excluded.updated_at",
+                    (key, record.doi, record.title, record.summary, record.published, record.pdf_url, now),
+                )
+                keys.append(key)
+            self._conn.commit()
+        return self.get_by_arxiv_ids(list(dict.fromkeys(keys)))
+
+    def get_by_arxiv_ids(self, arxiv_ids: list) -> list:
+        if not arxiv_ids:
+            return []
+        placeholders = ",".join("?" * len(arxiv_ids))
+        with self._lock:
+            rows = self._conn.execute(f"SELECT * FROM papers WHERE arxiv_id IN ({placeholders})", arxiv_ids).fetchall()
+        by_arxiv = {paper.arxiv_id: paper for paper in self._rows_to_papers(rows)}
+        return [by_arxiv[arxiv_id] for arxiv_id in arxiv_ids if arxiv_id in by_arxiv]
+
+    def get_many(self, paper_ids: list) -> list:
+        if not paper_ids:
+            return []
+        placeholders = ",".join("?" * len(paper_ids))
+        with self._lock:
+            rows = self._conn.execute(f"SELECT * FROM papers WHERE id IN ({placeholders})", paper_ids).fetchall()
+        by_id = {paper.id: paper for paper in self._rows_to_papers(rows)}
+        return [by_id[paper_id] for paper_id in paper_ids if paper_id in by_id]
+
+    def record_search(self, keyword: str, papers: list, requested: int = 15, sources=("arxiv", "openalex")):
+        """Stores the papers a search of sources returned; requested is the max_results each source was asked for"""
+        keyword = search_key(keyword, sources)
+        now = time.time()
+        with self._lock:
+            self._conn.execute("DELETE FROM search_results WHERE keyword = ?", (keyword,))
+            self._conn.executemany(
+                "INSERT INTO search_results (keyword, paper_id, rank, searched_at, requested) VALUES (?, ?, ?, ?, ?)",
+                [(keyword, paper.id, rank, now, requested) for rank, paper in enumerate(papers)],
+            )
+            self._conn.commit()
+
+    def cached_search(self, keyword: str, requested: int = 15, sources=("arxiv", "openalex"),
+                      max_age: int = SEARCH_FRESH_SECONDS):
+        """
+        Papers the last search for keyword in the same sources returned, if it is fresh enough and asked for
+        at least requested results per source; None otherwise.
+        """
+        keyword = search_key(keyword, sources)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT papers.* FROM search_results JOIN papers ON papers.id = search_results.paper_id "
+                "WHERE search_results.keyword = ? AND search_results.searched_at >= ? AND search_results.requested >= ? "
+                "ORDER BY search_results.rank",
+                (keyword, time.time() - max_age, requested),
+            ).fetchall()
+        return self._rows_to_papers(rows) if rows else None
+
+    def set_ratings(self, ratings: dict):
+        """ratings maps arXiv ID to rating"""
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE papers SET rating = ?, updated_at = ? WHERE arxiv_id = ?",
+                [(rating, time.time(), arxiv_id) for arxiv_id, rating in ratings.items()],
+            )
+            self._conn.commit()
+
+    def set_duplicates(self, duplicates: dict):
+        """duplicates maps paper id to the id of the paper it duplicates, or None to clear the flag"""
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE papers SET duplicate_of = ?, updated_at = ? WHERE id = ?",
+                [(canonical, time.time(), paper_id) for paper_id, canonical in duplicates.items()],
+            )
+            self._conn.commit()
+
+    def set_paths(self, column: str, paths: dict):
+        """Records download_path or text_path for each arXiv ID in paths"""
+        if column not in ("download_path", "text_path"):
+            raise ValueError(f"Unknown path column: {column}")
+        with self._lock:
+            self._conn.executemany(
+                f"UPDATE papers SET {column} = ?, updated_at = ? WHERE arxiv_id = ?",
+                [(path, time.time(), arxiv_id) for arxiv_id, path in paths.items()],
+            )
+            self._conn.commit()
+
+    def top_rated(self, limit: int = 20) -> list:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM papers WHERE rating IS NOT NULL ORDER BY rating DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return self._rows_to_papers(rows)
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog() -> PaperCatalog:
+    """The process-wide catalog of every paper seen, at CATALOG_PATH; opened on first use"""
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = PaperCatalog()
+        return _catalog
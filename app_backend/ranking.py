@@ -0,0 +1,59 @@
+import os
+import re
+import numpy as np
+
+# Papers per search sent to the LLM for rating, best lexical matches first; 0 rates every paper
+RATING_TOP_N = int(os.getenv("RATING_TOP_N", 20))
+
+# BM25 term-frequency saturation and document length normalization
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+STOPWORDS = frozenset("a an and are as at by for from in into is of on or the to using via with".split())
+
+
+def tokenize(text: str) -> list:
+    return [word for word in re.findall(r"[a-z0-9]+", (text or "").lower()) if word not in STOPWORDS]
+
+
+def bm25_scores(query: str, documents: list, k1: float = BM25_K1, b: float = BM25_B) -> np.ndarray:
+    """
+    BM25 score of every document against the query, with document frequencies taken from the documents themselves.
+    Only query terms are counted, so the term matrix is (documents x query terms) however large the vocabulary.
+    """
+    terms = {term: column for column, term in enumerate(dict.fromkeys(tokenize(query)))}
+    if not terms or not documents:
+        return np.zeros(len(documents))
+    tokens = [tokenize(document) for document in documents]
+    lengths = np.array([len(words) for words in tokens], dtype=np.float64)
+
+    # One flat (document, term) cell index per query-term occurrence, counted in a single bincount
+    cells = np.fromiter(
+        (row * len(terms) + terms[word] for row, words in enumerate(tokens) for word in words if word in terms),
+        dtype=np.intp,
+    )
+    tf = np.bincount(cells, minlength=len(documents) * len(terms)).reshape(len(documents), len(terms)).astype(np.float64)
+    df = np.count_nonzero(tf, axis=0)
+    idf = np.log1p((len(documents) - df + 0.5) / (df + 0.5))
+    norm = k1 * (1 - b + b * lengths / max(lengths.mean(), 1.0))
+    return (tf * (k1 + 1) / (tf + norm[:, None])) @ idf
+
+
+def rank_papers(keywords: str, papers: list, top_n: int = RATING_TOP_N) -> tuple:
+    """
+    Scores papers by title and abstract against the search keywords.
+
+    Returns:
+        tuple: (relevance, shortlist) where relevance maps paper id to its BM25 score scaled to 0-1 within
+               these papers, and shortlist holds the ids of the top_n papers that are not duplicates,
+               the ones worth an LLM rating.
+    """
+    scores = bm25_scores(keywords, [f"{paper.title} {paper.summary}" for paper in papers])
+    best = scores.max() if len(scores) else 0.0
+    relevance = {paper.id: round(float(score / best), 3) if best > 0 else 0.0 for paper, score in zip(papers, scores)}
+
+    # Stable, so equally scored papers keep the search order
+    order = np.argsort(-scores, kind="stable")
+    canonical = [papers[index].id for index in order if papers[index].duplicate_of is None]
+    shortlist = set(canonical[:top_n] if top_n > 0 else canonical)
+    return relevance, shortlist
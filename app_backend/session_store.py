@@ -0,0 +1,135 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+# Bounds that keep memory per session, and the number of sessions, in check
+SESSION_IDLE_SECONDS = int(os.getenv("SESSION_IDLE_SECONDS", 1800))
+MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", 500))
+MAX_RESULTS_PER_SESSION = 500
+MAX_ACCEPTED_PER_SESSION = 1000
+
+DEFAULT_SESSION = "default"
+
+
+def dedup_key(paper: dict) -> str:
+    """Papers are the same if they share an arXiv ID; the PDF URL is the fallback."""
+    return paper.get("ArxivID") or paper["URL"]
+
+
+class SessionStore:
+    """
+    Search results and accepted papers of one client session.
+    Results are indexed by paper ID and arXiv ID; accepted papers by arXiv ID, so accept and dedup are O(1).
+    """
+
+    def __init__(self, session_id: str):
+        self.id = session_id
+        self.lock = threading.RLock()
+        self.results = {}  # paper id -> paper
+        self.results_by_arxiv = {}  # arXiv ID -> paper id
+        self.accepted = OrderedDict()  # dedup key -> paper, in acceptance order
+        self.accepted_ids = set()  # paper ids of the accepted papers
+        self.download_folder = None  # where every batch the session accepts is downloaded
+        self.folder_name = None  # download_folder, once a batch has been downloaded into it
+        self.keywords = None
+        self.indexed = False  # whether a RAG job put this session's papers in the shared vector store
+        self.last_used = time.time()
+
+    def replace_results(self, papers: list):
+        """Swap in the results of a new search; only this session's results are touched."""
+        papers = papers[:MAX_RESULTS_PER_SESSION]
+        with self.lock:
+            self.results = {paper["id"]: paper for paper in papers}
+            self.results_by_arxiv = {paper["ArxivID"]: paper["id"] for paper in papers if paper.get("ArxivID")}
+
+    def find(self, paper_id=None, arxiv_id=None):
+        with self.lock:
+            if paper_id is None and arxiv_id is not None:
+                paper_id = self.results_by_arxiv.get(arxiv_id)
+            return self.results.get(paper_id)
+
+    def accept(self, paper_ids: list) -> tuple:
+        """
+        Accepts the given paper IDs from the current results.
+
+        Returns:
+            tuple: (accepted, skipped_ids, unknown_ids). Papers already accepted, duplicates of a paper
+                   that is accepted (or accepted along with them), and papers past the per-session
+                   limit are skipped.
+        """
+        accepted, skipped, unknown = [], [], []
+        requested = set(paper_ids)
+        with self.lock:
+            for paper_id in paper_ids:
+                paper = self.results.get(paper_id)
+                if paper is None:
+                    unknown.append(paper_id)
+                    continue
+                key = dedup_key(paper)
+                canonical = paper.get("DuplicateOf")
+                duplicate = canonical in self.accepted_ids or (canonical in requested and canonical in self.results)
+                if key in self.accepted or duplicate or len(self.accepted) >= MAX_ACCEPTED_PER_SESSION:
+                    skipped.append(paper_id)
+                    continue
+                self.accepted[key] = paper
+                self.accepted_ids.add(paper["id"])
+                accepted.append(paper)
+        return accepted, skipped, unknown
+
+    def release(self, papers: list):
+        """Undoes accept() for papers whose download could not be queued or failed, so a retry accepts them again."""
+        with self.lock:
+            for paper in papers:
+                self.accepted.pop(dedup_key(paper), None)
+                self.accepted_ids.discard(paper["id"])
+
+    def accepted_papers(self) -> list:
+        with self.lock:
+            return list(self.accepted.values())
+
+
+class SessionRegistry:
+    """
+    Thread-safe map of session ID to SessionStore with idle and LRU eviction.
+    on_evict, if given, is called with the list of evicted sessions, outside the registry lock.
+    """
+
+    def __init__(self, idle_seconds: int = SESSION_IDLE_SECONDS, max_sessions: int = MAX_SESSIONS, on_evict=None):
+        self.idle_seconds = idle_seconds
+        self.max_sessions = max_sessions
+        self.on_evict = on_evict
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str = None) -> SessionStore:
+        session_id = session_id or DEFAULT_SESSION
+        now = time.time()
+        with self._lock:
+            evicted = self._evict(now)
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = SessionStore(session_id)
+                self._sessions[session_id] = session
+            self._sessions.move_to_end(session_id)
+            session.last_used = now
+            # Least recently used sessions go once the registry is full
+            while len(self._sessions) > self.max_sessions:
+                evicted.append(self._sessions.popitem(last=False)[1])
+        if evicted and self.on_evict:
+            self.on_evict(evicted)
+        return session
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+    def _evict(self, now: float) -> list:
+        # Sessions are kept in last-used order, so idle ones are at the front
+        evicted = []
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_used <= self.idle_seconds:
+                break
+            evicted.append(self._sessions.pop(session_id))
+        return evicted
@@ -1,24 +1,419 @@
 import os
-import fitz  # PyMuPDF
+import re
+import json
+import shutil
+import time
+import hashlib
+import threading
+import multiprocessing
+import metrics
 
-def pdf_to_txt(pdf_folder):
+# Bump whenever the extracted text or its section index changes so stale cache entries are not reused
+EXTRACTOR_VERSION = "pymupdf-text-2"
+
+# Shared across every download folder, keyed by PDF content hash
+CACHE_DIR = os.getenv("PDF_TEXT_CACHE_DIR", "pdf_text_cache")
+
+# Per output folder record of which PDF each .txt was produced from
+MANIFEST_NAME = ".manifest.json"
+
+# Parallel extraction settings
+EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", os.cpu_count() or 1))
+EXTRACT_TIMEOUT = float(os.getenv("PDF_EXTRACT_TIMEOUT", 120))
+PAGES_PER_TASK = 25  # PDFs longer than two of these are split into page ranges
+
+# The app forks from a process running server and job threads, where a forked child can inherit a held lock
+# and deadlock; workers start from a clean forkserver instead (spawn where that is not available)
+_POOL_CONTEXT = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+# Section index written next to every .txt as <name>.sections.json
+SECTION_NAMES = ("front", "abstract", "introduction", "method", "results", "conclusion", "references")
+
+# Heading lines, optionally numbered ("3", "3.", "III.", "3 ") and nothing else on the line
+_NUMBERING = r"(?:(?:\d+|[IVX]+)\.?\s+)?"
+_HEADINGS = [
+    ("abstract", re.compile(r"^abstract\b", re.IGNORECASE)),  # Often runs straight into the text ("Abstract—We ...")
+    ("introduction", re.compile(rf"^{_NUMBERING}introduction$", re.IGNORECASE)),
+    ("method", re.compile(rf"^{_NUMBERING}(?:methods?|methodology|approach|proposed (?:method|approach)|materials and methods|model)$", re.IGNORECASE)),
+    ("results", re.compile(rf"^{_NUMBERING}(?:(?:experimental )?results?(?: and discussion)?|experiments?|evaluation)$", re.IGNORECASE)),
+    ("conclusion", re.compile(rf"^{_NUMBERING}(?:conclusions?|concluding remarks|discussion and conclusions?|conclusions? and future work)$", re.IGNORECASE)),
+    ("references", re.compile(r"^(?:references|bibliography)$", re.IGNORECASE)),
+]
+MAX_HEADING_CHARS = 60
+
+_stats_lock = threading.Lock()
+cache_stats = {"hits": 0, "misses": 0, "skipped": 0, "failed": 0}
+
+
+def _count(name: str):
+    with _stats_lock:
+        cache_stats[name] += 1
+    metrics.incr(f"extract.{name}")
+
+
+def get_cache_stats() -> dict:
+    """Returns a snapshot of the extraction cache counters."""
+    with _stats_lock:
+        return dict(cache_stats)
+
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    """Hashes a file in fixed-size chunks so large PDFs are never fully loaded."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cached_text_path(digest: str) -> str:
+    return os.path.join(CACHE_DIR, EXTRACTOR_VERSION, digest[:2], digest + ".txt")
+
+
+def _load_manifest(output_folder: str) -> dict:
+    try:
+        with open(os.path.join(output_folder, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _tmp_suffix() -> str:
+    """Unique per process and thread, so job threads working on the same file never share a temporary"""
+    return f"{os.getpid()}.{threading.get_ident()}"
+
+
+def _save_manifest(output_folder: str, manifest: dict):
+    path = os.path.join(output_folder, MANIFEST_NAME)
+    tmp_path = f"{path}.{_tmp_suffix()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, path)
+
+
+def sections_path(txt_path: str) -> str:
+    return os.path.splitext(txt_path)[0] + ".sections.json"
+
+
+def _find_headings(text: str) -> list:
+    """(section name, character offset) of each recognised section heading in one page of text"""
+    found = []
+    offset = 0
+    for line in text.splitlines(keepends=True):
+        stripped = line.strip()
+        if (stripped and len(stripped) <= MAX_HEADING_CHARS) or stripped[:8].lower() == "abstract":
+            for name, pattern in _HEADINGS:
+                if pattern.match(stripped):
+                    found.append((name, offset + len(line) - len(line.lstrip())))
+                    break
+        offset += len(line)
+    return found
+
+
+def extract_pages(pdf_path: str, out_path: str, start: int = 0, stop: int = None) -> dict:
+    """
+    Writes the text of pages [start, stop) to out_path, one page at a time, noting section headings on the way.
+    Runs inside pool workers, so it only takes and returns picklable values.
+
+    Returns:
+        dict: pages written, characters and UTF-8 bytes written, and the headings found as
+              (name, page, char_offset, byte_offset) with offsets relative to the start of out_path.
+    """
+    import fitz  # PyMuPDF, imported on first extraction rather than at server start
+    chars = 0
+    size = 0
+    headings = []
+    with fitz.open(pdf_path) as doc, open(out_path, "w", encoding="utf-8") as f:
+        stop = doc.page_count if stop is None else min(stop, doc.page_count)
+        for page_number in range(start, stop):
+            text = doc[page_number].get_text()
+            for name, offset in _find_headings(text):
+                headings.append((name, page_number, chars + offset, size + len(text[:offset].encode("utf-8"))))
+            f.write(text)
+            chars += len(text)
+            size += len(text.encode("utf-8"))
+    return {"pages": max(stop - start, 0), "chars": chars, "bytes": size, "headings": headings}
+
+
+def build_section_index(parts: list) -> dict:
+    """
+    Merges the extract_pages results of consecutive page ranges into one section index.
+    Each recognised section runs from its heading to the next one; text before the first heading is "front".
+    Only the first heading of each name counts, so a running header or a table of contents cannot split a section.
+    """
+    headings = []
+    chars = size = pages = 0
+    for part in parts:
+        headings.extend((name, page, chars + char, size + byte) for name, page, char, byte in part["headings"])
+        chars += part["chars"]
+        size += part["bytes"]
+        pages += part["pages"]
+
+    starts = [("front", 0, 0, 0)]
+    seen = set()
+    for heading in headings:
+        if heading[0] not in seen:
+            seen.add(heading[0])
+            starts.append(heading)
+    # Headings are in reading order; anything found after the references belongs to them (appendices)
+    if "references" in seen:
+        cut = next(index for index, heading in enumerate(starts) if heading[0] == "references")
+        starts = starts[:cut + 1]
+
+    sections = []
+    for index, (name, page, char, byte) in enumerate(starts):
+        end_page, end_char, end_byte = (
+            (starts[index + 1][1], starts[index + 1][2], starts[index + 1][3])
+            if index + 1 < len(starts) else (max(pages - 1, 0), chars, size)
+        )
+        if end_char > char:
+            sections.append({"name": name, "start_page": page, "end_page": end_page,
+                             "char_start": char, "char_end": end_char, "byte_start": byte, "byte_end": end_byte})
+    return {"version": EXTRACTOR_VERSION, "pages": pages, "chars": chars, "bytes": size, "sections": sections}
+
+
+def _save_json(path: str, data: dict):
+    tmp_path = f"{path}.{_tmp_suffix()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+def load_section_index(txt_path: str):
+    """The section index of a .txt file, or None if it has none"""
+    try:
+        with open(sections_path(txt_path), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def read_text(txt_path: str, include=None, exclude=None) -> str:
+    """
+    Reads a paper's text, optionally only some of its sections.
+
+    Args:
+        txt_path (str): The .txt file written by pdf_to_txt.
+        include (iterable, optional): Section names to keep, e.g. ("abstract", "conclusion").
+        exclude (iterable, optional): Section names to drop, e.g. ("references",).
+
+    Only the byte ranges of the wanted sections are read. A file without a section index,
+    or with no recognised sections, is returned whole.
+    """
+    index = load_section_index(txt_path) if include or exclude else None
+    if not index or len(index["sections"]) <= 1:
+        with open(txt_path, "r", encoding="utf-8") as f:
+            return f.read()
+
+    wanted = [
+        section for section in index["sections"]
+        if (not include or section["name"] in include) and (not exclude or section["name"] not in exclude)
+    ]
+    parts = []
+    with open(txt_path, "rb") as f:
+        for section in wanted:
+            f.seek(section["byte_start"])
+            parts.append(f.read(section["byte_end"] - section["byte_start"]).decode("utf-8", errors="replace"))
+    return "".join(parts)
+
+
+def extract_pdf(pdf_path: str, txt_path: str) -> int:
+    """
+    Extracts the text of one PDF into txt_path and returns its page count.
+    The file is written under a temporary name and renamed, so readers never see a partial file.
+    """
+    os.makedirs(os.path.dirname(txt_path) or ".", exist_ok=True)
+    tmp_path = f"{txt_path}.{_tmp_suffix()}.tmp"
+    result = extract_pages(pdf_path, tmp_path)
+    # The index goes first: a .txt on disk always has its index next to it
+    _save_json(sections_path(txt_path), build_section_index([result]))
+    os.replace(tmp_path, txt_path)
+    return result["pages"]
+
+
+def _page_ranges(pdf_path: str) -> list:
+    import fitz
+    with fitz.open(pdf_path) as doc:
+        page_count = doc.page_count
+    if page_count <= 2 * PAGES_PER_TASK:
+        return [(0, None)]
+    return [(start, start + PAGES_PER_TASK) for start in range(0, page_count, PAGES_PER_TASK)]
+
+
+def _remove_quietly(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _join_parts(part_paths: list, txt_path: str):
+    tmp_path = f"{txt_path}.{_tmp_suffix()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as out:
+        for part_path in part_paths:
+            with open(part_path, "r", encoding="utf-8") as part:
+                shutil.copyfileobj(part, out)
+    os.replace(tmp_path, txt_path)
+
+
+def extract_many(jobs: list, workers: int = None, timeout: float = None) -> list:
+    """
+    Extracts several PDFs on a process pool.
+
+    Args:
+        jobs (list): (pdf_path, txt_path) pairs to extract.
+        workers (int, optional): Number of worker processes. Defaults to PDF_EXTRACT_WORKERS.
+        timeout (float, optional): Seconds each file may take once a worker is free for it. Defaults to PDF_EXTRACT_TIMEOUT.
+
+    Returns:
+        list: The pdf_paths that failed or timed out. Every other txt_path has been written.
+    """
+    workers = workers or EXTRACT_WORKERS
+    timeout = timeout or EXTRACT_TIMEOUT
+    failed = []
+
+    if not jobs:
+        return failed
+
+    if workers <= 1:
+        for pdf_path, txt_path in jobs:
+            try:
+                with metrics.timed("extract.pdf", bytes=os.path.getsize(pdf_path)) as span:
+                    span["pages"] = extract_pdf(pdf_path, txt_path)
+            except Exception as e:
+                print(f"Failed {os.path.basename(pdf_path)}: {e}")
+                failed.append(pdf_path)
+        return failed
+
+    # Large PDFs are split into page ranges so one survey does not occupy a single core
+    planned = []
+    for pdf_path, txt_path in jobs:
+        try:
+            planned.append((pdf_path, txt_path, _page_ranges(pdf_path)))
+        except Exception as e:
+            print(f"Failed {os.path.basename(pdf_path)}: {e}")
+            failed.append(pdf_path)
+    tasks = sum(len(ranges) for _, _, ranges in planned)
+    if not tasks:
+        return failed
+
+    # No more processes than there are page ranges to extract
+    processes = min(workers, tasks)
+    pool = _POOL_CONTEXT.Pool(processes=processes)
+    try:
+        submitted = []
+        queued = 0
+        for pdf_path, txt_path, ranges in planned:
+            os.makedirs(os.path.dirname(txt_path) or ".", exist_ok=True)
+            part_paths = [f"{txt_path}.{_tmp_suffix()}.part{i}" for i in range(len(ranges))]
+            submitted_at = time.perf_counter()
+            results = [
+                pool.apply_async(extract_pages, (pdf_path, part_path, start, stop))
+                for part_path, (start, stop) in zip(part_paths, ranges)
+            ]
+            # Fixed at submission and covering the whole file: one timeout for every round of page ranges
+            # queued up to and including this file's, so a stuck worker delays the batch by one timeout, not one per file
+            queued += len(ranges)
+            deadline = time.monotonic() + timeout * -(-queued // processes)
+            submitted.append((pdf_path, txt_path, part_paths, results, submitted_at, deadline))
+
+        for pdf_path, txt_path, part_paths, results, submitted_at, deadline in submitted:
+            try:
+                parts = [result.get(timeout=max(deadline - time.monotonic(), 0)) for result in results]
+                pages = sum(part["pages"] for part in parts)
+                _save_json(sections_path(txt_path), build_section_index(parts))
+                if len(part_paths) == 1:
+                    os.replace(part_paths[0], txt_path)
+                else:
+                    _join_parts(part_paths, txt_path)
+                # Measured from submission, so it includes time the file waited for a free worker
+                metrics.record("extract.pdf", time.perf_counter() - submitted_at,
+                               pages=pages, bytes=os.path.getsize(pdf_path))
+            except multiprocessing.TimeoutError:
+                print(f"Timed out {os.path.basename(pdf_path)} after {timeout}s")
+                failed.append(pdf_path)
+            except Exception as e:
+                print(f"Failed {os.path.basename(pdf_path)}: {e}")
+                failed.append(pdf_path)
+            finally:
+                for part_path in part_paths:
+                    _remove_quietly(part_path)
+    finally:
+        # Kills any worker still stuck on a slow or corrupt PDF
+        pool.terminate()
+        pool.join()
+
+    return failed
+
+
+def _copy_with_index(cache_path: str, txt_path: str):
+    if os.path.exists(sections_path(cache_path)):
+        shutil.copyfile(sections_path(cache_path), sections_path(txt_path))
+    shutil.copyfile(cache_path, txt_path)
+
+
+def _is_unchanged(entry: dict, pdf_stat, txt_path: str) -> bool:
+    return (
+        entry.get("version") == EXTRACTOR_VERSION
+        and entry.get("size") == pdf_stat.st_size
+        and entry.get("mtime_ns") == pdf_stat.st_mtime_ns
+        and os.path.exists(txt_path)
+    )
+
+
+def pdf_to_txt(pdf_folder, workers: int = None, timeout: float = None):
     output_folder = f"./{pdf_folder}_txt"
     os.makedirs(output_folder, exist_ok=True)
 
+    manifest = _load_manifest(output_folder)
+    pending = {}  # cache_path -> [(pdf_path, txt_path, entry), ...]
+
     for filename in os.listdir(pdf_folder):
         if filename.endswith(".pdf"):
             pdf_path = os.path.join(pdf_folder, filename)
-            doc = fitz.open(pdf_path)
-
-            text = ""
-            for page in doc:
-                text += page.get_text()
-
             txt_filename = os.path.splitext(filename)[0] + ".txt"
             txt_path = os.path.join(output_folder, txt_filename)
+            pdf_stat = os.stat(pdf_path)
+
+            # Same file as last time and its text is still on disk: nothing to do
+            entry = manifest.get(filename, {})
+            if _is_unchanged(entry, pdf_stat, txt_path):
+                _count("skipped")
+                continue
+
+            digest = file_sha256(pdf_path)
+            cache_path = cached_text_path(digest)
+            entry = {
+                "sha256": digest,
+                "version": EXTRACTOR_VERSION,
+                "size": pdf_stat.st_size,
+                "mtime_ns": pdf_stat.st_mtime_ns,
+            }
+
+            if os.path.exists(cache_path):
+                _count("hits")
+                _copy_with_index(cache_path, txt_path)
+                manifest[filename] = entry
+                print(f"Cache hit {filename} → {txt_filename}")
+            else:
+                pending.setdefault(cache_path, []).append((pdf_path, txt_path, entry))
+
+    # Identical PDFs under different names are extracted once
+    jobs = [(targets[0][0], cache_path) for cache_path, targets in pending.items()]
+    failed = set(extract_many(jobs, workers=workers, timeout=timeout))
 
-            with open(txt_path, "w", encoding="utf-8") as f:
-                f.write(text)
+    for cache_path, targets in pending.items():
+        for pdf_path, txt_path, entry in targets:
+            filename = os.path.basename(pdf_path)
+            if targets[0][0] in failed:
+                _count("failed")
+                continue
+            _count("misses")
+            _copy_with_index(cache_path, txt_path)
+            manifest[filename] = entry
+            print(f"Converted {filename} → {os.path.basename(txt_path)}")
 
-            print(f"Converted {filename} → {txt_filename}")
+    _save_manifest(output_folder, manifest)
     return output_folder
@@ -0,0 +1,35 @@
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.join(BACKEND_DIR, "benchmarks")
+sys.path.insert(0, BACKEND_DIR)
+# The benchmarks' local stand-ins (fake_services, corpus) double as test fixtures
+sys.path.insert(0, BENCH_DIR)
+
+
+@pytest.fixture(scope="session")
+def app_module(tmp_path_factory):
+    """The Flask app module, imported with a temporary working directory for its stores and caches."""
+    pytest.importorskip("flask")
+    previous = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("app"))
+    try:
+        import app
+        yield app
+    finally:
+        os.chdir(previous)
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Runs the test in an empty directory, where the stores with relative default paths are created."""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
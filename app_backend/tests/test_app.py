@@ -0,0 +1,165 @@
+import os
+import sys
+import json
+import subprocess
+
+import pytest
+
+os.environ.setdefault("API_KEY", "test")
+
+import metrics
+import paper_catalog
+from conftest import BACKEND_DIR
+from paper_catalog import PaperCatalog
+from session_store import SessionStore
+from ResearchPaperAccess.federated_search import PaperRecord
+
+RECORDS = [
+    PaperRecord(title="Graph networks", arxiv_id="2401.00001", pdf_url="http://arxiv.org/pdf/2401.00001", sources=["arxiv"]),
+    PaperRecord(title="Message passing", arxiv_id="2401.00002", pdf_url="http://arxiv.org/pdf/2401.00002", sources=["arxiv"]),
+]
+
+
+@pytest.fixture
+def stream_sources(app_module, monkeypatch, tmp_path):
+    """Replaces the search sources and the rater; log records what the fakes produced, in order"""
+    log = []
+
+    def fake_iter_federated_search(keywords, **options):
+        for record in RECORDS:
+            log.append(("record", record.arxiv_id))
+            yield "paper", record, True
+        yield "stats", {"arxiv": {"count": len(RECORDS)}}, False
+
+    def fake_iter_ratings(papers, *args, **options):
+        for paper in papers:
+            log.append(("rating", paper.arxiv_id))
+            yield {paper.arxiv_id: 7.0}
+
+    monkeypatch.setattr(paper_catalog, "_catalog", PaperCatalog(str(tmp_path / "papers.sqlite3")))
+    monkeypatch.setattr(app_module, "iter_federated_search", fake_iter_federated_search)
+    monkeypatch.setattr(app_module, "iter_ratings", fake_iter_ratings)
+    return log
+
+
+def test_streamed_search_sends_papers_before_ratings(client, stream_sources):
+    response = client.post("/search?stream=1", json={"keywords": "graph networks"},
+                           headers={"X-Session-ID": "stream-test"})
+    assert response.mimetype == "application/x-ndjson"
+
+    lines = iter(response.response)
+    first = json.loads(next(lines))
+    assert first["event"] == "paper" and first["paper"]["ArxivID"] == "2401.00001"
+    # Nothing past the first paper has been produced yet
+    assert stream_sources == [("record", "2401.00001")]
+
+    events = [first] + [json.loads(line) for line in lines if line.strip()]
+    response.close()
+
+    assert [event["event"] for event in events] == ["paper", "paper", "relevance", "ratings", "ratings", "done"]
+    assert events[3]["ratings"][0]["Rating"] == 7.0
+    assert events[-1]["count"] == 2
+
+
+def test_streamed_results_can_be_accepted(app_module, client, stream_sources):
+    response = client.post("/search", json={"keywords": "graph networks"},
+                           headers={"X-Session-ID": "stream-accept", "Accept": "application/x-ndjson"})
+    events = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    response.close()
+
+    paper_ids = [event["paper"]["id"] for event in events if event["event"] == "paper"]
+    accepted, skipped, unknown = app_module.sessions.get("stream-accept").accept(paper_ids)
+    assert [paper["id"] for paper in accepted] == paper_ids
+    assert [paper["Rating"] for paper in accepted] == [7.0, 7.0]
+
+
+@pytest.mark.parametrize("sources", ["arxiv", ["arxiv", "library"], [1]])
+def test_unknown_sources_are_rejected(client, sources):
+    response = client.post("/search", json={"keywords": "graphs", "sources": sources})
+    assert response.status_code == 400
+
+
+def test_requests_are_traced_and_reported(client):
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert "counters" in response.get_json()
+
+    trace = client.get(f"/metrics/traces/{response.headers['X-Trace-ID']}").get_json()
+    assert trace["name"] == "GET /metrics"
+    assert client.get("/metrics/traces/unknown").status_code == 404
+
+
+def test_app_boots_without_keys_or_heavy_imports(tmp_path):
+    from import_time import run_probe
+
+    assert run_probe(str(tmp_path))["loaded"] == []
+
+
+def test_streamed_search_finishes_trace_once(app_module, client, monkeypatch):
+    def fake_stream_search(session, keywords, sources, max_results=None):
+        yield json.dumps({"event": "paper", "paper": {"id": 1}}) + "\n"
+        yield json.dumps({"event": "done", "count": 1}) + "\n"
+
+    monkeypatch.setattr(app_module, "stream_search", fake_stream_search)
+    calls_before = metrics.registry.snapshot()["counters"].get("http.search.calls", 0)
+
+    response = client.post("/search?stream=1", json={"keywords": "graph neural networks"})
+    events = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    response.close()
+
+    assert [event["event"] for event in events] == ["paper", "done"]
+    assert metrics.registry.snapshot()["counters"]["http.search.calls"] == calls_before + 1
+    trace = metrics.registry.get_trace(response.headers["X-Trace-ID"])
+    assert trace is not None and trace.seconds is not None
+    assert metrics.current_trace() is None
+
+
+def test_trace_teardown_can_run_twice(app_module):
+    # stream_with_context runs the teardown hooks again when the stream is closed
+    calls_before = metrics.registry.snapshot()["counters"].get("http.get_metrics.calls", 0)
+    with app_module.app.test_request_context("/metrics"):
+        app_module.app.preprocess_request()
+        app_module.app.do_teardown_request()
+        app_module.app.do_teardown_request()
+    assert metrics.registry.snapshot()["counters"]["http.get_metrics.calls"] == calls_before + 1
+
+
+def test_import_creates_no_files(app_module, tmp_path):
+    env = {**os.environ, "PYTHONPATH": BACKEND_DIR}
+    subprocess.run([sys.executable, "-c", "import app"], cwd=tmp_path, env=env, check=True)
+    assert os.listdir(tmp_path) == []
+
+
+def test_evicted_sessions_release_what_they_indexed(app_module, monkeypatch):
+    submitted = []
+    monkeypatch.setattr(app_module.job_manager, "submit", lambda kind, fn, *args: submitted.append((kind, fn, args)))
+    registry = app_module.SessionRegistry(max_sessions=1, on_evict=app_module.release_sessions)
+    registry.get("indexed").indexed = True
+    registry.get("searched")
+    registry.get("other")
+
+    assert submitted == [("release", app_module.release_job, ("indexed",))]
+
+
+def test_accepted_batches_share_the_session_folder(app_module, workdir, monkeypatch):
+    from jobs import Job
+    from DownloadResearchPaper import get_papers
+
+    def fake_download(entries, on_progress=None, folder_name=None):
+        os.makedirs(folder_name, exist_ok=True)
+        for entry in entries:
+            open(os.path.join(folder_name, f"{entry['ArxivID']}.pdf"), "wb").close()
+        return folder_name, [{"file": f"{entry['ArxivID']}.pdf", "status": 200} for entry in entries]
+
+    monkeypatch.setattr(get_papers, "download_research_paper", fake_download)
+    monkeypatch.setattr(paper_catalog, "_catalog", PaperCatalog(os.path.join(workdir, "papers.sqlite3")))
+    session = SessionStore("batches")
+    papers = [{"id": index, "ArxivID": f"2401.0000{index}", "URL": f"http://arxiv.org/pdf/2401.0000{index}"}
+              for index in (1, 2)]
+
+    app_module.download_job(Job("accept"), session, papers[:1], [])
+    folder = session.folder_name
+    app_module.download_job(Job("accept"), session, papers[1:], [])
+
+    assert session.folder_name == folder
+    assert sorted(os.listdir(folder)) == ["2401.00001.pdf", "2401.00002.pdf"]
@@ -0,0 +1,108 @@
+import pytest
+
+pytest.importorskip("arxiv")
+
+from ResearchPaperAccess import arxiv_dataset_access as access
+
+
+class FakeResult:
+    def __init__(self, short_id):
+        self.short_id = short_id
+
+    def get_short_id(self):
+        return self.short_id
+
+
+class FakeClient:
+    """Answers every query with numbered papers and counts the requests and results pulled"""
+
+    def __init__(self, total=40):
+        self.total = total
+        self.searches = []
+        self.pulled = 0
+
+    def results(self, search):
+        self.searches.append(search)
+        if search.id_list:
+            for paper_id in search.id_list:
+                if not paper_id.startswith("unknown"):
+                    self.pulled += 1
+                    yield FakeResult(paper_id if "v" in paper_id else f"{paper_id}v1")
+            return
+        for index in range(self.total):
+            self.pulled += 1
+            yield FakeResult(f"2401.{index:05d}v1")
+
+
+@pytest.fixture
+def client(monkeypatch):
+    access._query_cache.clear()
+    access._id_cache.clear()
+    client = FakeClient()
+    monkeypatch.setattr(access, "client", client)
+    return client
+
+
+def ids(results):
+    return [result.get_short_id() for result in results]
+
+
+def test_repeated_query_is_served_from_the_cache(client):
+    first = ids(access.search_by_title("Graph  Neural Networks", max_results=5))
+    second = ids(access.search_by_title("graph neural networks", max_results=5))
+
+    assert first == second == [f"2401.{index:05d}v1" for index in range(5)]
+    assert len(client.searches) == 1
+    assert client.pulled == 5
+
+
+def test_longer_request_continues_from_the_cached_results(client):
+    ids(access.search_by_abstract("retrieval", max_results=3))
+    results = ids(access.search_by_abstract("retrieval", max_results=8))
+
+    assert len(results) == 8
+    assert len(client.searches) == 1
+    assert client.pulled == 8
+
+
+def test_results_are_fetched_only_as_they_are_consumed(client):
+    results = access.search_by_author("Ada Lovelace", max_results=20)
+    next(results)
+    assert client.pulled == 1
+
+
+def test_ids_are_fetched_in_batches_and_cached(client):
+    paper_ids = [f"2402.{index:05d}" for index in range(access.ID_BATCH_SIZE + 20)]
+
+    assert ids(access.search_by_ids(paper_ids)) == [f"{paper_id}v1" for paper_id in paper_ids]
+    assert len(client.searches) == 2
+
+    assert access.search_by_id(paper_ids[0]).get_short_id() == f"{paper_ids[0]}v1"
+    assert access.search_by_id("unknown.00001") is None
+    assert len(client.searches) == 3
+
+
+def test_query_results_fill_the_id_cache(client):
+    titles = ids(access.search_by_title("graph neural networks", max_results=3))
+
+    assert access.search_by_id(titles[1]).get_short_id() == titles[1]
+    assert ids(access.search_by_ids(["2401.00000", "2401.00002"])) == ["2401.00000v1", "2401.00002v1"]
+    assert len(client.searches) == 1
+
+
+def test_client_requests_time_out(monkeypatch):
+    import socket
+    import requests
+
+    # Accepts the connection and never answers
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen()
+    monkeypatch.setattr(access, "ARXIV_REQUEST_TIMEOUT", 0.2)
+    client = access._Client(delay_seconds=0, num_retries=0)
+    client.query_url_format = f"http://127.0.0.1:{server.getsockname()[1]}/api/query?{{}}"
+    try:
+        with pytest.raises(requests.exceptions.Timeout):
+            list(client.results(access.arxiv.Search(query="graphs", max_results=1)))
+    finally:
+        server.close()
@@ -0,0 +1,51 @@
+import pytest
+
+from run_benchmarks import percentile, summarize, compare
+
+
+def test_percentile_interpolates_between_samples():
+    values = [0.4, 0.1, 0.3, 0.2]
+    assert percentile(values, 0.0) == 0.1
+    assert percentile(values, 0.5) == pytest.approx(0.25)
+    assert percentile(values, 1.0) == 0.4
+
+
+def test_summary_reports_percentiles_and_throughput():
+    summary = summarize({"search": [0.1, 0.2, 0.3, 0.4]})["search"]
+    assert summary["count"] == 4
+    assert summary["p50"] == 0.25
+    assert summary["max"] == 0.4
+    assert summary["per_second"] == 4.0
+
+
+def test_only_large_slowdowns_are_regressions():
+    baseline = {"metrics": {
+        "search": {"p50": 0.2, "p90": 0.3},
+        "accept": {"p50": 0.001, "p90": 0.002},
+        "removed": {"p50": 0.1, "p90": 0.1},
+    }}
+    current = {
+        "search": {"p50": 0.4, "p90": 0.32},
+        # Five times slower, but by less than a millisecond
+        "accept": {"p50": 0.005, "p90": 0.006},
+    }
+    assert compare(current, baseline) == [("search", "p50", 0.2, 0.4)]
+
+
+def test_slowdowns_within_the_baseline_spread_are_not_regressions():
+    baseline = {"metrics": {
+        "headings": {"p50": 0.2, "p90": 0.5},
+        "search": {"p50": 0.2, "p90": 0.25},
+    }}
+    # The same slowdown for both: headings' own runs already spread that far, search's did not
+    current = {name: {"p50": 0.35, "p90": 0.55} for name in baseline["metrics"]}
+    assert compare(current, baseline) == [("search", "p50", 0.2, 0.35)]
+
+
+def test_corpus_is_built_once(tmp_path):
+    from corpus import build_corpus
+
+    paths = build_corpus(str(tmp_path), page_counts=(2, 3))
+    mtimes = [path.stat().st_mtime_ns for path in sorted(tmp_path.iterdir())]
+    assert build_corpus(str(tmp_path), page_counts=(2, 3)) == paths
+    assert [path.stat().st_mtime_ns for path in sorted(tmp_path.iterdir())] == mtimes
@@ -0,0 +1,77 @@
+import os
+import json
+
+import pytest
+
+import corpus_store
+from corpus_store import CorpusStore, read_paper, paper_size
+
+
+def write_text(path, text, sections=None):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    if sections is not None:
+        with open(os.path.splitext(path)[0] + ".sections.json", "w", encoding="utf-8") as f:
+            json.dump({"sections": sections}, f)
+    return str(path)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = CorpusStore(str(tmp_path / "store"))
+    monkeypatch.setattr(corpus_store, "_store", store)
+    return store
+
+
+def test_texts_are_stored_once(store, tmp_path):
+    first = write_text(tmp_path / "a.txt", "graph text")
+    second = write_text(tmp_path / "b.txt", "graph text")
+
+    assert store.add("a", first) == "added"
+    assert store.add("a", first) == "unchanged"
+    assert store.add("b", second) == "deduplicated"
+    assert store.stats()["stored_bytes"] == len("graph text")
+    assert store.text(store.get("b")) == "graph text"
+
+
+def test_full_segments_are_rolled_over(store, tmp_path, monkeypatch):
+    monkeypatch.setattr(corpus_store, "SEGMENT_MAX_BYTES", 10)
+    store.add("a", write_text(tmp_path / "a.txt", "12345678"))
+    store.add("b", write_text(tmp_path / "b.txt", "abcdefgh"))
+
+    assert (store.get("a").segment, store.get("b").segment) == (0, 1)
+    assert store.text(store.get("b")) == "abcdefgh"
+
+
+def test_sections_are_read_from_the_store(store, tmp_path):
+    text = "Intro text. References list."
+    txt_path = write_text(tmp_path / "paper.txt", text, sections=[
+        {"name": "introduction", "byte_start": 0, "byte_end": 12},
+        {"name": "references", "byte_start": 12, "byte_end": len(text)},
+    ])
+    store.add("paper", txt_path)
+    assert read_paper(txt_path, exclude=("references",)) == "Intro text. "
+    assert paper_size(txt_path, include=("references",)) == len("References list.")
+
+
+def test_changed_files_are_read_from_disk(store, tmp_path):
+    txt_path = write_text(tmp_path / "paper.txt", "old text")
+    store.add("paper", txt_path)
+    write_text(txt_path, "new, longer text")
+
+    assert read_paper(txt_path) == "new, longer text"
+
+
+def test_same_length_edits_are_read_from_disk(store, tmp_path):
+    txt_path = write_text(tmp_path / "paper.txt", "old text")
+    store.add("paper", txt_path)
+    write_text(txt_path, "new text")
+    os.utime(txt_path, ns=(0, store.get("paper").source_mtime_ns + 1))
+
+    assert read_paper(txt_path) == "new text"
+
+
+def test_empty_texts_are_served(store, tmp_path):
+    txt_path = write_text(tmp_path / "empty.txt", "")
+    assert store.add("empty", txt_path) == "added"
+    assert read_paper(txt_path) == ""
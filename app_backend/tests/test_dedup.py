@@ -0,0 +1,59 @@
+import os
+import random
+from dataclasses import dataclass
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from dedup import minhash, similarity, PaperDeduplicator, find_duplicate_files
+
+WORDS = ("graph", "neural", "network", "attention", "vision", "speech", "model", "training", "data", "loss",
+         "retrieval", "language", "benchmark", "robust", "sparse", "kernel", "policy", "reward", "agent", "token")
+
+
+def words(seed, count=200):
+    rng = random.Random(seed)
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+
+@dataclass
+class FakePaper:
+    id: int
+    arxiv_id: str
+    title: str
+    summary: str
+
+
+def test_signatures_estimate_overlap():
+    text = words(1)
+    assert similarity(minhash(text), minhash(text + " one more sentence")) > 0.8
+    assert similarity(minhash(text), minhash(words(2))) < 0.5
+    assert minhash("too short") is None
+
+
+def test_older_versions_and_near_duplicates_are_flagged():
+    abstract = words(3, 80)
+    deduplicator = PaperDeduplicator()
+
+    first = deduplicator.check([
+        FakePaper(1, "2401.00001v1", "Graph models", abstract),
+        FakePaper(2, "2401.00002v1", "Retitled graph models", abstract + " now with code"),
+        FakePaper(3, "2401.00003v1", "Speech agents", words(4, 80)),
+    ])
+    assert first == {1: None, 2: 1, 3: None}
+
+    # A newer version becomes the canonical paper, and the old one is flagged in turn
+    second = deduplicator.check([FakePaper(4, "2401.00001v2", "Graph models", abstract)])
+    assert second == {1: 4, 4: None}
+
+
+def test_duplicate_texts_keep_the_newest_version(workdir):
+    os.makedirs("texts")
+    text = words(5, 600)
+    for name, content in (("2401.00001v1", text), ("2401.00001v2", text + " revised"),
+                          ("2402.00002v1", words(6, 600))):
+        with open(os.path.join("texts", f"{name}.txt"), "w", encoding="utf-8") as f:
+            f.write(content)
+
+    assert find_duplicate_files("texts") == {"2401.00001v1.txt": "2401.00001v2.txt"}
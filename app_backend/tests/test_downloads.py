@@ -0,0 +1,131 @@
+import os
+import re
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from DownloadResearchPaper import get_papers
+from DownloadResearchPaper.get_papers import download_research_paper
+
+PAPER_ID = "2401.00001v1"
+BODY = os.urandom(300_000)
+
+
+class PaperServer:
+    """Serves BODY at /pdf/<id> with Range support; the first `failures` requests get a 503"""
+
+    def __init__(self, failures=0):
+        self.requests = []
+        self.failures = failures
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                server.respond(self)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/pdf/{PAPER_ID}"
+
+    def respond(self, handler):
+        range_header = handler.headers.get("Range")
+        self.requests.append(range_header)
+        match = re.match(r"bytes=(\d+)-", range_header or "")
+        status, body, headers = 200, BODY, {}
+        if len(self.requests) <= self.failures:
+            status, body = 503, b"busy"
+        elif match and int(match.group(1)) >= len(BODY):
+            status, body, headers = 416, b"", {"Content-Range": f"bytes */{len(BODY)}"}
+        elif match:
+            start = int(match.group(1))
+            status, body = 206, BODY[start:]
+            headers = {"Content-Range": f"bytes {start}-{len(BODY) - 1}/{len(BODY)}"}
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/pdf")
+        handler.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def server(workdir):
+    server = PaperServer()
+    yield server
+    server.stop()
+
+
+def download(server):
+    folder, stats = download_research_paper([{"URL": server.url, "ArxivID": PAPER_ID}])
+    with open(os.path.join(folder, f"{PAPER_ID}.pdf"), "rb") as f:
+        return f.read(), stats[0]
+
+
+def write_partial(data: bytes):
+    os.makedirs(get_papers.PARTIAL_DIR, exist_ok=True)
+    with open(os.path.join(get_papers.PARTIAL_DIR, f"{PAPER_ID}.pdf.part"), "wb") as f:
+        f.write(data)
+
+
+def test_fresh_download(server):
+    content, stats = download(server)
+    assert content == BODY
+    assert stats["status"] == 200
+    assert stats["bytes"] == len(BODY)
+
+
+def test_partial_download_is_resumed(server):
+    write_partial(BODY[:100_000])
+    content, stats = download(server)
+    assert content == BODY
+    assert server.requests == ["bytes=100000-"]
+    assert stats["status"] == 206
+    assert stats["resumed_from"] == 100_000
+    assert stats["bytes"] == len(BODY) - 100_000
+
+
+def test_stored_paper_is_reused(server):
+    download(server)
+    content, stats = download(server)
+    assert content == BODY
+    assert stats["status"] == "cached"
+    assert len(server.requests) == 1
+
+
+def test_transient_errors_are_retried(workdir, monkeypatch):
+    monkeypatch.setattr(get_papers, "BACKOFF_SECONDS", 0.01)
+    server = PaperServer(failures=2)
+    try:
+        content, stats = download(server)
+    finally:
+        server.stop()
+    assert content == BODY
+    assert stats["attempts"] == 3
+    assert stats["status"] == 200
+
+
+def test_complete_partial_file_counts_as_downloaded(server):
+    write_partial(BODY)
+    content, stats = download(server)
+    assert content == BODY
+    assert server.requests == [f"bytes={len(BODY)}-"]
+    assert stats["status"] == 206
+    assert stats["resumed_from"] == len(BODY)
@@ -0,0 +1,116 @@
+import time
+
+import pytest
+
+pytest.importorskip("arxiv")
+
+from ResearchPaperAccess import federated_search as federated
+from ResearchPaperAccess.federated_search import PaperRecord, federated_search, from_openalex, merge_results
+
+
+def record(title, source, **fields):
+    return PaperRecord(title=title, sources=[source], **fields)
+
+
+def fake_source(records, delay=0.0, error=None):
+    def search(query, max_results, *state):
+        time.sleep(delay)
+        if error:
+            raise error
+        hits = state[0] if state else []
+        hits.extend(records[:max_results])
+        return hits
+    return search
+
+
+def test_duplicates_across_sources_are_merged():
+    arxiv = [
+        record("Graph Networks", "arxiv", arxiv_id="2401.00001v2", pdf_url="http://arxiv.org/pdf/2401.00001v2"),
+        record("Vision Transformers", "arxiv", arxiv_id="2401.00002v1"),
+    ]
+    openalex = [
+        record("Graph networks", "openalex", arxiv_id="2401.00001v1", doi="10.1/graphs", venue="NeurIPS"),
+        record("Speech Models", "openalex", doi="10.1/speech"),
+        record("vision transformers!", "openalex", openalex_id="W3"),
+    ]
+    merged = merge_results([arxiv, openalex])
+
+    assert [paper.title for paper in merged] == ["Graph Networks", "Vision Transformers", "Speech Models"]
+    graphs = merged[0]
+    assert graphs.sources == ["arxiv", "openalex"]
+    assert graphs.arxiv_id == "2401.00001v2"
+    assert (graphs.doi, graphs.venue) == ("10.1/graphs", "NeurIPS")
+    assert merged[1].openalex_id == "W3"
+
+
+def test_openalex_work_is_normalized():
+    work = {
+        "id": "https://openalex.org/W42",
+        "doi": "https://doi.org/10.5555/ABC",
+        "title": "Retrieval for Reviews",
+        "publication_year": 2024,
+        "publication_date": "2024-02-01",
+        "authorships": [{"author": {"display_name": "Ada"}}],
+        "primary_location": {"source": {"display_name": "Journal of Tests"}},
+        "best_oa_location": {"landing_page_url": "https://arxiv.org/abs/2402.01234v3", "pdf_url": "https://arxiv.org/pdf/2402.01234v3"},
+        "abstract_inverted_index": {"reviews": [2], "Retrieval": [0], "for": [1]},
+    }
+    paper = from_openalex(work)
+
+    assert paper.arxiv_id == "2402.01234v3"
+    assert paper.doi == "10.5555/abc"
+    assert paper.openalex_id == "W42"
+    assert paper.summary == "Retrieval for reviews"
+    assert paper.venue == "Journal of Tests"
+    assert paper.key == "2402.01234v3"
+
+
+def test_openalex_select_is_exactly_the_fields_records_read():
+    from ResearchPaperAccess.openAlex_dataset_access import SELECT_FIELDS
+
+    class RecordingWork(dict):
+        read = set()
+
+        def get(self, key, default=None):
+            self.read.add(key)
+            return super().get(key, default)
+
+        def __getitem__(self, key):
+            self.read.add(key)
+            return super().__getitem__(key)
+
+    from_openalex(RecordingWork())
+
+    assert set(SELECT_FIELDS.split(",")) == RecordingWork.read
+
+
+def test_failed_and_slow_sources_do_not_hold_back_the_others(monkeypatch):
+    monkeypatch.setitem(federated.SOURCES, "arxiv", fake_source([record("Graph Networks", "arxiv", arxiv_id="2401.00001v1")]))
+    monkeypatch.setitem(federated.SOURCES, "openalex", fake_source([], error=RuntimeError("503 from OpenAlex")))
+    monkeypatch.setitem(federated.SOURCES, "slow", fake_source([record("Late", "slow")], delay=1.0))
+
+    start = time.monotonic()
+    records, stats = federated_search("graphs", sources=("arxiv", "openalex", "slow"), timeout=0.3)
+
+    assert time.monotonic() - start < 0.9
+    assert [paper.title for paper in records] == ["Graph Networks"]
+    assert stats["arxiv"]["status"] == "ok"
+    assert stats["openalex"]["status"] == "error"
+    assert stats["openalex"]["error"] == "503 from OpenAlex"
+    assert stats["slow"]["status"] == "timeout"
+    assert stats["merged"] == 1
+
+
+def test_a_source_past_the_timeout_keeps_the_pages_it_fetched(monkeypatch):
+    def paging_source(query, max_results, hits, *deadline):
+        hits.append(record("First Page", "arxiv", arxiv_id="2401.00001v1"))
+        time.sleep(1.0)
+        hits.append(record("Second Page", "arxiv", arxiv_id="2401.00002v1"))
+        return hits
+
+    monkeypatch.setitem(federated.SOURCES, "arxiv", paging_source)
+    records, stats = federated_search("graphs", sources=("arxiv",), timeout=0.3)
+
+    assert [paper.title for paper in records] == ["First Page"]
+    assert stats["arxiv"]["status"] == "partial"
+    assert stats["arxiv"]["hits"] == 1
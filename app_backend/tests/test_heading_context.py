@@ -0,0 +1,82 @@
+import os
+import json
+
+import pytest
+
+pytest.importorskip("together")
+pytest.importorskip("json_repair")
+os.environ.setdefault("API_KEY", "test")
+
+from llmCalls import llama_call_for_heading as heading
+from llmCalls.llm_client import ResponseCache
+from llmCalls.llama_call_for_heading import build_context, get_headings_from_llm
+
+OUTLINE = {"title": "Literature Review on graphs", "total_pages": 64, "sections": []}
+
+
+class FakeChat:
+    def __init__(self):
+        self.prompts = []
+
+    def __call__(self, prompt, max_tokens, **params):
+        self.prompts.append(prompt)
+        if "Summarize" in prompt:
+            return "A short summary of one paper."
+        if "Condense" in prompt:
+            return "A merged summary."
+        return "```json\n" + json.dumps(OUTLINE) + "\n```"
+
+
+@pytest.fixture
+def fake_chat(tmp_path, monkeypatch):
+    fake_chat = FakeChat()
+    monkeypatch.setattr(heading, "chat", fake_chat)
+    monkeypatch.setattr(heading, "_summary_cache", ResponseCache(str(tmp_path / "cache.sqlite3"), namespace="summaries"))
+    return fake_chat
+
+
+def write_papers(folder, count, words):
+    os.makedirs(folder)
+    for index in range(count):
+        with open(os.path.join(folder, f"paper{index}.txt"), "w", encoding="utf-8") as f:
+            f.write(f"Paper {index}. " + "graph learning " * words)
+    return str(folder)
+
+
+def test_corpus_within_budget_is_used_as_is(tmp_path, fake_chat):
+    folder = write_papers(tmp_path / "texts", 3, 50)
+    context, stats = build_context(folder, budget=10_000)
+
+    assert stats["mode"] == "direct"
+    assert all(f"Paper {index}." in context for index in range(3))
+    assert fake_chat.prompts == []
+
+
+def test_large_corpus_is_summarized_within_budget(tmp_path, fake_chat):
+    folder = write_papers(tmp_path / "texts", 6, 2_000)
+    context, stats = build_context(folder, budget=40)
+
+    assert stats["mode"] == "map_reduce"
+    assert stats["map_tokens_sent"] > 0
+    assert stats["context_tokens"] <= 40
+    assert sum("Summarize" in prompt for prompt in fake_chat.prompts) == 6
+    assert any("Condense" in prompt for prompt in fake_chat.prompts)
+
+
+def test_summaries_are_reused(tmp_path, fake_chat):
+    folder = write_papers(tmp_path / "texts", 4, 2_000)
+    build_context(folder, budget=1_000)
+    sent = len(fake_chat.prompts)
+    _, stats = build_context(folder, budget=1_000)
+
+    assert stats["summaries_cached"] == 4
+    assert stats["map_tokens_sent"] == 0
+    assert len(fake_chat.prompts) == sent
+
+
+def test_outline_is_parsed_from_a_fenced_reply(tmp_path, fake_chat):
+    folder = write_papers(tmp_path / "texts", 2, 50)
+    stats = {}
+    assert get_headings_from_llm(folder, "graphs", stats=stats) == OUTLINE
+    assert stats["mode"] == "direct"
+    assert stats["outline_tokens_sent"] > 0
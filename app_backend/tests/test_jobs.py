@@ -0,0 +1,69 @@
+import time
+import threading
+
+import pytest
+
+from jobs import JobManager, QueueFullError
+
+
+def wait_until_finished(job, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while job.status in ("queued", "running"):
+        assert time.monotonic() < deadline, "job did not finish"
+        time.sleep(0.005)
+
+
+def test_result_progress_and_stages_are_recorded():
+    manager = JobManager(workers=1)
+
+    def work(job, count):
+        with job.stage("download"):
+            for done in range(1, count + 1):
+                job.set_progress(done, count)
+        with job.stage("extract"):
+            pass
+        return {"papers": count}
+
+    job = manager.submit("accept", work, 3)
+    wait_until_finished(job)
+
+    status = manager.get(job.id).to_dict(include_result=True)
+    assert status["status"] == "done"
+    assert status["result"] == {"papers": 3}
+    assert status["progress"] == {}  # Reset when the extract stage started
+    assert [stage["name"] for stage in status["stages"]] == ["download", "extract"]
+
+
+def test_failed_job_reports_its_error():
+    manager = JobManager(workers=1)
+
+    def work(job):
+        raise ValueError("no papers to download")
+
+    job = manager.submit("accept", work)
+    wait_until_finished(job)
+
+    status = job.to_dict(include_result=True)
+    assert status["status"] == "failed"
+    assert status["error"] == "no papers to download"
+    assert "result" not in status
+
+
+def test_full_queue_rejects_new_jobs():
+    manager = JobManager(workers=1, queue_limit=1)
+    release = threading.Event()
+    blocking = manager.submit("outline", lambda job: release.wait(5))
+    while blocking.status == "queued":
+        time.sleep(0.005)
+
+    waiting = manager.submit("outline", lambda job: None)
+    with pytest.raises(QueueFullError):
+        manager.submit("outline", lambda job: None)
+
+    release.set()
+    wait_until_finished(waiting)
+    assert manager.stats()["jobs"] == {"done": 2}
+
+
+def test_unknown_job_id():
+    assert JobManager(workers=1).get("missing") is None
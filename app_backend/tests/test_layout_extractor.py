@@ -0,0 +1,131 @@
+import os
+import sys
+import importlib.util
+
+import pytest
+
+pytest.importorskip("pandas")
+
+from conftest import BACKEND_DIR
+
+# Stands in for the ExtractionServer JVM: one reply line per request, named after what the PDF should do
+FAKE_SERVER = '''
+import os
+import sys
+import time
+
+for line in sys.stdin:
+    request = line.rstrip("\\n")
+    if not request:
+        break
+    pdf_path, output_dir = request.split("\\t")
+    name = os.path.basename(pdf_path)
+    if name == "crash.pdf":
+        sys.exit(1)
+    if name == "hang.pdf":
+        time.sleep(60)
+    if name == "garbled.pdf":
+        print("OK\\tnot enough fields", flush=True)
+    elif name == "missing.pdf":
+        print(f"ERR\\t{pdf_path}\\tfile not found", flush=True)
+    else:
+        print(f"OK\\t{pdf_path}\\t{output_dir}/{name}.txt\\t{output_dir}/{name}.csv\\t3\\t{os.getpid()}", flush=True)
+'''
+
+
+def load_layout_module():
+    # Loaded from its path: the module is named app.py, like the Flask app
+    path = os.path.join(BACKEND_DIR, "PDFLayoutTextStripper", "app.py")
+    spec = importlib.util.spec_from_file_location("layout_extractor", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def layout(tmp_path, monkeypatch):
+    server = tmp_path / "server.py"
+    server.write_text(FAKE_SERVER)
+    java = tmp_path / "bin" / "java"
+    java.parent.mkdir()
+    java.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{server}"\n')
+    java.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{java.parent}{os.pathsep}{os.environ['PATH']}")
+    return load_layout_module()
+
+
+@pytest.fixture
+def worker(layout):
+    worker = layout.ExtractionWorker("unused-classpath")
+    yield worker
+    worker.close()
+
+
+def test_replies_are_parsed(worker, tmp_path):
+    result = worker.extract("paper.pdf", str(tmp_path))
+    assert result["ok"]
+    assert result["txt"] == f"{tmp_path}/paper.pdf.txt"
+    assert result["csv"] == f"{tmp_path}/paper.pdf.csv"
+    assert result["pages"] == 3
+
+
+def test_one_jvm_serves_every_request(worker, tmp_path):
+    first = worker.extract("first.pdf", str(tmp_path))
+    second = worker.extract("second.pdf", str(tmp_path))
+    # The fake server replies with its pid in place of the timing
+    assert first["millis"] == second["millis"] == worker.process.pid
+
+
+def test_error_reply_keeps_the_worker(worker, tmp_path):
+    result = worker.extract("missing.pdf", str(tmp_path))
+    assert not result["ok"]
+    assert result["error"] == "file not found"
+    assert worker.process.poll() is None
+
+
+def test_malformed_reply_restarts_the_worker(worker, tmp_path):
+    pid = worker.process.pid
+    result = worker.extract("garbled.pdf", str(tmp_path))
+    assert not result["ok"]
+    assert result["error"].startswith("malformed reply from extraction server")
+
+    result = worker.extract("paper.pdf", str(tmp_path))
+    assert result["ok"]
+    assert result["millis"] == worker.process.pid != pid
+
+
+def test_cached_classpath_skips_the_maven_check(layout, tmp_path, monkeypatch):
+    classpath = tmp_path / "classpath.txt"
+    classpath.write_text("deps.jar")
+    monkeypatch.setattr(layout, "CLASSPATH_FILE", classpath)
+    monkeypatch.setattr(layout, "check_maven_installation", lambda: pytest.fail("Maven was checked"))
+    try:
+        assert layout.ocrFromJava(str(tmp_path / "paper.pdf"))
+    finally:
+        layout.get_extractor_pool().close()
+
+
+def test_worker_restarts_after_the_jvm_exits(worker, tmp_path):
+    pid = worker.process.pid
+    result = worker.extract("crash.pdf", str(tmp_path))
+    assert not result["ok"]
+    assert result["error"] == "extraction server exited"
+
+    result = worker.extract("paper.pdf", str(tmp_path))
+    assert result["ok"]
+    assert worker.process.pid != pid
+
+
+def test_hung_extraction_times_out_and_restarts_the_jvm(layout, tmp_path):
+    worker = layout.ExtractionWorker("unused-classpath", timeout=0.5)
+    try:
+        pid = worker.process.pid
+        result = worker.extract("hang.pdf", str(tmp_path))
+        assert not result["ok"]
+        assert result["error"] == "extraction timed out after 0.5s"
+
+        result = worker.extract("paper.pdf", str(tmp_path))
+        assert result["ok"]
+        assert result["millis"] == worker.process.pid != pid
+    finally:
+        worker.close()
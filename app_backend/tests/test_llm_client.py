@@ -0,0 +1,76 @@
+import os
+import time
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("together")
+# Checked when the module is imported; the tests never create a real client
+os.environ.setdefault("API_KEY", "test")
+
+from llmCalls import llm_client
+from llmCalls.llm_client import ResponseCache, chat
+
+
+class FakeCompletions:
+    def __init__(self):
+        self.prompts = []
+
+    def create(self, model, messages, max_tokens, **params):
+        self.prompts.append(messages[-1]["content"])
+        message = SimpleNamespace(content=f"  answer {len(self.prompts)}\n")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)],
+                               usage=SimpleNamespace(prompt_tokens=10, completion_tokens=3))
+
+
+@pytest.fixture
+def completions(tmp_path, monkeypatch):
+    completions = FakeCompletions()
+    monkeypatch.setattr(llm_client, "_client", SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+    monkeypatch.setattr(llm_client, "_cache", ResponseCache(str(tmp_path / "cache.sqlite3")))
+    return completions
+
+
+def test_identical_calls_are_answered_from_the_cache(completions):
+    stats = llm_client.get_stats()
+    assert chat("Summarize this", max_tokens=50) == "answer 1"
+    assert chat("Summarize this", max_tokens=50) == "answer 1"
+
+    assert completions.prompts == ["Summarize this"]
+    assert llm_client.get_stats()["hits"] == stats["hits"] + 1
+    assert llm_client.get_stats()["prompt_tokens"] == stats["prompt_tokens"] + 10
+
+
+def test_calls_with_other_parameters_are_sent(completions):
+    chat("Summarize this", max_tokens=50)
+    chat("Summarize this", max_tokens=80)
+    chat("Summarize this", max_tokens=50, use_cache=False)
+    assert len(completions.prompts) == 3
+
+
+def test_cache_persists_across_connections(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    ResponseCache(path).put("key", {"content": "kept"})
+    assert ResponseCache(path).get("key") == {"content": "kept"}
+
+
+def test_expired_entries_are_dropped(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"), ttl=0.05)
+    cache.put("key", {"content": "old"})
+    time.sleep(0.1)
+    assert cache.get("key") is None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"), max_entries=2)
+    cache.put("a", 1)
+    time.sleep(0.01)
+    cache.put("b", 2)
+    time.sleep(0.01)
+    cache.get("a")
+    time.sleep(0.01)
+    cache.put("c", 3)
+
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
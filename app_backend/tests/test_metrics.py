@@ -0,0 +1,52 @@
+import threading
+
+import pytest
+
+import metrics
+from metrics import Histogram, MetricsRegistry
+
+
+def test_histogram_quantiles_stay_within_the_bucket():
+    histogram = Histogram(buckets=(0.1, 1, 10))
+    for value in (0.05, 0.06, 0.5, 0.7, 5):
+        histogram.observe(value)
+
+    summary = histogram.to_dict()
+    assert summary["count"] == 5
+    assert summary["max"] == 5
+    assert summary["buckets"] == {"0.1": 2, "1": 2, "10": 1, "inf": 0}
+    assert 0.1 <= histogram.quantile(0.5) <= 1
+    assert histogram.quantile(1.0) == 5
+
+
+def test_timed_records_latency_counts_and_errors(monkeypatch):
+    monkeypatch.setattr(metrics, "registry", MetricsRegistry())
+
+    with metrics.timed("stage.ok", pages=3) as span:
+        span["bytes"] = 10
+    with pytest.raises(ValueError):
+        with metrics.timed("stage.failing"):
+            raise ValueError("broken")
+
+    snapshot = metrics.registry.snapshot()
+    assert snapshot["histograms"]["stage.ok"]["count"] == 1
+    assert snapshot["counters"]["stage.ok.pages"] == 3
+    assert snapshot["counters"]["stage.ok.bytes"] == 10
+    assert snapshot["counters"]["stage.failing.errors"] == 1
+
+
+def test_spans_from_worker_threads_join_the_trace(monkeypatch):
+    monkeypatch.setattr(metrics, "registry", MetricsRegistry())
+    monkeypatch.setattr(metrics, "SLOW_STAGE_SECONDS", 1)
+
+    trace, token = metrics.start_trace("job")
+    worker = threading.Thread(target=metrics.in_context(lambda: metrics.record("worker.stage", 2.0)))
+    worker.start()
+    worker.join()
+    metrics.record("main.stage", 0.1)
+    metrics.end_trace(trace, token)
+
+    assert metrics.current_trace() is None
+    stored = metrics.registry.get_trace(trace.id).to_dict()
+    assert [span["stage"] for span in stored["spans"]] == ["worker.stage", "main.stage"]
+    assert [slow["trace_id"] for slow in metrics.registry.snapshot()["slow_traces"]] == [trace.id]
@@ -0,0 +1,103 @@
+import json
+import threading
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+pytest.importorskip("requests")
+
+from ResearchPaperAccess import openAlex_dataset_access as openalex
+from ResearchPaperAccess.openAlex_dataset_access import OpenAlexClient
+
+WORKS = [{"id": f"https://openalex.org/W{index}", "title": f"Work {index}"} for index in range(7)]
+
+
+class WorksServer:
+    """Serves WORKS from /works with cursor pagination; the first `failures` requests get a 503"""
+
+    def __init__(self, failures=0):
+        self.requests = []
+        self.failures = failures
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                server.respond(self)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def respond(self, handler):
+        params = parse_qs(urlparse(handler.path).query)
+        self.requests.append(params)
+        if len(self.requests) <= self.failures:
+            status, body = 503, {"error": "busy"}
+        else:
+            start = 0 if params["cursor"][0] == "*" else int(params["cursor"][0])
+            end = start + int(params["per-page"][0])
+            status, body = 200, {
+                "meta": {"next_cursor": str(end) if end < len(WORKS) else None},
+                "results": WORKS[start:end],
+            }
+        data = json.dumps(body).encode()
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def server():
+    server = WorksServer()
+    yield server
+    server.stop()
+
+
+def test_pages_are_fetched_lazily_with_the_cursor(server):
+    client = OpenAlexClient(base_url=server.url)
+    works = client.iter_works(search="graphs", max_results=5, per_page=3)
+
+    assert next(works)["title"] == "Work 0"
+    assert len(server.requests) == 1
+    assert [work["title"] for work in works] == [f"Work {index}" for index in range(1, 5)]
+    assert [params["cursor"] for params in server.requests] == [["*"], ["3"]]
+
+
+def test_all_pages_are_read_without_a_limit(server):
+    works = list(OpenAlexClient(base_url=server.url).iter_works(filter="publication_year:2024", per_page=3))
+    assert len(works) == len(WORKS)
+    assert len(server.requests) == 3
+
+
+def test_requests_project_fields_and_carry_the_contact_address(server):
+    OpenAlexClient(base_url=server.url, mailto="team@example.org").search("graphs", max_results=2)
+
+    params = server.requests[0]
+    assert params["select"] == [openalex.SELECT_FIELDS]
+    assert params["mailto"] == ["team@example.org"]
+    assert params["per-page"] == ["2"]
+
+
+def test_busy_responses_are_retried():
+    server = WorksServer(failures=1)
+    try:
+        works = OpenAlexClient(base_url=server.url).search("graphs", max_results=2)
+    finally:
+        server.stop()
+    assert len(works) == 2
+    assert len(server.requests) == 2
@@ -0,0 +1,63 @@
+from paper_catalog import PaperCatalog
+
+
+class FakeResult:
+    """Carries the fields the catalog stores, under the names search results use"""
+
+    def __init__(self, arxiv_id, title=None):
+        self.arxiv_id = self.key = arxiv_id
+        self.doi = None
+        self.title = title or f"Paper {arxiv_id}"
+        self.summary = "An abstract."
+        self.published = "2024-01-01T00:00:00"
+        self.pdf_url = f"http://arxiv.org/pdf/{arxiv_id}"
+
+    def get_short_id(self):
+        return self.arxiv_id
+
+
+def test_ids_are_stable_across_searches_and_restarts(tmp_path):
+    path = str(tmp_path / "papers.sqlite3")
+    catalog = PaperCatalog(path)
+    first = catalog.upsert_results([FakeResult("2401.00001v1"), FakeResult("2401.00002v1")])
+    second = catalog.upsert_results([FakeResult("2401.00003v1"), FakeResult("2401.00001v1", title="Renamed")])
+
+    assert len({paper.id for paper in first + second}) == 3
+    assert second[1].id == first[0].id
+    assert second[1].title == "Renamed"
+
+    reopened = PaperCatalog(path)
+    assert [paper.id for paper in reopened.get_by_arxiv_ids(["2401.00001v1", "2401.00002v1"])] == [paper.id for paper in first]
+
+
+def test_fresh_search_is_answered_from_the_catalog(tmp_path):
+    catalog = PaperCatalog(str(tmp_path / "papers.sqlite3"))
+    papers = catalog.upsert_results([FakeResult("2401.00002v1"), FakeResult("2401.00001v1")])
+    catalog.record_search("Graph  Networks", papers)
+
+    assert [paper.id for paper in catalog.cached_search("graph networks")] == [paper.id for paper in papers]
+    assert catalog.cached_search("graph networks", max_age=-1) is None
+    assert catalog.cached_search("vision") is None
+
+
+def test_stored_searches_are_kept_per_source_set(tmp_path):
+    catalog = PaperCatalog(str(tmp_path / "papers.sqlite3"))
+    papers = catalog.upsert_results([FakeResult("2401.00001v1")])
+    catalog.record_search("graphs", papers, sources=("arxiv",))
+
+    assert catalog.cached_search("graphs", sources=["arxiv"]) is not None
+    assert catalog.cached_search("graphs", sources=("arxiv", "openalex")) is None
+
+
+def test_ratings_and_paths_are_remembered(tmp_path):
+    catalog = PaperCatalog(str(tmp_path / "papers.sqlite3"))
+    papers = catalog.upsert_results([FakeResult("2401.00001v1"), FakeResult("2401.00002v1")])
+    catalog.set_ratings({"2401.00001v1": 4, "2401.00002v1": 9})
+    catalog.set_paths("download_path", {"2401.00002v1": "downloads/2401.00002v1.pdf"})
+
+    assert [paper.arxiv_id for paper in catalog.top_rated()] == ["2401.00002v1", "2401.00001v1"]
+    stored = catalog.get_many([papers[1].id])[0]
+    assert stored.rating == 9
+    assert stored.download_path == "downloads/2401.00002v1.pdf"
+    # Searching again refreshes the metadata but keeps the rating
+    assert catalog.upsert_results([FakeResult("2401.00002v1")])[0].rating == 9
@@ -0,0 +1,140 @@
+import os
+import shutil
+import threading
+
+import pytest
+
+fitz = pytest.importorskip("fitz")
+
+import temp_pdf_to_txt
+from temp_pdf_to_txt import pdf_to_txt, extract_many, extract_pages, get_cache_stats, read_text, load_section_index
+
+
+def make_pdf(path, pages, label):
+    doc = fitz.open()
+    for number in range(pages):
+        doc.new_page().insert_text((72, 72), f"{label} page {number}")
+    doc.save(path)
+    doc.close()
+
+
+def read(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+@pytest.fixture
+def pdf_folder(workdir):
+    os.makedirs("papers")
+    make_pdf(os.path.join("papers", "first.pdf"), 2, "First")
+    make_pdf(os.path.join("papers", "second.pdf"), 3, "Second")
+    return "papers"
+
+
+def test_texts_are_written_next_to_the_folder(pdf_folder):
+    output_folder = pdf_to_txt(pdf_folder)
+
+    assert "First page 1" in read(os.path.join(output_folder, "first.txt"))
+    assert "Second page 2" in read(os.path.join(output_folder, "second.txt"))
+
+
+def test_unchanged_folder_is_skipped(pdf_folder):
+    pdf_to_txt(pdf_folder)
+    skipped = get_cache_stats()["skipped"]
+    pdf_to_txt(pdf_folder)
+    assert get_cache_stats()["skipped"] == skipped + 2
+
+
+def test_same_pdf_in_another_folder_is_a_cache_hit(pdf_folder):
+    pdf_to_txt(pdf_folder)
+    os.makedirs("other")
+    shutil.copyfile(os.path.join(pdf_folder, "first.pdf"), os.path.join("other", "renamed.pdf"))
+
+    stats = get_cache_stats()
+    output_folder = pdf_to_txt("other")
+    assert get_cache_stats()["hits"] == stats["hits"] + 1
+    assert get_cache_stats()["misses"] == stats["misses"]
+    assert read(os.path.join(output_folder, "renamed.txt")) == read(os.path.join(f"{pdf_folder}_txt", "first.txt"))
+
+
+def test_changed_pdf_is_extracted_again(pdf_folder):
+    output_folder = pdf_to_txt(pdf_folder)
+    make_pdf(os.path.join(pdf_folder, "first.pdf"), 4, "Revised")
+
+    misses = get_cache_stats()["misses"]
+    pdf_to_txt(pdf_folder)
+    assert get_cache_stats()["misses"] == misses + 1
+    assert "Revised page 3" in read(os.path.join(output_folder, "first.txt"))
+
+
+def test_extract_many_splits_long_pdfs_across_workers(workdir):
+    make_pdf("long.pdf", 60, "Long")
+    make_pdf("short.pdf", 2, "Short")
+    with open("broken.pdf", "wb") as f:
+        f.write(b"%PDF-1.4 not really a pdf")
+
+    failed = extract_many(
+        [("long.pdf", os.path.join("out", "long.txt")), ("broken.pdf", os.path.join("out", "broken.txt")),
+         ("short.pdf", os.path.join("out", "short.txt"))],
+        workers=2, timeout=120,
+    )
+
+    assert failed == ["broken.pdf"]
+    # The page ranges are joined in order into the same text a single pass writes
+    extract_pages("long.pdf", "expected.txt")
+    assert read(os.path.join("out", "long.txt")) == read("expected.txt")
+    assert "Short page 1" in read(os.path.join("out", "short.txt"))
+    assert not os.path.exists(os.path.join("out", "broken.txt"))
+    assert [name for name in os.listdir("out") if ".part" in name or name.endswith(".tmp")] == []
+
+
+def test_sections_are_indexed_and_read_selectively(workdir):
+    os.makedirs("papers")
+    doc = fitz.open()
+    for lines in (["A Paper Title", "Abstract", "We study graphs."],
+                  ["1 Introduction", "Graphs are everywhere.", "2. Method", "We count edges."],
+                  ["References", "[1] Someone. A graph book."]):
+        doc.new_page().insert_text((72, 72), "\n".join(lines))
+    doc.save(os.path.join("papers", "paper.pdf"))
+    doc.close()
+
+    txt_path = os.path.join(pdf_to_txt("papers"), "paper.txt")
+
+    index = load_section_index(txt_path)
+    assert [section["name"] for section in index["sections"]] == ["front", "abstract", "introduction", "method", "references"]
+    assert [section["start_page"] for section in index["sections"]] == [0, 0, 1, 1, 2]
+
+    without_references = read_text(txt_path, exclude=("references",))
+    assert "We count edges." in without_references and "graph book" not in without_references
+    assert read_text(txt_path, include=("abstract",)).split() == ["Abstract", "We", "study", "graphs."]
+    assert read_text(txt_path) == read(txt_path)
+
+
+def test_concurrent_extraction_of_one_folder(pdf_folder):
+    make_pdf(os.path.join(pdf_folder, "long.pdf"), 60, "Long")
+    failed_before = get_cache_stats()["failed"]
+    errors = []
+    folders = []
+
+    def run():
+        try:
+            folders.append(pdf_to_txt(pdf_folder, workers=2, timeout=120))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(set(folders)) == 1
+    extract_pages(os.path.join(pdf_folder, "long.pdf"), "expected.txt")
+    assert read(os.path.join(folders[0], "long.txt")) == read("expected.txt")
+    leftovers = [
+        name for folder in (folders[0], temp_pdf_to_txt.CACHE_DIR) for _, _, names in os.walk(folder)
+        for name in names if name.endswith(".tmp") or ".part" in name
+    ]
+    assert leftovers == []
+    assert get_cache_stats()["failed"] == failed_before
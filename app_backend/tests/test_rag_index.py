@@ -0,0 +1,122 @@
+import os
+
+import pytest
+
+pytest.importorskip("langchain_community")
+pytest.importorskip("chromadb")
+
+from RAG import create_database
+from RAG.create_database import generate_data_store, release_data_store, close_vector_store
+from RAG.query_database import retrieve, build_rag_context
+
+
+def write_paper(folder, name, text):
+    os.makedirs(folder, exist_ok=True)
+    with open(os.path.join(folder, name), "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+@pytest.fixture(autouse=True)
+def fresh_vector_store(monkeypatch):
+    # The store is opened once per process, and every test has its own at the same relative path
+    monkeypatch.setattr(create_database, "EMBEDDING_BACKEND", "local")
+    close_vector_store()
+    yield
+    close_vector_store()
+
+
+@pytest.fixture
+def texts(workdir):
+    write_paper("texts", "a.txt", "Graph neural networks. " * 50)
+    write_paper("texts", "b.txt", "Vision transformers. " * 50)
+    return "texts"
+
+
+def test_unchanged_files_are_not_embedded_again(texts):
+    first = generate_data_store(texts, backend="local")
+    second = generate_data_store(texts, backend="local")
+
+    assert first["embedded_chunks"] == first["total_chunks"] > 0
+    assert second["changed_files"] == 0
+    assert second["embedded_chunks"] == second["deleted_chunks"] == 0
+    assert second["total_chunks"] == first["total_chunks"]
+
+
+def test_only_the_changed_file_is_embedded(texts):
+    generate_data_store(texts, backend="local")
+    write_paper(texts, "b.txt", "Speech recognition. " * 50)
+    stats = generate_data_store(texts, backend="local")
+
+    assert stats["changed_files"] == 1
+    assert stats["embedded_chunks"] == 1
+    assert stats["deleted_chunks"] == 1
+
+
+def test_other_sessions_keep_their_chunks(texts):
+    generate_data_store(texts)
+    write_paper("other", "c.txt", "Speech recognition. " * 50)
+    stats = generate_data_store("other")
+
+    assert stats["deleted_chunks"] == 0
+    assert stats["papers_in_store"] == 3
+    by_theme, _ = retrieve("graphs", sources=["a.txt"], themes=("methods",), k=3)
+    assert [source for source, _, _ in by_theme["methods"]] == ["a.txt"]
+
+
+def test_removed_paper_chunks_are_deleted(texts):
+    generate_data_store(texts, holder="alice")
+    os.remove(os.path.join(texts, "b.txt"))
+    stats = generate_data_store(texts, holder="alice")
+
+    assert stats["released_papers"] == stats["deleted_chunks"] == 1
+    assert stats["papers_in_store"] == 1
+    by_theme, _ = retrieve("transformers", sources=["b.txt"], themes=("methods",), k=3)
+    assert by_theme["methods"] == []
+
+
+def test_paper_skipped_as_duplicate_is_deleted(texts):
+    generate_data_store(texts, holder="alice")
+    stats = generate_data_store(texts, holder="alice", skip_files={"b.txt": "a.txt"})
+
+    assert stats["deleted_chunks"] == 1
+    assert stats["papers_in_store"] == 1
+
+
+def test_shared_paper_is_kept_until_every_holder_releases(texts):
+    generate_data_store(texts, holder="alice")
+    generate_data_store(texts, holder="bob")
+
+    assert release_data_store("alice") == {"released_papers": 0, "deleted_chunks": 0}
+    by_theme, _ = retrieve("graphs", sources=["a.txt"], themes=("methods",), k=3)
+    assert [source for source, _, _ in by_theme["methods"]] == ["a.txt"]
+
+    assert release_data_store("bob") == {"released_papers": 2, "deleted_chunks": 2}
+    by_theme, _ = retrieve("graphs", sources=["a.txt", "b.txt"], themes=("methods",), k=3)
+    assert by_theme["methods"] == []
+
+
+def test_retrieval_is_limited_to_the_given_papers(texts):
+    write_paper(texts, "c.txt", "Speech recognition. " * 50)
+    generate_data_store(texts)
+
+    by_theme, stats = retrieve("graphs", sources=["a.txt", "b.txt"], themes=("methods", "datasets"), k=3)
+
+    sources = {source for chunks in by_theme.values() for source, _, _ in chunks}
+    assert sources <= {"a.txt", "b.txt"}
+    # Both papers are one chunk each, so every theme retrieves the same two
+    assert stats["chunks_retrieved"] == 4
+    assert [len(chunks) for chunks in by_theme.values()] == [2, 0]
+    assert stats["unique_chunks"] == 2
+
+
+def test_outline_context_takes_whole_chunks_within_budget(texts):
+    generate_data_store(texts)
+
+    context, stats = build_rag_context(texts, "graphs", budget=600)
+    assert stats["papers"] == stats["chunks_in_context"] == 2
+    assert context.count("Graph neural networks.") == context.count("Vision transformers.") == 50
+
+    # The second chunk no longer fits and is left out rather than cut
+    context, stats = build_rag_context(texts, "graphs", budget=400)
+    assert stats["chunks_in_context"] == 1
+    assert context.count("Graph neural networks.") + context.count("Vision transformers.") == 50
@@ -0,0 +1,46 @@
+from dataclasses import dataclass
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from ranking import bm25_scores, rank_papers
+
+
+@dataclass
+class FakePaper:
+    id: int
+    title: str
+    summary: str = ""
+    duplicate_of: int = None
+
+
+def test_documents_with_more_query_terms_score_higher():
+    scores = bm25_scores("graph neural networks", [
+        "Vision transformers for images",
+        "Graph networks",
+        "Graph neural networks for molecules",
+        "The of and",
+    ])
+    assert scores.argmax() == 2
+    assert scores[0] == scores[3] == 0
+    assert scores[1] > 0
+
+
+def test_queries_of_stopwords_score_nothing():
+    assert list(bm25_scores("the of", ["the of", "graphs"])) == [0, 0]
+
+
+def test_shortlist_skips_duplicates_and_keeps_the_best():
+    papers = [
+        FakePaper(1, "Speech recognition"),
+        FakePaper(2, "Graph neural networks"),
+        FakePaper(3, "Graph neural networks", duplicate_of=2),
+        FakePaper(4, "Neural networks"),
+    ]
+    relevance, shortlist = rank_papers("graph neural networks", papers, top_n=2)
+
+    assert relevance[2] == relevance[3] == 1.0
+    assert relevance[1] == 0.0
+    assert shortlist == {2, 4}
+    assert rank_papers("graph neural networks", papers, top_n=0)[1] == {1, 2, 4}
@@ -0,0 +1,87 @@
+import os
+import re
+import json
+import threading
+
+import pytest
+
+pytest.importorskip("together")
+pytest.importorskip("json_repair")
+os.environ.setdefault("API_KEY", "test")
+
+from llmCalls import llama_ratings
+from llmCalls.llm_client import ResponseCache
+from llmCalls.llama_ratings import get_rating, iter_ratings
+
+
+class FakePaper:
+    def __init__(self, index):
+        self.short_id = f"2401.{index:05d}v1"
+        self.pdf_url = f"http://arxiv.org/pdf/{self.short_id}"
+        self.title = f"Paper {index}"
+        self.summary = "An abstract. " * 500
+
+    def get_short_id(self):
+        return self.short_id
+
+
+class FakeChat:
+    """Rates each paper in the prompt by its index; prompts naming a paper in `failing` raise"""
+
+    def __init__(self, failing=()):
+        self.prompts = []
+        self.failing = set(failing)
+        self._lock = threading.Lock()
+
+    def __call__(self, prompt, max_tokens, **params):
+        with self._lock:
+            self.prompts.append(prompt)
+        ids = re.findall(r"ID: (\S+)", prompt)
+        if self.failing & set(ids):
+            raise RuntimeError("rate limited")
+        return json.dumps({paper_id: int(paper_id[5:10]) % 10 for paper_id in ids})
+
+
+@pytest.fixture(autouse=True)
+def rating_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(llama_ratings, "_rating_cache", ResponseCache(str(tmp_path / "cache.sqlite3"), namespace="ratings"))
+
+
+@pytest.fixture
+def fake_chat(monkeypatch):
+    fake_chat = FakeChat()
+    monkeypatch.setattr(llama_ratings, "chat", fake_chat)
+    return fake_chat
+
+
+def test_papers_are_rated_in_batches(fake_chat):
+    papers = [FakePaper(index) for index in range(10)]
+    ratings = get_rating(papers, batch_size=4)
+
+    assert ratings == {paper.short_id: index % 10 for index, paper in enumerate(papers)}
+    assert len(fake_chat.prompts) == 3
+    # Abstracts are trimmed so a batch's prompt stays small
+    assert all(len(prompt) < 4 * (llama_ratings.ABSTRACT_CHARS + 200) for prompt in fake_chat.prompts)
+
+
+def test_ratings_arrive_batch_by_batch(fake_chat):
+    papers = [FakePaper(index) for index in range(10)]
+    batches = list(iter_ratings(papers, batch_size=4, max_workers=2))
+    assert sorted(len(batch) for batch in batches) == [2, 4, 4]
+
+
+def test_rated_papers_are_not_sent_again(fake_chat):
+    get_rating([FakePaper(index) for index in range(3)], batch_size=4)
+    ratings = get_rating([FakePaper(index) for index in range(5)], batch_size=4)
+
+    assert len(ratings) == 5
+    assert len(fake_chat.prompts) == 2
+    assert "ID: 2401.00001v1" not in fake_chat.prompts[1]
+
+
+def test_failed_batch_only_loses_its_own_ratings(monkeypatch):
+    papers = [FakePaper(index) for index in range(6)]
+    monkeypatch.setattr(llama_ratings, "chat", FakeChat(failing={papers[0].short_id}))
+
+    ratings = get_rating(papers, batch_size=3)
+    assert sorted(ratings) == sorted(paper.short_id for paper in papers[3:])
@@ -0,0 +1,138 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import metrics
+from llmCalls import scheduler as scheduler_module
+from llmCalls.scheduler import LLMScheduler
+
+
+class ServerError(Exception):
+    status_code = 503
+
+
+class BadRequest(Exception):
+    status_code = 400
+
+
+class RateLimited(Exception):
+    status_code = 429
+    headers = {"retry-after": "0.2"}
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    monkeypatch.setattr(scheduler_module, "LLM_RETRY_BASE_SECONDS", 0.001)
+    return LLMScheduler(requests_per_minute=0, tokens_per_minute=0, concurrency=4, max_retries=3)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_identical_requests_in_flight_are_sent_once(scheduler):
+    release = threading.Event()
+    sent = []
+
+    def request():
+        sent.append(1)
+        release.wait(5)
+        return "outline", 10
+
+    coalesced = lambda: metrics.registry.snapshot()["counters"].get("llm.scheduler.coalesced", 0)
+    before = coalesced()
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        futures = [pool.submit(scheduler.run, "same-prompt", request, "rating", 10) for _ in range(5)]
+        wait_for(lambda: coalesced() == before + 4)
+        release.set()
+        results = [future.result(timeout=5) for future in futures]
+
+    assert results == ["outline"] * 5
+    assert len(sent) == 1
+    assert scheduler.stats()["distinct_requests"] == 0
+
+
+def test_requests_without_a_key_are_not_coalesced(scheduler):
+    sent = []
+
+    def request():
+        sent.append(1)
+        return "keywords", 1
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        results = list(pool.map(lambda _: scheduler.run(None, request, "keyword", 1), range(3)))
+    assert results == ["keywords"] * 3
+    assert len(sent) == 3
+
+
+def test_transient_errors_are_retried(scheduler):
+    attempts = []
+
+    def request():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ServerError("busy")
+        return "rating", 5
+
+    assert scheduler.run(None, request, "rating", 5) == "rating"
+    assert len(attempts) == 3
+
+
+def test_retries_stop_at_max_retries(scheduler):
+    attempts = []
+
+    def request():
+        attempts.append(1)
+        raise ServerError("down")
+
+    with pytest.raises(ServerError):
+        scheduler.run(None, request, "rating", 5)
+    assert len(attempts) == scheduler.max_retries + 1
+
+
+def test_other_errors_are_not_retried(scheduler):
+    attempts = []
+
+    def request():
+        attempts.append(1)
+        raise BadRequest("bad prompt")
+
+    with pytest.raises(BadRequest):
+        scheduler.run(None, request, "outline", 5)
+    assert len(attempts) == 1
+
+
+def test_rate_limit_pauses_for_retry_after(scheduler):
+    attempts = []
+
+    def request():
+        attempts.append(time.monotonic())
+        if len(attempts) == 1:
+            raise RateLimited("slow down")
+        return "ok", 1
+
+    assert scheduler.run(None, request, "keyword", 1) == "ok"
+    assert attempts[1] - attempts[0] >= 0.2
+
+
+def test_joiners_get_the_leaders_error(scheduler):
+    release = threading.Event()
+
+    def request():
+        release.wait(5)
+        raise BadRequest("bad prompt")
+
+    coalesced = lambda: metrics.registry.snapshot()["counters"].get("llm.scheduler.coalesced", 0)
+    before = coalesced()
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        futures = [pool.submit(scheduler.run, "failing-prompt", request, "outline", 1) for _ in range(2)]
+        wait_for(lambda: coalesced() == before + 1)
+        release.set()
+        for future in futures:
+            with pytest.raises(BadRequest):
+                future.result(timeout=5)
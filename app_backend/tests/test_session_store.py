@@ -0,0 +1,70 @@
+import time
+
+import session_store
+from session_store import SessionRegistry, SessionStore
+
+
+def paper(paper_id, arxiv_id=None):
+    return {"id": paper_id, "ArxivID": arxiv_id, "URL": f"http://arxiv.org/pdf/{arxiv_id or paper_id}"}
+
+
+def test_accept_skips_papers_already_accepted_and_reports_unknown_ids():
+    session = SessionStore("s1")
+    session.replace_results([paper(1, "2401.00001v1"), paper(2, "2401.00002v1")])
+
+    accepted, skipped, unknown = session.accept([1, 1, 99])
+    assert [p["id"] for p in accepted] == [1]
+    assert skipped == [1]
+    assert unknown == [99]
+
+    # The same arXiv paper from a later search is still a duplicate
+    session.replace_results([paper(7, "2401.00001v1"), paper(2, "2401.00002v1")])
+    accepted, skipped, _ = session.accept([7, 2])
+    assert [p["id"] for p in accepted] == [2]
+    assert skipped == [7]
+    assert [p["id"] for p in session.accepted_papers()] == [1, 2]
+
+
+def test_results_are_found_by_id_and_arxiv_id():
+    session = SessionStore("s1")
+    session.replace_results([paper(1, "2401.00001v1")])
+    assert session.find(paper_id=1)["ArxivID"] == "2401.00001v1"
+    assert session.find(arxiv_id="2401.00001v1")["id"] == 1
+    assert session.find(paper_id=2) is None
+
+
+def test_sessions_are_kept_apart():
+    registry = SessionRegistry()
+    registry.get("alice").replace_results([paper(1, "2401.00001v1")])
+
+    assert registry.get("alice").find(paper_id=1) is not None
+    assert registry.get("bob").find(paper_id=1) is None
+    assert registry.get(None) is registry.get(session_store.DEFAULT_SESSION)
+
+
+def test_least_recently_used_session_is_evicted():
+    registry = SessionRegistry(max_sessions=2)
+    first = registry.get("first")
+    registry.get("second")
+    registry.get("first")
+    registry.get("third")
+
+    assert len(registry) == 2
+    assert registry.get("first") is first
+    assert len(registry) == 2
+
+
+def test_idle_sessions_are_evicted():
+    registry = SessionRegistry(idle_seconds=0.05)
+    idle = registry.get("idle")
+    time.sleep(0.1)
+    assert registry.get("idle") is not idle
+
+
+def test_evicted_sessions_are_handed_to_on_evict():
+    evicted = []
+    registry = SessionRegistry(max_sessions=1, on_evict=evicted.extend)
+    first = registry.get("first")
+    registry.get("second")
+
+    assert evicted == [first]
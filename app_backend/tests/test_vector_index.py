@@ -0,0 +1,99 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("langchain")
+
+from langchain.schema import Document
+from RAG.vector_index import NumpyVectorIndex
+
+TOPICS = ("graph", "vision", "speech")
+
+
+class TopicEmbeddings:
+    """One dimension per topic word, so a query's best match is predictable"""
+
+    def embed_documents(self, texts):
+        return [[text.count(topic) + 0.01 for topic in TOPICS] for text in texts]
+
+
+def build_index(path):
+    index = NumpyVectorIndex(str(path), TopicEmbeddings())
+    # Session one holds a.txt and b.txt, session two holds c.txt, all in the one shared index
+    documents = [
+        Document(page_content="graph graph networks", metadata={"source": "a.txt"}),
+        Document(page_content="vision transformers", metadata={"source": "b.txt"}),
+        Document(page_content="speech and a little graph", metadata={"source": "c.txt"}),
+    ]
+    index.add_documents(documents, ids=["a-0", "b-0", "c-0"])
+    return index
+
+
+def sources_of(results):
+    return [[doc.metadata["source"] for doc, _ in hits] for hits in results]
+
+
+def test_search_is_restricted_to_the_given_sources(tmp_path):
+    index = build_index(tmp_path / "index")
+    query = TopicEmbeddings().embed_documents(["graph"])
+
+    assert sources_of(index.search(query, 3)) == [["a.txt", "c.txt", "b.txt"]]
+    assert sources_of(index.search(query, 3, ["c.txt"])) == [["c.txt"]]
+    assert sources_of(index.search(query, 3, ["b.txt", "c.txt"])) == [["c.txt", "b.txt"]]
+
+
+def test_empty_sources_return_nothing(tmp_path):
+    index = build_index(tmp_path / "index")
+    query = TopicEmbeddings().embed_documents(["graph", "vision"])
+    assert index.search(query, 3, []) == [[], []]
+
+
+def test_filter_survives_save_and_reload(tmp_path):
+    build_index(tmp_path / "index").save()
+    index = NumpyVectorIndex(str(tmp_path / "index"), TopicEmbeddings())
+
+    assert len(index) == 3
+    query = TopicEmbeddings().embed_documents(["vision"])
+    assert sources_of(index.search(query, 2, ["a.txt"])) == [["a.txt"]]
+
+
+def test_delete_removes_chunks_from_search(tmp_path):
+    index = build_index(tmp_path / "index")
+    index.delete(["a-0"])
+    query = TopicEmbeddings().embed_documents(["graph"])
+    assert sources_of(index.search(query, 3)) == [["c.txt", "b.txt"]]
+
+
+def test_embeddings_are_computed_once_per_text(tmp_path):
+    from RAG.embedding_cache import EmbeddingCache, CachedEmbeddings
+
+    class CountingEmbeddings(TopicEmbeddings):
+        texts = []
+
+        def embed_documents(self, texts):
+            self.texts.extend(texts)
+            return super().embed_documents(texts)
+
+    inner = CountingEmbeddings()
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite3"))
+    first = CachedEmbeddings(inner, "topics", cache).embed_documents(["graph", "vision", "graph"])
+    second = CachedEmbeddings(inner, "topics", cache).embed_documents(["vision", "speech"])
+
+    assert inner.texts == ["graph", "vision", "speech"]
+    assert first[0] == first[2]
+    assert second[0] == pytest.approx(first[1])
+    # Another model does not share the entries
+    CachedEmbeddings(inner, "other", cache).embed_documents(["graph"])
+    assert inner.texts[-1] == "graph"
+
+
+def test_retrieve_without_sources_does_not_search_the_shared_index(monkeypatch):
+    pytest.importorskip("langchain_community")
+    from RAG import query_database
+
+    def shared_index():
+        raise AssertionError("the shared index must not be searched")
+
+    monkeypatch.setattr(query_database, "get_vector_store", shared_index)
+    by_theme, stats = query_database.retrieve("graphs", sources=[])
+    assert all(chunks == [] for chunks in by_theme.values())
+    assert stats["chunks_retrieved"] == 0